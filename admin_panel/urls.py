@@ -32,4 +32,6 @@ urlpatterns = [
     
     # Analytics
     path('analytics/', views.analytics, name='analytics'),
+    path('analytics/recommendations/', views.recommendation_metrics, name='recommendation_metrics'),
+    path('analytics/recommendations.json', views.recommendation_metrics_json, name='recommendation_metrics_json'),
 ]
\ No newline at end of file
@@ -4,11 +4,12 @@ from django.contrib.auth.models import User
 from django.contrib import messages
 from django.db.models import Q, Count
 from django.http import HttpResponseForbidden, JsonResponse
-from django.core.paginator import Paginator
 from datetime import datetime, timedelta
 from django.utils import timezone
 
 from jobs.models import Job, Application, UserProfile, SavedJob, Contact
+from jobs.pagination import KeysetPaginator
+from jobs.profiling import metrics
 
 
 # Admin check decorator
@@ -99,10 +100,8 @@ def manage_users(request):
     if user_type:
         users = users.filter(profile__user_type=user_type)
     
-    users = users.order_by('-date_joined')
-    
-    paginator = Paginator(users, 20)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(users, 20, ('-date_joined', '-id'))
+    page_obj = paginator.page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
@@ -203,10 +202,8 @@ def manage_jobs(request):
     elif status == 'inactive':
         jobs = jobs.filter(is_active=False)
     
-    jobs = jobs.order_by('-posted_date')
-    
-    paginator = Paginator(jobs, 20)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(jobs, 20, ('-posted_date', '-id'))
+    page_obj = paginator.page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
@@ -289,10 +286,8 @@ def manage_applications(request):
     if status:
         applications = applications.filter(status=status)
     
-    applications = applications.order_by('-applied_date')
-    
-    paginator = Paginator(applications, 20)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(applications, 20, ('-applied_date', '-id'))
+    page_obj = paginator.page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
@@ -351,10 +346,8 @@ def manage_contacts(request):
     elif status == 'unresolved':
         contacts = contacts.filter(is_resolved=False)
     
-    contacts = contacts.order_by('-created_at')
-    
-    paginator = Paginator(contacts, 20)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(contacts, 20, ('-created_at', '-id'))
+    page_obj = paginator.page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
@@ -460,4 +453,42 @@ def analytics(request):
         'last_6_months': last_6_months,
     }
     
-    return render(request, 'analytics.html', context)
\ No newline at end of file
+    return render(request, 'analytics.html', context)
+
+
+# =========================
+# Recommendation Metrics
+# =========================
+
+@login_required
+@admin_required
+def recommendation_metrics(request):
+    """Latency, pool size and cache histograms of the recommenders in this worker"""
+    if request.method == 'POST':
+        metrics.reset()
+        messages.success(request, 'Recommendation metrics reset')
+        return redirect('admin_panel:recommendation_metrics')
+
+    snapshot = metrics.snapshot()
+    for entry in snapshot['operations']:
+        total = entry['durations_ms'].get('total')
+        # Share of the computation time spent in each stage, slowest stage first
+        entry['stages'] = sorted(
+            (
+                dict(summary, name=name, share=summary['sum'] / total['sum'] * 100 if total and total['sum'] else 0)
+                for name, summary in entry['durations_ms'].items()
+            ),
+            key=lambda stage: (stage['name'] != 'total', -stage['sum']),
+        )
+        hits = entry['counters'].get('cache_hit', 0)
+        lookups = hits + entry['counters'].get('cache_miss', 0)
+        entry['hit_rate'] = hits / lookups * 100 if lookups else None
+
+    return render(request, 'recommendation_metrics.html', {'snapshot': snapshot})
+
+
+@login_required
+@admin_required
+def recommendation_metrics_json(request):
+    """The same metrics as JSON, for scraping"""
+    return JsonResponse(metrics.snapshot())
@@ -142,3 +142,28 @@ LOGOUT_REDIRECT_URL = 'jobs:home'  # Where to redirect after logout
 # Media Files (User Uploads)
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = 'media/'
+
+# Recommender
+# Candidate search backend: 'ivf' (approximate, trained with
+# `manage.py build_candidate_index`) or 'exact'. IVF falls back to exact
+# search until an index has been built.
+CANDIDATE_INDEX_BACKEND = 'ivf'
+CANDIDATE_INDEX_N_PROBE = 8  # Higher = better recall, slower queries
+RECOMMENDER_DATA_DIR = BASE_DIR / 'var' / 'recommender'
+# Share of a job recommendation score from collaborative filtering (trained
+# with `manage.py train_collaborative_filter`); 0 disables it
+COLLABORATIVE_WEIGHT = 0.5
+# Share of a job's content score from the TF-IDF similarity of its required
+# skills to the seeker's; 0 disables it
+SKILL_MATCH_WEIGHT = 0.3
+# Background threads per process computing recommendations on a cache miss
+RECOMMENDATION_WORKERS = 2
+# Candidate ranking: 'pipeline' (skill/location/experience retrieval, then
+# rerank) or 'knn' (distance in the candidate index)
+CANDIDATE_RANKER = 'pipeline'
+# Shortlist sizes of the pipeline's two retrieval sources
+CANDIDATE_RETRIEVAL_SKILL_LIMIT = 2000
+CANDIDATE_RETRIEVAL_FILTER_LIMIT = 2000
+# Distance within which the filter retrieval looks for seekers, and over
+# which the rerank's proximity score falls to 0
+CANDIDATE_RETRIEVAL_RADIUS_KM = 50
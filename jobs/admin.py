@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, Job, Application, SavedJob, Contact
+from .models import UserProfile, Job, Application, SavedJob, JobRecommendation, Contact, Skill, SkillAlias
 
 
 @admin.register(UserProfile)
@@ -17,6 +17,18 @@ class JobAdmin(admin.ModelAdmin):
     date_hierarchy = 'posted_date'
 
 
+class SkillAliasInline(admin.TabularInline):
+    model = SkillAlias
+    extra = 1
+
+
+@admin.register(Skill)
+class SkillAdmin(admin.ModelAdmin):
+    list_display = ['name']
+    search_fields = ['name', 'aliases__name']
+    inlines = [SkillAliasInline]
+
+
 @admin.register(Application)
 class ApplicationAdmin(admin.ModelAdmin):
     list_display = ['applicant', 'job', 'status', 'applied_date']
@@ -32,6 +44,13 @@ class SavedJobAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'job__title']
 
 
+@admin.register(JobRecommendation)
+class JobRecommendationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'job', 'rank', 'score', 'created_at']
+    list_filter = ['created_at']
+    search_fields = ['user__username', 'job__title']
+
+
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
     list_display = ['name', 'email', 'subject', 'created_at', 'is_resolved']
@@ -0,0 +1,194 @@
+import numpy as np
+
+
+# Rows per block when computing distances to centroids, bounds peak memory
+ASSIGN_CHUNK_SIZE = 65536
+# Changed or removed rows held outside the buckets before they are folded in
+COMPACT_AFTER = 1024
+
+
+def squared_distances(vectors, centroids):
+    """Pairwise squared euclidean distances between two row sets"""
+    return (
+        (vectors ** 2).sum(axis=1)[:, None]
+        - 2 * vectors @ centroids.T
+        + (centroids ** 2).sum(axis=1)[None, :]
+    )
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest neighbour index in pure numpy.
+
+    Vectors are bucketed by their nearest k-means centroid. A query scans
+    only the n_probe closest buckets, so n_probe is the recall/latency
+    knob: n_probe == n_lists is an exact search. The centroids and the
+    scaling parameters are trained offline; bucket contents are rebuilt
+    from the current features on load and patched as profiles change.
+    Changes first go to a small overlay searched alongside the buckets,
+    and are folded into them once it holds COMPACT_AFTER rows.
+    """
+
+    # Arrays that fully describe a populated index, see to_arrays
+    array_names = ('centroids', 'mean', 'scale', 'n_probe', 'ids', 'vectors', 'offsets')
+
+    def __init__(self, centroids, mean, scale, n_probe=8):
+        self.centroids = np.asarray(centroids, dtype=float)
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.n_probe = n_probe
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, self.centroids.shape[1]))
+        self.offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        self.pending = {}
+        self.stale_ids = set()
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, features, n_lists=256, n_probe=8, n_iter=10, sample_size=100000, seed=0):
+        """Fit scaling and k-means centroids on a sample of raw features"""
+        features = np.asarray(features, dtype=float)
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1
+        vectors = (features - mean) / scale
+
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample_size:
+            vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        n_lists = max(1, min(n_lists, len(vectors)))
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)]
+
+        for _ in range(n_iter):
+            index = cls(centroids, mean, scale)
+            labels = index.assign(vectors)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, vectors)
+            counts = np.bincount(labels, minlength=n_lists)
+            filled = counts > 0
+            centroids = centroids.copy()
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        return cls(centroids, mean, scale, n_probe=n_probe)
+
+    def transform(self, features):
+        return (np.asarray(features, dtype=float) - self.mean) / self.scale
+
+    def assign(self, vectors):
+        """Nearest centroid for each (already scaled) vector"""
+        labels = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE):
+            chunk = vectors[start:start + ASSIGN_CHUNK_SIZE]
+            labels[start:start + ASSIGN_CHUNK_SIZE] = squared_distances(chunk, self.centroids).argmin(axis=1)
+        return labels
+
+    def build(self, ids, features):
+        """Bucket every vector; buckets are contiguous slices of one array"""
+        vectors = self.transform(features).reshape(-1, self.centroids.shape[1])
+        labels = self.assign(vectors)
+        order = np.argsort(labels, kind='stable')
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.vectors = vectors[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=self.n_lists))])
+        self.pending = {}
+        self.stale_ids = set()
+
+    def add(self, obj_id, feature):
+        """Insert or replace one vector without rebuilding the buckets"""
+        self.stale_ids.add(obj_id)
+        self.pending[obj_id] = self.transform(feature)
+        if len(self.stale_ids) >= COMPACT_AFTER:
+            self.compact()
+
+    def remove(self, obj_id):
+        self.stale_ids.add(obj_id)
+        self.pending.pop(obj_id, None)
+        if len(self.stale_ids) >= COMPACT_AFTER:
+            self.compact()
+
+    def _pending_arrays(self):
+        """(ids, vectors) of the overlay"""
+        ids = np.fromiter(self.pending, dtype=np.int64, count=len(self.pending))
+        return ids, np.array(list(self.pending.values())).reshape(-1, self.centroids.shape[1])
+
+    def compact(self):
+        """Drop stale rows from the buckets and insert pending ones at the end of their nearest bucket"""
+        labels = np.repeat(np.arange(self.n_lists), np.diff(self.offsets))
+        stale = np.fromiter(self.stale_ids, dtype=np.int64, count=len(self.stale_ids))
+        keep = ~np.isin(self.ids, stale)
+        ids, vectors, labels = self.ids[keep], self.vectors[keep], labels[keep]
+        if self.pending:
+            pending_ids, pending_vectors = self._pending_arrays()
+            pending_labels = self.assign(pending_vectors)
+            # Positions in the old arrays; rows inserted at one position keep their order
+            positions = np.searchsorted(labels, pending_labels, side='right')
+            ids = np.insert(ids, positions, pending_ids)
+            vectors = np.insert(vectors, positions, pending_vectors, axis=0)
+            labels = np.insert(labels, positions, pending_labels)
+        self.ids = ids
+        self.vectors = vectors
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=self.n_lists))])
+        self.pending = {}
+        self.stale_ids = set()
+
+    def search(self, features, k, n_probe=None):
+        """Return per-query lists of distance and id arrays, nearest first"""
+        queries = self.transform(features).reshape(-1, self.centroids.shape[1])
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        probes = np.argsort(squared_distances(queries, self.centroids), axis=1)[:, :n_probe]
+        stale = np.fromiter(self.stale_ids, dtype=np.int64, count=len(self.stale_ids))
+        pending_ids, pending_vectors = self._pending_arrays()
+        # Overlay rows are only scanned with the bucket they will be folded into
+        pending_labels = self.assign(pending_vectors)
+
+        all_distances, all_ids = [], []
+        for query, lists in zip(queries, probes):
+            rows = np.concatenate(
+                [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+            ).astype(np.int64)
+            ids = self.ids[rows]
+            vectors = self.vectors[rows]
+            if len(stale):
+                keep = ~np.isin(ids, stale)
+                ids, vectors = ids[keep], vectors[keep]
+            probed = np.isin(pending_labels, lists)
+            ids = np.concatenate([ids, pending_ids[probed]])
+            vectors = np.concatenate([vectors, pending_vectors[probed]])
+
+            distances = np.sqrt(np.maximum(((vectors - query) ** 2).sum(axis=1), 0))
+            n = min(k, len(distances))
+            top = np.argpartition(distances, n - 1)[:n] if n else np.empty(0, dtype=np.int64)
+            top = top[np.argsort(distances[top], kind='stable')]
+            all_distances.append(distances[top])
+            all_ids.append(ids[top])
+        return all_distances, all_ids
+
+    def to_arrays(self):
+        return {
+            'centroids': self.centroids,
+            'mean': self.mean,
+            'scale': self.scale,
+            'n_probe': np.array(self.n_probe),
+            'ids': self.ids,
+            'vectors': self.vectors,
+            'offsets': self.offsets,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Wrap populated arrays (possibly memory-mapped) without copying them"""
+        index = cls(arrays['centroids'], arrays['mean'], arrays['scale'], n_probe=int(np.ravel(arrays['n_probe'])[0]))
+        index.ids = arrays['ids']
+        index.vectors = arrays['vectors']
+        index.offsets = arrays['offsets']
+        return index
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, mean=self.mean, scale=self.scale, n_probe=self.n_probe)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['centroids'], data['mean'], data['scale'], n_probe=int(data['n_probe']))
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+
+POINTER_NAME = 'CURRENT'
+
+_lock = threading.Lock()
+_current = {'key': None, 'bundle': None}
+
+
+def bundles_dir():
+    return os.path.join(settings.RECOMMENDER_DATA_DIR, 'bundles')
+
+
+class Bundle:
+    """A published, read-only set of recommender arrays.
+
+    Arrays are opened with mmap_mode='r', so every worker process maps the
+    same files and shares their pages through the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = os.path.basename(path)
+        with open(os.path.join(path, 'metadata.json')) as f:
+            self.metadata = json.load(f)
+        self.created_at = datetime.fromisoformat(self.metadata['created_at'])
+
+    def has(self, name):
+        return os.path.exists(os.path.join(self.path, f'{name}.npy'))
+
+    def array(self, name):
+        return np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+
+
+def publish_bundle(arrays, metadata, created_at=None, keep=3):
+    """Write a new bundle version and atomically make it current.
+
+    created_at should be taken before the data was read, so that loaders
+    replay any change made while the bundle was being built.
+    """
+    root = bundles_dir()
+    os.makedirs(root, exist_ok=True)
+    created_at = created_at or timezone.now()
+    version = created_at.strftime('%Y%m%dT%H%M%S%f')
+
+    staging = tempfile.mkdtemp(prefix='.tmp-', dir=root)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f'{name}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(staging, 'metadata.json'), 'w') as f:
+        json.dump(dict(metadata, created_at=created_at.isoformat()), f)
+    os.rename(staging, os.path.join(root, version))
+
+    # Swap the pointer with a rename so readers never see a partial write
+    pointer_tmp = os.path.join(root, f'.{POINTER_NAME}.{os.getpid()}')
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(root, POINTER_NAME))
+
+    prune_bundles(keep)
+    return version
+
+
+def prune_bundles(keep=3):
+    """Delete all but the newest `keep` versions.
+
+    Workers still mapping a deleted version keep reading it until they
+    switch; the files are only reclaimed once unmapped.
+    """
+    root = bundles_dir()
+    versions = sorted(name for name in os.listdir(root) if not name.startswith('.') and name != POINTER_NAME)
+    for name in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def current_bundle():
+    """Return the current Bundle, or None if nothing has been published.
+
+    Only a stat of the pointer file is done per call; the bundle is
+    reopened when the pointer has been replaced.
+    """
+    pointer = os.path.join(bundles_dir(), POINTER_NAME)
+    try:
+        stat = os.stat(pointer)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns)
+    with _lock:
+        if _current['key'] != key:
+            with open(pointer) as f:
+                version = f.read().strip()
+            _current['bundle'] = Bundle(os.path.join(bundles_dir(), version))
+            _current['key'] = key
+        return _current['bundle']
@@ -0,0 +1,187 @@
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .candidate_pipeline import CandidatePipeline, SeekerFilterIndex
+from .feature_store import CandidateFeatureStore, JobFeatureStore
+from .ml_recommender import CandidateRecommender, JobRecommender
+from .models import Job, UserProfile
+from .profiling import collect_stages
+from .skill_matcher import SkillMatcher
+
+
+PERCENTILES = (50, 95, 99)
+
+
+def benchmarks_dir():
+    return os.path.join(settings.RECOMMENDER_DATA_DIR, 'benchmarks')
+
+
+def summarize(samples):
+    """Percentiles and mean of a list of durations, in milliseconds"""
+    samples = np.asarray(samples) * 1000
+    summary = {f'p{p}': float(np.percentile(samples, p)) for p in PERCENTILES}
+    summary['mean'] = float(samples.mean())
+    return summary
+
+
+class Scenario:
+    """One recommender entry point run against a list of subjects.
+
+    make_indexes builds every index the entry point reads. cold=True
+    gives every call fresh ones, so the load and fit stages are paid each
+    time as after a deploy or worker restart.
+    """
+
+    def __init__(self, name, subjects, call, make_indexes, cold=False):
+        self.name = name
+        self.subjects = subjects
+        self.call = call
+        self.make_indexes = make_indexes
+        self.cold = cold
+        self.warm_indexes = None
+
+    def indexes(self):
+        if self.cold:
+            return self.make_indexes()
+        if self.warm_indexes is None:
+            self.warm_indexes = self.make_indexes()
+        return self.warm_indexes
+
+    def run_once(self, subject):
+        indexes = self.indexes()
+        with collect_stages() as stages:
+            started = time.perf_counter()
+            self.call(indexes, subject)
+            total = time.perf_counter() - started
+        return total, dict(stages)
+
+    def run(self, iterations, warmup=3):
+        for subject in self.subjects[:warmup]:
+            self.run_once(subject)
+
+        totals, stage_samples = [], {}
+        for i in range(iterations):
+            total, stages = self.run_once(self.subjects[i % len(self.subjects)])
+            totals.append(total)
+            for name, seconds in stages.items():
+                stage_samples.setdefault(name, []).append(seconds)
+
+        return {
+            'iterations': iterations,
+            'total_ms': summarize(totals),
+            'stages_ms': {name: summarize(samples) for name, samples in stage_samples.items()},
+            'peak_memory_bytes': self.peak_memory(),
+        }
+
+    def peak_memory(self):
+        """Peak Python allocations of one call, measured outside the timed runs"""
+        gc.collect()
+        tracemalloc.start()
+        try:
+            self.run_once(self.subjects[0])
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def job_scenario(n_subjects, n_recommendations, cold, seed):
+    seeker_ids = sample_ids(
+        UserProfile.objects.filter(user_type='seeker').values_list('user_id', flat=True), n_subjects, seed
+    )
+    users = list(UserProfile.objects.filter(user_id__in=seeker_ids).select_related('user'))
+    return Scenario(
+        'JobRecommender.get_recommendations',
+        [profile.user for profile in users],
+        lambda store, user: JobRecommender(store=store).get_recommendations(user, n_recommendations),
+        JobFeatureStore,
+        cold,
+    )
+
+
+def candidate_indexes():
+    """A feature store and a pipeline with its own skill matcher and filter index, all unbuilt"""
+    return CandidateFeatureStore(), CandidatePipeline(filters=SeekerFilterIndex(), matcher=SkillMatcher())
+
+
+def candidate_scenario(n_subjects, n_recommendations, cold, seed):
+    job_ids = sample_ids(Job.objects.filter(is_active=True).values_list('id', flat=True), n_subjects, seed)
+    return Scenario(
+        'CandidateRecommender.get_recommendations',
+        list(Job.objects.filter(id__in=job_ids)),
+        lambda indexes, job: CandidateRecommender(
+            store=indexes[0], pipeline=indexes[1]
+        ).get_recommendations(job, n_recommendations),
+        candidate_indexes,
+        cold,
+    )
+
+
+def sample_ids(ids_queryset, n, seed):
+    ids = np.fromiter(ids_queryset.order_by(), dtype=np.int64)
+    if len(ids) > n:
+        ids = np.random.default_rng(seed).choice(ids, n, replace=False)
+    return ids.tolist()
+
+
+def dataset_size():
+    return {
+        'seekers': UserProfile.objects.filter(user_type='seeker').count(),
+        'active_jobs': Job.objects.filter(is_active=True).count(),
+    }
+
+
+def run_benchmarks(scenarios, iterations):
+    report = {
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'database': connection.vendor,
+        'dataset': dataset_size(),
+        'settings': {
+            name: getattr(settings, name)
+            for name in ('CANDIDATE_RANKER', 'CANDIDATE_RETRIEVAL_SKILL_LIMIT', 'CANDIDATE_RETRIEVAL_FILTER_LIMIT')
+        },
+        'scenarios': {},
+    }
+    for scenario in scenarios:
+        if not scenario.subjects:
+            continue
+        report['scenarios'][scenario.name] = dict(scenario.run(iterations), cold=scenario.cold)
+    return report
+
+
+def save_report(report, path=None):
+    """Write a report as JSON, by default timestamped under benchmarks_dir()"""
+    if path is None:
+        os.makedirs(benchmarks_dir(), exist_ok=True)
+        created_at = timezone.now().strftime('%Y%m%dT%H%M%S')
+        path = os.path.join(benchmarks_dir(), f'{created_at}.json')
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare_reports(report, baseline):
+    """Yield (scenario, metric, baseline ms, current ms) for shared metrics"""
+    for name, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        metrics = [('total', current['total_ms'], previous['total_ms'])]
+        metrics += [
+            (stage, summary, previous['stages_ms'][stage])
+            for stage, summary in current['stages_ms'].items()
+            if stage in previous.get('stages_ms', {})
+        ]
+        for metric, now, before in metrics:
+            for p in PERCENTILES:
+                yield name, f'{metric} p{p}', before[f'p{p}'], now[f'p{p}']
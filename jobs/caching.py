@@ -0,0 +1,185 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+
+
+JOB_SET_VERSION_KEY = 'jobs:job_set_version'
+SEEKER_SET_VERSION_KEY = 'jobs:seeker_set_version'
+
+
+def get_version(key):
+    """Return the current value of a version counter"""
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old value
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Increment a version counter and return the new value"""
+    get_version(key)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_job_set_version():
+    """Return the current version of the active job set"""
+    return get_version(JOB_SET_VERSION_KEY)
+
+
+def get_seeker_set_version():
+    """Return the current version of the job seeker profiles"""
+    return get_version(SEEKER_SET_VERSION_KEY)
+
+
+# Enough to serve every page variant (count=4 and count=6) from one list
+RECOMMENDATION_CACHE_SIZE = 12
+RECOMMENDATION_CACHE_TIMEOUT = 60 * 60
+
+
+def recommendation_cache_key(user_id):
+    return f'jobs:recommendations:{user_id}'
+
+
+def get_cached_recommendations(user_id):
+    """Return the cached top-N job ids for a user, or None on a miss"""
+    entry = cache.get(recommendation_cache_key(user_id))
+    if entry is None or entry['version'] != get_job_set_version():
+        return None
+    return entry['job_ids']
+
+
+def set_cached_recommendations(user_id, job_ids, version):
+    """Cache job ids computed against the given job set version"""
+    cache.set(
+        recommendation_cache_key(user_id),
+        {'version': version, 'job_ids': list(job_ids)},
+        RECOMMENDATION_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_recommendations(user_id):
+    cache.delete(recommendation_cache_key(user_id))
+
+
+def candidate_cache_key(job_id):
+    return f'jobs:candidates:{job_id}'
+
+
+def get_cached_candidates(job_id):
+    """Return the cached top-N seeker user ids for a job, or None on a miss"""
+    entry = cache.get(candidate_cache_key(job_id))
+    if entry is None or entry['version'] != get_seeker_set_version():
+        return None
+    return entry['user_ids']
+
+
+def set_cached_candidates(job_id, user_ids, version):
+    """Cache user ids computed against the given seeker set version"""
+    cache.set(
+        candidate_cache_key(job_id),
+        {'version': version, 'user_ids': list(user_ids)},
+        RECOMMENDATION_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_candidates(job_id):
+    cache.delete(candidate_cache_key(job_id))
+
+
+def employer_candidates_cache_key(employer_id):
+    return f'jobs:employer_candidates:{employer_id}'
+
+
+def get_cached_employer_candidates(employer_id, count):
+    """Return the cached {job_id: [user_id, ...]} of an employer, or None on a miss"""
+    entry = cache.get(employer_candidates_cache_key(employer_id))
+    versions = (get_job_set_version(), get_seeker_set_version())
+    if entry is None or entry['versions'] != versions or entry['count'] != count:
+        return None
+    return entry['job_candidates']
+
+
+def set_cached_employer_candidates(employer_id, count, job_candidates, versions):
+    """Cache per-job user ids computed against the given (job set, seeker set) versions"""
+    cache.set(
+        employer_candidates_cache_key(employer_id),
+        {'versions': versions, 'count': count, 'job_candidates': job_candidates},
+        RECOMMENDATION_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_employer_candidates(employer_id):
+    cache.delete(employer_candidates_cache_key(employer_id))
+
+
+FACET_CACHE_KEY = 'jobs:facets'
+FACET_CACHE_TIMEOUT = 60 * 60
+
+
+def get_cached_facets():
+    """Return the cached facet counts of all active jobs, or None on a miss"""
+    entry = cache.get(FACET_CACHE_KEY)
+    if entry is None or entry['version'] != get_job_set_version():
+        return None
+    return entry['facets']
+
+
+def set_cached_facets(facets, version):
+    """Cache facet counts computed against the given job set version"""
+    cache.set(FACET_CACHE_KEY, {'version': version, 'facets': facets}, FACET_CACHE_TIMEOUT)
+
+
+SEARCH_CACHE_TIMEOUT = 10 * 60
+
+
+def search_cache_key(search, sort_by, cursor):
+    """Key of one listings page: normalized filters, requested sort and cursor"""
+    digest = hashlib.md5(json.dumps([search, sort_by, cursor], sort_keys=True).encode()).hexdigest()
+    return f'jobs:search:{digest}'
+
+
+def get_cached_search(key):
+    """Return a cached listings page entry, or None on a miss or after any job change"""
+    entry = cache.get(key)
+    if entry is None or entry['version'] != get_job_set_version():
+        return None
+    return entry['page']
+
+
+def set_cached_search(key, page, version):
+    """Cache a listings page entry computed against the given job set version"""
+    cache.set(key, {'version': version, 'page': page}, SEARCH_CACHE_TIMEOUT)
+
+
+SALARY_HISTOGRAM_CACHE_TIMEOUT = 10 * 60
+
+
+def salary_histogram_cache_key(search):
+    digest = hashlib.md5(json.dumps(search, sort_keys=True).encode()).hexdigest()
+    return f'jobs:salary-histogram:{digest}'
+
+
+def get_cached_salary_histogram(search):
+    """Return the cached salary histogram of a normalized search, or None on a miss or after any job change"""
+    entry = cache.get(salary_histogram_cache_key(search))
+    if entry is None or entry['version'] != get_job_set_version():
+        return None
+    return entry['histogram']
+
+
+def set_cached_salary_histogram(search, histogram, version):
+    """Cache a salary histogram computed against the given job set version"""
+    cache.set(
+        salary_histogram_cache_key(search),
+        {'version': version, 'histogram': histogram},
+        SALARY_HISTOGRAM_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,203 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .caching import get_seeker_set_version
+from .geo import GEOHASH_END, cover_cells, haversine_km
+from .models import UserProfile
+from .profiling import record_size, stage
+from .skill_matcher import MIN_REBUILD_INTERVAL, skill_matcher
+
+
+# Experience window of the filter retrieval, relative to the job's requirement
+EXPERIENCE_BELOW = 2
+EXPERIENCE_ABOVE = 5
+# Years above the requirement before a candidate counts as overqualified
+OVERQUALIFIED_AFTER = 8
+RERANK_WEIGHTS = {
+    'skills': 0.6,
+    'experience': 0.25,
+    'location': 0.1,
+    'resume': 0.05,
+}
+
+
+class SeekerFilterIndex:
+    """Experience and coordinates of every job seeker, sorted for range lookups.
+
+    Rows are also ordered by geohash, so the seekers in one geohash cell
+    are a contiguous slice found with two binary searches. A radius lookup
+    reads the slices of the cells covering its circle, then keeps the rows
+    within the experience window and the exact haversine distance.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.versions = None
+        self.built_at = 0
+
+    def build(self):
+        with self.lock:
+            version = get_seeker_set_version()
+            rows = list(UserProfile.objects.filter(user_type='seeker').values_list(
+                'user_id', 'experience_years', 'latitude', 'longitude', 'geohash', 'resume'
+            ).order_by('user_id'))
+            if rows:
+                ids, experience, latitudes, longitudes, geohashes, resumes = zip(*rows)
+            else:
+                ids = experience = latitudes = longitudes = geohashes = resumes = ()
+
+            self.ids = np.asarray(ids, dtype=np.int64)
+            self.experience = np.asarray(experience, dtype=np.int64)
+            self.latitudes = np.asarray(latitudes, dtype=float)
+            self.longitudes = np.asarray(longitudes, dtype=float)
+            self.has_resume = np.array([bool(resume) for resume in resumes], dtype=bool)
+
+            geohashes = np.asarray(geohashes, dtype=str)
+            self.by_geohash = np.argsort(geohashes, kind='stable')
+            self.sorted_geohashes = geohashes[self.by_geohash]
+            self.by_experience = np.argsort(self.experience, kind='stable')
+            self.versions = version
+            self.built_at = time.monotonic()
+
+    def ensure_current(self):
+        """Rebuild when seekers changed, at most once per interval"""
+        with self.lock:
+            if self.versions is None:
+                self.build()
+            elif time.monotonic() - self.built_at >= MIN_REBUILD_INTERVAL:
+                if self.versions != get_seeker_set_version():
+                    self.build()
+        return self
+
+    def cell_rows(self, cells):
+        """Row numbers of the seekers whose geohash starts with any of cells"""
+        starts = np.searchsorted(self.sorted_geohashes, cells, side='left')
+        stops = np.searchsorted(self.sorted_geohashes, [cell + GEOHASH_END for cell in cells], side='left')
+        return np.concatenate([self.by_geohash[start:stop] for start, stop in zip(starts, stops)])
+
+    def filter(self, latitude, longitude, experience, limit):
+        """Row numbers of up to limit seekers near a point and in an experience window.
+
+        Near is within CANDIDATE_RETRIEVAL_RADIUS_KM; an unknown point
+        matches every seeker. When the window holds more than limit
+        seekers, those closest to the required experience are kept.
+        """
+        low, high = experience - EXPERIENCE_BELOW, experience + EXPERIENCE_ABOVE
+        if latitude is None or longitude is None:
+            rows, years = self.by_experience, self.experience[self.by_experience]
+            start = np.searchsorted(years, low, side='left')
+            stop = np.searchsorted(years, high, side='right')
+            rows, years = rows[start:stop], years[start:stop]
+        else:
+            radius = settings.CANDIDATE_RETRIEVAL_RADIUS_KM
+            cells = cover_cells(latitude, longitude, radius)
+            rows = np.arange(len(self.ids)) if cells is None else self.cell_rows(cells)
+            years = self.experience[rows]
+            rows = rows[(years >= low) & (years <= high)]
+            rows = rows[haversine_km(latitude, longitude, self.latitudes[rows], self.longitudes[rows]) <= radius]
+            years = self.experience[rows]
+        if len(rows) > limit:
+            rows = rows[np.argpartition(np.abs(years - experience), limit - 1)[:limit]]
+        return rows
+
+    def rows_of(self, user_ids):
+        """Row numbers of the given user ids, which must all be indexed"""
+        return np.searchsorted(self.ids, user_ids)
+
+
+class CandidatePipeline:
+    """Two-stage candidate ranking: cheap retrieval, then a vectorized rerank.
+
+    Retrieval unions the best skill matches from the skill inverted index
+    with seekers near the job's location and in its experience window,
+    capping each source at its limit. Only that shortlist is scored on
+    skill overlap, experience fit, proximity and having a resume.
+    """
+
+    def __init__(self, skill_limit=None, filter_limit=None, filters=None, matcher=None):
+        self.skill_limit = skill_limit or settings.CANDIDATE_RETRIEVAL_SKILL_LIMIT
+        self.filter_limit = filter_limit or settings.CANDIDATE_RETRIEVAL_FILTER_LIMIT
+        self.filters = filters or seeker_filter_index
+        self.matcher = matcher or skill_matcher
+
+    def retrieve(self, job, exclude_ids=()):
+        """Return (user ids, skill scores) of the shortlist, ids sorted"""
+        skill_ids, skill_scores = self.matcher.seeker_scores(job.skills_required)
+        top = skill_ids
+        if len(skill_ids) > self.skill_limit:
+            top = skill_ids[np.argpartition(-skill_scores, self.skill_limit - 1)[:self.skill_limit]]
+
+        filtered = self.filters.filter(job.latitude, job.longitude, job.experience_required, self.filter_limit)
+        shortlist = np.union1d(top, self.filters.ids[filtered])
+        record_size('skill_matches', len(skill_ids))
+        record_size('filter_matches', len(filtered))
+        record_size('shortlist', len(shortlist))
+        if exclude_ids:
+            shortlist = shortlist[~np.isin(shortlist, list(exclude_ids))]
+
+        # Skill scores of filter-only candidates come from the full posting walk
+        order = np.argsort(skill_ids)
+        positions = np.searchsorted(skill_ids, shortlist, sorter=order).clip(max=max(len(skill_ids) - 1, 0))
+        scores = np.zeros(len(shortlist))
+        if len(skill_ids):
+            positions = order[positions]
+            found = skill_ids[positions] == shortlist
+            scores[found] = skill_scores[positions[found]]
+        return shortlist, scores
+
+    def rerank(self, job, user_ids, skill_scores):
+        """Weighted match score in [0, 1] of each shortlisted seeker"""
+        rows = self.filters.rows_of(user_ids)
+        experience = self.filters.experience[rows]
+        shortfall = np.maximum(job.experience_required - experience, 0)
+        excess = np.maximum(experience - job.experience_required - OVERQUALIFIED_AFTER, 0)
+        experience_fit = 1 / (1 + shortfall) / (1 + 0.1 * excess)
+
+        # 1 at the job's location, falling to 0 at the retrieval radius and for unknown locations
+        location_match = np.zeros(len(rows))
+        if job.latitude is not None and job.longitude is not None:
+            distance = haversine_km(
+                job.latitude, job.longitude, self.filters.latitudes[rows], self.filters.longitudes[rows]
+            )
+            location_match = np.nan_to_num(np.clip(1 - distance / settings.CANDIDATE_RETRIEVAL_RADIUS_KM, 0, 1))
+
+        return (
+            RERANK_WEIGHTS['skills'] * skill_scores
+            + RERANK_WEIGHTS['experience'] * experience_fit
+            + RERANK_WEIGHTS['location'] * location_match
+            + RERANK_WEIGHTS['resume'] * self.filters.has_resume[rows]
+        )
+
+    def recommend(self, job, n_recommendations=10, exclude_ids=()):
+        """Top (user_id, score) pairs for a job, best first"""
+        with stage('fit'):
+            self.matcher.ensure_current()
+            self.filters.ensure_current()
+        with stage('retrieve'):
+            user_ids, skill_scores = self.retrieve(job, exclude_ids)
+        # Seekers created after the last rebuild are not in the filter index yet
+        user_ids, skill_scores = self.known(user_ids, skill_scores)
+        if len(user_ids) == 0:
+            return []
+
+        with stage('rerank'):
+            scores = self.rerank(job, user_ids, skill_scores)
+            n = min(n_recommendations, len(scores))
+            top = np.argpartition(-scores, n - 1)[:n]
+            top = top[np.argsort(-scores[top], kind='stable')]
+        return list(zip(user_ids[top].tolist(), scores[top].tolist()))
+
+    def known(self, user_ids, skill_scores):
+        ids = self.filters.ids
+        if len(ids) == 0:
+            return user_ids[:0], skill_scores[:0]
+        positions = np.searchsorted(ids, user_ids).clip(max=len(ids) - 1)
+        keep = ids[positions] == user_ids
+        return user_ids[keep], skill_scores[keep]
+
+
+seeker_filter_index = SeekerFilterIndex()
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import threading
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+from scipy.sparse.linalg import svds
+
+from .models import Application, SavedJob
+
+
+# Implicit feedback strength of each interaction type
+APPLICATION_WEIGHT = 1.0
+SAVE_WEIGHT = 0.5
+
+_lock = threading.Lock()
+_current = {'key': None, 'model': None}
+
+
+def model_path():
+    return os.path.join(settings.RECOMMENDER_DATA_DIR, 'collaborative.npz')
+
+
+def interaction_matrix():
+    """Return (user_ids, job_ids, matrix) of weighted seeker x job interactions.
+
+    Ids are sorted so rows and columns can be looked up with searchsorted.
+    A seeker who both applied to and saved a job gets the summed weight.
+    """
+    applied = np.array(
+        Application.objects.values_list('applicant_id', 'job_id').order_by(), dtype=np.int64
+    ).reshape(-1, 2)
+    saved = np.array(
+        SavedJob.objects.values_list('user_id', 'job_id').order_by(), dtype=np.int64
+    ).reshape(-1, 2)
+    pairs = np.concatenate([applied, saved])
+    weights = np.concatenate([
+        np.full(len(applied), APPLICATION_WEIGHT),
+        np.full(len(saved), SAVE_WEIGHT),
+    ])
+
+    user_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    job_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (weights, (rows.reshape(-1), columns.reshape(-1))), shape=(len(user_ids), len(job_ids))
+    )
+    matrix.sum_duplicates()
+    return user_ids, job_ids, matrix
+
+
+class CollaborativeModel:
+    """Truncated SVD factors of the seeker x job interaction matrix.
+
+    The score of a job for a seeker is the dot product of their factor
+    rows, i.e. the low-rank reconstruction of the interaction matrix.
+    Seekers and jobs missing from the training data have no factors.
+    """
+
+    def __init__(self, user_ids, job_ids, user_factors, job_factors):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.job_ids = np.asarray(job_ids, dtype=np.int64)
+        self.user_factors = np.asarray(user_factors, dtype=np.float32)
+        self.job_factors = np.asarray(job_factors, dtype=np.float32)
+
+    @property
+    def n_factors(self):
+        return self.user_factors.shape[1]
+
+    @classmethod
+    def train(cls, n_factors=32):
+        """Factorize the current interactions, or return None if there are too few"""
+        user_ids, job_ids, matrix = interaction_matrix()
+        n_factors = min(n_factors, min(matrix.shape) - 1)
+        if n_factors < 1:
+            return None
+        u, s, vt = svds(matrix, k=n_factors)
+        # Split the singular values evenly between both sides
+        root = np.sqrt(s)
+        return cls(user_ids, job_ids, u * root, vt.T * root)
+
+    def _positions(self, ids, known_ids):
+        """Row of each id in known_ids (sorted), -1 where it is missing"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(known_ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        positions = np.searchsorted(known_ids, ids).clip(max=len(known_ids) - 1)
+        return np.where(known_ids[positions] == ids, positions, -1)
+
+    def user_rows(self, user_ids):
+        return self._positions(user_ids, self.user_ids)
+
+    def job_factors_for(self, job_ids):
+        """Factor rows aligned to job_ids, zero for jobs without interactions"""
+        positions = self._positions(job_ids, self.job_ids)
+        factors = np.zeros((len(positions), self.n_factors), dtype=np.float32)
+        known = positions >= 0
+        factors[known] = self.job_factors[positions[known]]
+        return factors
+
+    def save(self, path):
+        """Write the factors next to path and rename into place"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', suffix='.npz', dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(
+                f,
+                user_ids=self.user_ids,
+                job_ids=self.job_ids,
+                user_factors=self.user_factors,
+                job_factors=self.job_factors,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['user_ids'], data['job_ids'], data['user_factors'], data['job_factors'])
+
+
+def current_model():
+    """Return the trained CollaborativeModel, or None before the first training.
+
+    Like artifacts.current_bundle, only a stat is done per call and the
+    file is reloaded after train_collaborative_filter replaced it.
+    """
+    path = model_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns)
+    with _lock:
+        if _current['key'] != key:
+            _current['model'] = CollaborativeModel.load(path)
+            _current['key'] = key
+        return _current['model']
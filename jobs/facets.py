@@ -0,0 +1,84 @@
+from collections import Counter
+
+from django.db.models import Count, Q
+
+from .caching import get_cached_facets, get_job_set_version, set_cached_facets
+from .models import Job
+from .salary import MAX_SALARY_BAND, SALARY_BAND_WIDTH
+
+
+# Locations and skills listed in the sidebar, most jobs first
+TOP_LOCATIONS = 10
+TOP_SKILLS = 10
+# Minimum salary choices offered as a facet
+SALARY_FLOORS = (30000, 50000, 75000, 100000, 150000)
+
+
+def facet_counts(jobs):
+    """Category, job type, top location, minimum salary and top skill counts of a Job queryset.
+
+    One query grouped by (category, job type, location), with one
+    conditional count per salary floor, is rolled up per facet in Python.
+    Salary counts are cumulative, matching the min_salary filter: the jobs
+    paying at least each floor. Skills are counted by a second query
+    grouping the jobs' skill links.
+    """
+    rows = jobs.order_by().values('category', 'job_type', 'location').annotate(
+        jobs=Count('id'),
+        **{f'salary_{floor}': Count('id', filter=Q(salary_mid__gte=floor)) for floor in SALARY_FLOORS},
+    )
+    categories, job_types, locations, salaries = Counter(), Counter(), Counter(), Counter()
+    for row in rows:
+        categories[row['category']] += row['jobs']
+        job_types[row['job_type']] += row['jobs']
+        if row['location']:
+            locations[row['location']] += row['jobs']
+        for floor in SALARY_FLOORS:
+            salaries[floor] += row[f'salary_{floor}']
+
+    # Joined from jobs rather than filtering links by a subquery, which would
+    # lose the extra() tables of a full-text search
+    skills = jobs.order_by().filter(skill_links__isnull=False).values('skill_links__skill__name').annotate(
+        jobs=Count('id'),
+    ).order_by('-jobs', 'skill_links__skill__name')[:TOP_SKILLS]
+
+    category_labels, job_type_labels = dict(Job.CATEGORIES), dict(Job.JOB_TYPES)
+    return {
+        'category': [(value, category_labels.get(value, value), count) for value, count in categories.most_common()],
+        'job_type': [(value, job_type_labels.get(value, value), count) for value, count in job_types.most_common()],
+        'location': [(value, value, count) for value, count in locations.most_common(TOP_LOCATIONS)],
+        'min_salary': [(floor, f'${floor // 1000}k+', salaries[floor]) for floor in SALARY_FLOORS if salaries[floor]],
+        'skill': [(row['skill_links__skill__name'], row['skill_links__skill__name'], row['jobs']) for row in skills],
+    }
+
+
+def salary_histogram(jobs):
+    """Job counts per salary band of a Job queryset, ready for JSON.
+
+    One query grouped by the precomputed salary_band. Bins run from the
+    lowest to the highest band used, empty ones included; the top band is
+    open ended. Jobs without a salary have no band and are counted apart.
+    """
+    counts = dict(jobs.order_by().values_list('salary_band').annotate(jobs=Count('id')))
+    no_salary = counts.pop(None, 0)
+    bins = [
+        {
+            'min': band * SALARY_BAND_WIDTH,
+            'max': None if band == MAX_SALARY_BAND else (band + 1) * SALARY_BAND_WIDTH,
+            'count': counts.get(band, 0),
+        }
+        for band in (range(min(counts), max(counts) + 1) if counts else ())
+    ]
+    return {'band_width': SALARY_BAND_WIDTH, 'bins': bins, 'no_salary': no_salary}
+
+
+def get_facet_counts(jobs, filtered=True):
+    """Facet counts of jobs; unfiltered listings are served from the cache"""
+    if filtered:
+        return facet_counts(jobs)
+    facets = get_cached_facets()
+    if facets is None:
+        version = get_job_set_version()
+        facets = facet_counts(jobs)
+        set_cached_facets(facets, version)
+    return facets
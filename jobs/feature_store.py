@@ -0,0 +1,500 @@
+import os
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Length
+from django.utils import timezone
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+from .ann_index import IVFIndex
+from .artifacts import current_bundle
+from .caching import JOB_SET_VERSION_KEY, SEEKER_SET_VERSION_KEY, bump_version, get_version
+from .geo import sphere_coordinates
+from .models import Job, ProfileSkill, UserProfile
+
+
+# Replayed window before the last sync, covers clock skew between workers
+CATCH_UP_MARGIN = timedelta(seconds=5)
+
+
+def encode_categorical(values, vocabulary, default=0):
+    """Vectorized vocabulary lookup; each distinct value is looked up once"""
+    uniques, inverse = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+    lookup = np.array([vocabulary.get(value, default) for value in uniques], dtype=float)
+    return lookup[inverse.reshape(-1)]
+
+
+def link_count(link_model, owner_field):
+    """Per-row count of an owner's skill links, read from the link table's (owner, skill) index"""
+    links = link_model.objects.filter(**{owner_field: OuterRef('pk')}).order_by().values(owner_field)
+    return Coalesce(Subquery(links.annotate(count=Count('pk')).values('count')), 0)
+
+
+def scaler_from_params(mean, scale):
+    """A fitted StandardScaler rebuilt from stored parameters"""
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(mean)
+    scaler.scale_ = np.asarray(scale)
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = len(scaler.mean_)
+    return scaler
+
+
+class FeatureStore:
+    """In-memory feature matrix keyed by object id, updated row by row.
+
+    Subclasses define how rows are fetched and which cache version counter
+    tells them another process changed the underlying table. When a
+    recommender bundle has been published the matrix is memory-mapped
+    from it and shared between worker processes until this process has
+    to patch a row, at which point it takes a private copy.
+    """
+
+    n_features = 0
+    version_key = None
+    bundle_prefix = None
+    # Seconds to keep serving a matrix another process has invalidated
+    min_reload_interval = 0
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.loaded_at = 0
+        self.synced_at = None
+        self.bundle_version = None
+        self._features = np.empty((0, self.n_features))
+        self._ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        self._row_of = {}
+        self._index = None
+        self._shared_scaling = None
+
+    @property
+    def features(self):
+        return self._features[:self._size]
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, obj_id):
+        return obj_id in self._rows()
+
+    def _rows(self):
+        """Map of id to row, built on first use after a bulk load"""
+        if self._row_of is None:
+            self._row_of = {obj_id: row for row, obj_id in enumerate(self.ids.tolist())}
+        return self._row_of
+
+    def _make_writable(self):
+        """Copy memory-mapped arrays into private memory before a write"""
+        if not self._features.flags.writeable:
+            self._features = np.array(self._features)
+            self._ids = np.array(self._ids)
+        self._shared_scaling = None
+
+    def replace_all(self, ids, features):
+        """Swap in a freshly built matrix"""
+        with self.lock:
+            self._ids = np.asarray(ids, dtype=np.int64)
+            self._features = np.asarray(features, dtype=float).reshape(-1, self.n_features)
+            self._size = len(self._ids)
+            self._row_of = None
+            self._index = None
+            self._shared_scaling = None
+
+    def upsert(self, obj_id, vector):
+        """Insert or overwrite the row for obj_id"""
+        with self.lock:
+            self._make_writable()
+            row = self._rows().get(obj_id)
+            if row is None:
+                if self._size == len(self._ids):
+                    self._grow()
+                row = self._size
+                self._size += 1
+                self._rows()[obj_id] = row
+                self._ids[row] = obj_id
+            self._features[row] = vector
+            self._index = None
+
+    def remove(self, obj_id):
+        """Drop the row for obj_id by moving the last row into its slot"""
+        with self.lock:
+            row = self._rows().pop(obj_id, None)
+            if row is None:
+                return
+            self._make_writable()
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                self._features[row] = self._features[last]
+                self._ids[row] = moved_id
+                self._row_of[moved_id] = row
+            self._size = last
+            self._index = None
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._ids))
+        features = np.empty((capacity, self.n_features))
+        ids = np.empty(capacity, dtype=np.int64)
+        features[:self._size] = self.features
+        ids[:self._size] = self.ids
+        self._features = features
+        self._ids = ids
+
+    def get_index(self):
+        """Return (scaler, knn, ids) fitted on the current rows.
+
+        The fit is cached and only redone after the matrix changes.
+        """
+        with self.lock:
+            if self._size == 0:
+                return None
+            if self._index is None:
+                if self._shared_scaling is not None:
+                    # Brute force over the mapped matrix keeps it shared
+                    mean, scale, scaled = self._shared_scaling
+                    scaler = scaler_from_params(mean, scale)
+                    knn = NearestNeighbors(metric='euclidean', algorithm='brute')
+                    knn.fit(scaled)
+                    self._index = (scaler, knn, self.ids)
+                else:
+                    scaler = StandardScaler()
+                    scaled = scaler.fit_transform(self.features)
+                    knn = NearestNeighbors(metric='euclidean')
+                    knn.fit(scaled)
+                    self._index = (scaler, knn, self.ids.copy())
+            return self._index
+
+    def fetch(self):
+        """Return (ids, features) for every row from the database"""
+        raise NotImplementedError
+
+    def live_ids(self):
+        """Ids of every row that should currently be in the matrix"""
+        raise NotImplementedError
+
+    def fetch_changed(self, since):
+        """Return (ids, features, removed_ids) for rows updated since a time"""
+        raise NotImplementedError
+
+    def _mark_synced(self, version, synced_at):
+        self.version = version
+        self.synced_at = synced_at
+        self.loaded_at = time.monotonic()
+
+    def load(self):
+        """Rebuild the matrix from the database"""
+        with self.lock:
+            version, synced_at = get_version(self.version_key), timezone.now()
+            self.replace_all(*self.fetch())
+            self.bundle_version = None
+            self._mark_synced(version, synced_at)
+
+    def catch_up(self, since):
+        """Patch in rows changed or deleted since a time, without a full reload"""
+        with self.lock:
+            version, synced_at = get_version(self.version_key), timezone.now()
+            ids, features, removed_ids = self.fetch_changed(since - CATCH_UP_MARGIN)
+            for obj_id, vector in zip(ids.tolist(), features):
+                self.upsert(obj_id, vector)
+            live = np.fromiter(self.live_ids(), dtype=np.int64)
+            deleted = self.ids[~np.isin(self.ids, live)].tolist()
+            for obj_id in set(deleted) | set(removed_ids):
+                self.remove(obj_id)
+            self._mark_synced(version, synced_at)
+
+    def export(self):
+        """Arrays and metadata describing this store for a bundle"""
+        scaler = StandardScaler().fit(self.features) if len(self) else None
+        prefix = self.bundle_prefix
+        arrays = {
+            f'{prefix}_ids': self.ids,
+            f'{prefix}_features': self.features,
+        }
+        if scaler is not None:
+            arrays[f'{prefix}_mean'] = scaler.mean_
+            arrays[f'{prefix}_scale'] = scaler.scale_
+            arrays[f'{prefix}_scaled'] = scaler.transform(self.features)
+        return arrays, {}
+
+    def load_bundle(self, bundle):
+        """Map the matrix from a published bundle, then replay newer changes"""
+        with self.lock:
+            prefix = self.bundle_prefix
+            features = bundle.array(f'{prefix}_features')
+            if features.shape[1:] != (self.n_features,):
+                # Published with an older feature layout; serve from the database until republished
+                self.load()
+                self.bundle_version = bundle.version
+                return
+            self.replace_all(bundle.array(f'{prefix}_ids'), features)
+            if bundle.has(f'{prefix}_scaled'):
+                self._shared_scaling = (
+                    bundle.array(f'{prefix}_mean'),
+                    bundle.array(f'{prefix}_scale'),
+                    bundle.array(f'{prefix}_scaled'),
+                )
+            self.bundle_version = bundle.version
+            self.catch_up(bundle.created_at)
+
+    def ensure_current(self):
+        """Sync with the latest bundle and with changes from other processes"""
+        with self.lock:
+            bundle = current_bundle()
+            if bundle is not None and bundle.version != self.bundle_version:
+                self.load_bundle(bundle)
+            elif self.version is None:
+                self.load()
+            elif time.monotonic() - self.loaded_at >= self.min_reload_interval:
+                if self.version != get_version(self.version_key):
+                    self.catch_up(self.synced_at)
+        return self
+
+    def record_change(self, change):
+        """Apply change locally and publish a new version.
+
+        The local matrix is only patched when it was current before the
+        change; otherwise it is left to reload on next use.
+        """
+        with self.lock:
+            in_sync = self.version is not None and self.version == get_version(self.version_key)
+            if in_sync:
+                change()
+            version = bump_version(self.version_key)
+            self.version = version if in_sync else None
+
+
+class JobFeatureStore(FeatureStore):
+    """Feature matrix of all active jobs with stable categorical vocabularies"""
+
+    n_features = 7
+    version_key = JOB_SET_VERSION_KEY
+    bundle_prefix = 'jobs'
+
+    # Columns pulled by values_list, in the order build_features expects
+    columns = (
+        'id', 'category', 'job_type', 'experience_required',
+        'salary_mid', 'latitude', 'longitude',
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.categories = {code: i for i, (code, _) in enumerate(Job.CATEGORIES)}
+        self.job_types = {code: i for i, (code, _) in enumerate(Job.JOB_TYPES)}
+
+    def encode(self, category, job_type, experience, salary, coordinates):
+        return [
+            self.categories.get(category, 0),
+            self.job_types.get(job_type, 0),
+            experience,
+            salary,
+            *coordinates,
+        ]
+
+    def vectorize(self, job):
+        """Convert a job into its numerical feature vector"""
+        return self.encode(
+            job.category,
+            job.job_type,
+            job.experience_required,
+            float(job.salary_mid),
+            sphere_coordinates([job.latitude], [job.longitude])[0],
+        )
+
+    def build_features(self, rows):
+        """Encode values_list rows (see columns) into (ids, feature matrix)"""
+        rows = list(rows)
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.n_features))
+        ids, categories, job_types, experience, salary_mid, latitudes, longitudes = zip(*rows)
+        features = np.column_stack([
+            encode_categorical(categories, self.categories),
+            encode_categorical(job_types, self.job_types),
+            np.asarray(experience, dtype=float),
+            np.asarray(salary_mid, dtype=float),
+            sphere_coordinates(latitudes, longitudes),
+        ])
+        return np.asarray(ids, dtype=np.int64), features
+
+    def fetch(self):
+        return self.build_features(Job.objects.filter(is_active=True).values_list(*self.columns))
+
+    def live_ids(self):
+        return Job.objects.filter(is_active=True).values_list('id', flat=True).order_by().iterator()
+
+    def fetch_changed(self, since):
+        changed = Job.objects.filter(updated_at__gte=since)
+        ids, features = self.build_features(changed.filter(is_active=True).values_list(*self.columns))
+        removed_ids = list(changed.filter(is_active=False).values_list('id', flat=True))
+        return ids, features, removed_ids
+
+    def apply(self, job):
+        """Reflect a saved job in the matrix"""
+        if job.is_active:
+            self.upsert(job.id, self.vectorize(job))
+        else:
+            self.remove(job.id)
+
+
+class CandidateFeatureStore(FeatureStore):
+    """Feature matrix of all job seeker profiles, keyed by user id.
+
+    With the 'ivf' backend the rows are also bucketed in an IVFIndex
+    trained offline by `manage.py build_candidate_index`; without a
+    trained index searches fall back to exact KNN.
+    """
+
+    n_features = 7
+    version_key = SEEKER_SET_VERSION_KEY
+    bundle_prefix = 'candidates'
+    min_reload_interval = 60
+
+    columns = (
+        'user_id', 'experience_years', 'latitude', 'longitude',
+        'skills_count', 'has_resume', 'education_length',
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.ann = None
+
+    @staticmethod
+    def index_path():
+        return os.path.join(settings.RECOMMENDER_DATA_DIR, 'candidate_ivf.npz')
+
+    @classmethod
+    def annotate(cls, profiles):
+        """Compute the text-derived features in SQL and return values_list rows"""
+        return profiles.annotate(
+            skills_count=link_count(ProfileSkill, 'profile'),
+            has_resume=Case(
+                When(Q(resume='') | Q(resume__isnull=True), then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            education_length=Length('education'),
+        ).values_list(*cls.columns)
+
+    def encode(self, experience, coordinates, skills_count, has_resume, education_length):
+        return [
+            experience,
+            *coordinates,
+            skills_count,
+            has_resume,
+            min(education_length / 100, 10),  # Normalize
+        ]
+
+    def vectorize(self, profile):
+        """Convert a seeker profile into its numerical feature vector"""
+        return self.encode(
+            profile.experience_years,
+            sphere_coordinates([profile.latitude], [profile.longitude])[0],
+            # Linked skills, as build_features counts them, not raw comma separated names
+            profile.skill_links.count(),
+            1 if profile.resume else 0,
+            len(profile.education) if profile.education else 0,
+        )
+
+    def build_features(self, rows):
+        """Encode annotated values_list rows into (ids, feature matrix)"""
+        rows = list(rows)
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.n_features))
+        ids, experience, latitudes, longitudes, skills_count, has_resume, education_length = zip(*rows)
+        features = np.column_stack([
+            np.asarray(experience, dtype=float),
+            sphere_coordinates(latitudes, longitudes),
+            np.asarray(skills_count, dtype=float),
+            np.asarray(has_resume, dtype=float),
+            np.minimum(np.asarray(education_length, dtype=float) / 100, 10),  # Normalize
+        ])
+        return np.asarray(ids, dtype=np.int64), features
+
+    def fetch(self):
+        return self.build_features(self.annotate(UserProfile.objects.filter(user_type='seeker')))
+
+    def live_ids(self):
+        return UserProfile.objects.filter(user_type='seeker').values_list('user_id', flat=True).order_by().iterator()
+
+    def fetch_changed(self, since):
+        changed = UserProfile.objects.filter(updated_at__gte=since)
+        ids, features = self.build_features(self.annotate(changed.filter(user_type='seeker')))
+        removed_ids = list(changed.exclude(user_type='seeker').values_list('user_id', flat=True))
+        return ids, features, removed_ids
+
+    def load(self):
+        with self.lock:
+            super().load()
+            self.ann = None
+            if settings.CANDIDATE_INDEX_BACKEND == 'ivf' and os.path.exists(self.index_path()):
+                self.ann = IVFIndex.load(self.index_path())
+                if self.ann.centroids.shape[1] != self.n_features:
+                    # Trained on an older feature layout, exact search until it is retrained
+                    self.ann = None
+                else:
+                    self.ann.build(self.ids, self.features)
+
+    def export(self):
+        arrays, metadata = super().export()
+        if self.ann is not None:
+            self.ann.compact()
+            arrays.update({f'candidates_ivf_{name}': array for name, array in self.ann.to_arrays().items()})
+        return arrays, metadata
+
+    def load_bundle(self, bundle):
+        with self.lock:
+            self.ann = None
+            if (
+                settings.CANDIDATE_INDEX_BACKEND == 'ivf' and bundle.has('candidates_ivf_centroids')
+                and bundle.array('candidates_ivf_centroids').shape[1] == self.n_features
+            ):
+                self.ann = IVFIndex.from_arrays({
+                    name: bundle.array(f'candidates_ivf_{name}') for name in IVFIndex.array_names
+                })
+            super().load_bundle(bundle)
+
+    def upsert(self, obj_id, vector):
+        # The matrix is patched too, so catch_up and the exact fallback see the change
+        with self.lock:
+            super().upsert(obj_id, vector)
+            if self.ann is not None:
+                self.ann.add(obj_id, vector)
+
+    def remove(self, obj_id):
+        with self.lock:
+            if self.ann is not None and obj_id in self:
+                self.ann.remove(obj_id)
+            super().remove(obj_id)
+
+    def apply(self, profile):
+        """Reflect a saved profile in the matrix"""
+        if profile.user_type == 'seeker':
+            self.upsert(profile.user_id, self.vectorize(profile))
+        else:
+            self.remove(profile.user_id)
+
+    def search(self, vectors, k, n_probe=None):
+        """Nearest seekers to raw feature vectors as per-query (distances, ids)"""
+        with self.lock:
+            if self.ann is not None:
+                return self.ann.search(vectors, k, n_probe or settings.CANDIDATE_INDEX_N_PROBE)
+            index = self.get_index()
+            if index is None:
+                return [np.empty(0)] * len(vectors), [np.empty(0, dtype=np.int64)] * len(vectors)
+            scaler, knn, ids = index
+            distances, indices = knn.kneighbors(scaler.transform(vectors), n_neighbors=min(k, len(ids)))
+            return list(distances), [ids[row] for row in indices]
+
+
+job_store = JobFeatureStore()
+candidate_store = CandidateFeatureStore()
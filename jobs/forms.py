@@ -125,16 +125,30 @@ class JobApplicationForm(forms.ModelForm):
 
 class JobSearchForm(forms.Form):
     """Job search and filter form"""
+    RADII = (
+        ('', 'This location only'),
+        (10, 'Within 10 km'),
+        (25, 'Within 25 km'),
+        (50, 'Within 50 km'),
+        (100, 'Within 100 km'),
+        (250, 'Within 250 km'),
+    )
+
     keyword = forms.CharField(max_length=100, required=False, 
-                              widget=forms.TextInput(attrs={'placeholder': 'Job title, keywords...'}))
+                              widget=forms.TextInput(attrs={'placeholder': 'Job title, keywords...',
+                                                            'data-typeahead': 'keyword', 'autocomplete': 'off'}))
     location = forms.CharField(max_length=100, required=False,
-                               widget=forms.TextInput(attrs={'placeholder': 'Location...'}))
+                               widget=forms.TextInput(attrs={'placeholder': 'Location...',
+                                                             'data-typeahead': 'location', 'autocomplete': 'off'}))
+    radius = forms.TypedChoiceField(choices=RADII, coerce=int, empty_value=None, required=False)
     category = forms.ChoiceField(choices=[('', 'All Categories')] + list(Job.CATEGORIES), 
                                  required=False)
     job_type = forms.ChoiceField(choices=[('', 'All Types')] + list(Job.JOB_TYPES), 
                                  required=False)
     min_salary = forms.DecimalField(required=False, min_value=0,
                                     widget=forms.NumberInput(attrs={'placeholder': 'Min salary'}))
+    # Set from the skill facet, and kept when the other filters are resubmitted
+    skill = forms.CharField(max_length=100, required=False, widget=forms.HiddenInput)
 
 
 class ContactForm(forms.ModelForm):
@@ -0,0 +1,181 @@
+import csv
+import math
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+
+# Offline gazetteer: name, country, latitude, longitude and '|' separated aliases
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), 'data', 'gazetteer.csv')
+WHITESPACE = re.compile(r'\s+')
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Cells of about 5 m, so every job or profile resolved to one place shares a geohash
+GEOHASH_PRECISION = 9
+# Sorts after every geohash character, closing the range of hashes sharing a prefix
+GEOHASH_END = '{'
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+Place = namedtuple('Place', 'name country latitude longitude geohash')
+
+
+def normalize_location(name):
+    """Canonical form of a location name: trimmed, single spaced, casefolded"""
+    return WHITESPACE.sub(' ', (name or '').strip()).casefold()
+
+
+@lru_cache(maxsize=None)
+def gazetteer():
+    """{normalized name or alias: Place}, read once per process"""
+    places = {}
+    with open(GAZETTEER_PATH, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            latitude, longitude = float(row['latitude']), float(row['longitude'])
+            place = Place(row['name'], row['country'], latitude, longitude, encode_geohash(latitude, longitude))
+            for name in [row['name'], *row['aliases'].split('|')]:
+                if name:
+                    places.setdefault(normalize_location(name), place)
+    return places
+
+
+def resolve_location(text):
+    """The gazetteer place named by free text, or None.
+
+    The whole text is tried first, then with trailing comma separated
+    parts dropped, so "Austin, TX, USA" resolves through "austin, tx" to
+    "austin" while "London, Ontario" keeps its own entry.
+    """
+    parts = [part.strip() for part in normalize_location(text).split(',')]
+    places = gazetteer()
+    for end in range(len(parts), 0, -1):
+        place = places.get(', '.join(parts[:end]))
+        if place is not None:
+            return place
+    return None
+
+
+def geocode(text):
+    """(latitude, longitude, geohash) of a location, or (None, None, '') when unknown"""
+    place = resolve_location(text)
+    if place is None:
+        return None, None, ''
+    return place.latitude, place.longitude, place.geohash
+
+
+def geocode_queryset(queryset):
+    """Store the coordinates of every row's location, one UPDATE per distinct location.
+
+    For rows written without save(), such as bulk_create, and after the
+    gazetteer file changes. Returns the number of rows updated.
+    """
+    updated = 0
+    for location in queryset.values_list('location', flat=True).distinct().order_by():
+        latitude, longitude, geohash = geocode(location)
+        updated += queryset.filter(location=location).update(
+            latitude=latitude, longitude=longitude, geohash=geohash
+        )
+    return updated
+
+
+# =========================
+# Geohash
+# =========================
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Base32 geohash of a point; a prefix of it is the enclosing larger cell"""
+    bounds = [[-90.0, 90.0], [-180.0, 180.0]]
+    value = (latitude, longitude)
+    chars, bits, n_bits, axis = [], 0, 0, 1  # Geohash starts with a longitude bit
+    while len(chars) < precision:
+        low, high = bounds[axis]
+        middle = (low + high) / 2
+        bits <<= 1
+        if value[axis] >= middle:
+            bits |= 1
+            bounds[axis][0] = middle
+        else:
+            bounds[axis][1] = middle
+        axis, n_bits = 1 - axis, n_bits + 1
+        if n_bits == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, n_bits = 0, 0
+    return ''.join(chars)
+
+
+def cell_degrees(precision):
+    """(latitude, longitude) span in degrees of a geohash cell"""
+    n_bits = 5 * precision
+    return 180 / 2 ** (n_bits // 2), 360 / 2 ** ((n_bits + 1) // 2)
+
+
+def cover_cells(latitude, longitude, radius_km):
+    """Geohash prefixes whose cells contain every point within radius_km, or None.
+
+    Uses the longest prefix whose cells span at least radius_km each way
+    across the whole circle, so the circle lies within the 3 x 3 block of
+    cells around its centre. None means no prefix is coarse enough, as for
+    a radius of thousands of km, and the search cannot be narrowed.
+    """
+    # Longitude degrees are narrowest at the circle's edge furthest from the equator
+    edge = min(abs(latitude) + radius_km / KM_PER_DEGREE, 90)
+    km_per_longitude = KM_PER_DEGREE * math.cos(math.radians(edge))
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_degrees(precision)
+        if height * KM_PER_DEGREE >= radius_km and width * km_per_longitude >= radius_km:
+            break
+    else:
+        return None
+    return sorted({
+        encode_geohash(
+            max(-90.0, min(latitude + i * height, 90.0)),
+            (longitude + j * width + 180) % 360 - 180,
+            precision,
+        )
+        for i in (-1, 0, 1) for j in (-1, 0, 1)
+    })
+
+
+# =========================
+# Distance
+# =========================
+
+def distance_km(latitude1, longitude1, latitude2, longitude2):
+    """Great-circle distance between two points by the haversine formula"""
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(longitude2 - longitude1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+# numpy is imported inside the vectorized helpers, which only the
+# recommenders call, so geocoding and search stay numpy-free
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Vectorized distances from one point to arrays of points; NaN where a point is unknown"""
+    import numpy as np
+
+    phi = np.radians(latitude)
+    phis = np.radians(np.asarray(latitudes, dtype=float))
+    lams = np.radians(np.asarray(longitudes, dtype=float) - longitude)
+    a = np.sin((phis - phi) / 2) ** 2 + np.cos(phi) * np.cos(phis) * np.sin(lams / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def sphere_coordinates(latitudes, longitudes):
+    """Unit vectors (x, y, z) of points on the globe, one row per point.
+
+    Euclidean distance between rows grows with the great-circle distance,
+    which makes them usable as KNN features. Unknown points (None or NaN)
+    map to the origin, equally far from every known point.
+    """
+    import numpy as np
+
+    phi = np.radians(np.asarray(latitudes, dtype=float))
+    lam = np.radians(np.asarray(longitudes, dtype=float))
+    coordinates = np.column_stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)])
+    return np.nan_to_num(coordinates.reshape(-1, 3))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from jobs.caching import JOB_SET_VERSION_KEY, SEEKER_SET_VERSION_KEY, bump_version
+from jobs.models import Job, JobSkill, ProfileSkill, UserProfile
+from jobs.skills import backfill_skill_links, skill_dictionary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild job and profile skill links from their skill text, e.g. after bulk imports or merging skills'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows synced per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        skill_dictionary.clear()
+        n_jobs = backfill_skill_links(
+            Job.objects.all(), 'skills_required', JobSkill, 'job', skill_dictionary, batch_size
+        )
+        n_profiles = backfill_skill_links(
+            UserProfile.objects.all(), 'skills', ProfileSkill, 'profile', skill_dictionary, batch_size
+        )
+        # Links written in bulk skip signals, so tell running workers to catch up
+        bump_version(JOB_SET_VERSION_KEY)
+        bump_version(SEEKER_SET_VERSION_KEY)
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {n_jobs} job skill links and {n_profiles} profile skill links'
+        ))
@@ -0,0 +1,82 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from jobs.benchmark import (
+    PERCENTILES,
+    candidate_scenario,
+    compare_reports,
+    job_scenario,
+    run_benchmarks,
+    save_report,
+)
+
+
+class Command(BaseCommand):
+    help = 'Time the job and candidate recommenders end to end and per stage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Timed calls per recommender')
+        parser.add_argument('--subjects', type=int, default=200,
+                            help='Distinct seekers / jobs sampled as inputs')
+        parser.add_argument('--count', type=int, default=10,
+                            help='Recommendations requested per call')
+        parser.add_argument('--cold', action='store_true',
+                            help='Rebuild the feature store on every call')
+        parser.add_argument('--only', choices=['jobs', 'candidates'])
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='JSON report path (default: timestamped file)')
+        parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+        parser.add_argument('--ranker', choices=['pipeline', 'knn'],
+                            help='Override CANDIDATE_RANKER')
+        parser.add_argument('--skill-limit', type=int,
+                            help='Override CANDIDATE_RETRIEVAL_SKILL_LIMIT')
+        parser.add_argument('--filter-limit', type=int,
+                            help='Override CANDIDATE_RETRIEVAL_FILTER_LIMIT')
+
+    def handle(self, *args, **options):
+        overrides = {
+            'CANDIDATE_RANKER': options['ranker'] or settings.CANDIDATE_RANKER,
+            'CANDIDATE_RETRIEVAL_SKILL_LIMIT': options['skill_limit'] or settings.CANDIDATE_RETRIEVAL_SKILL_LIMIT,
+            'CANDIDATE_RETRIEVAL_FILTER_LIMIT': options['filter_limit'] or settings.CANDIDATE_RETRIEVAL_FILTER_LIMIT,
+        }
+        with override_settings(**overrides):
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        scenarios = []
+        if options['only'] != 'candidates':
+            scenarios.append(job_scenario(options['subjects'], options['count'], options['cold'], options['seed']))
+        if options['only'] != 'jobs':
+            scenarios.append(candidate_scenario(options['subjects'], options['count'], options['cold'], options['seed']))
+
+        report = run_benchmarks(scenarios, options['iterations'])
+        dataset = report['dataset']
+        self.stdout.write(f"{dataset['seekers']} seekers, {dataset['active_jobs']} active jobs")
+        for name, result in report['scenarios'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{name} ({result['iterations']} calls{', cold' if result['cold'] else ''}, "
+                f"peak {result['peak_memory_bytes'] / 2 ** 20:.1f} MiB)"
+            ))
+            self.stdout.write(f"  {'total':<10}{self.format_summary(result['total_ms'])}")
+            for stage, summary in result['stages_ms'].items():
+                self.stdout.write(f'  {stage:<10}{self.format_summary(summary)}')
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Compared with {options['baseline']}"))
+            for name, metric, before, now in compare_reports(report, baseline):
+                change = (now - before) / before * 100 if before else 0
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+                self.stdout.write(style(f'  {name} {metric}: {before:.2f} -> {now:.2f} ms ({change:+.0f}%)'))
+
+        path = save_report(report, options['output'])
+        self.stdout.write(self.style.SUCCESS(f'Saved report to {path}'))
+
+    @staticmethod
+    def format_summary(summary):
+        return '  '.join(f"p{p} {summary[f'p{p}']:8.2f} ms" for p in PERCENTILES)
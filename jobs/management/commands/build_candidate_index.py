@@ -0,0 +1,44 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.ann_index import IVFIndex
+from jobs.feature_store import CandidateFeatureStore
+
+
+class Command(BaseCommand):
+    help = 'Train the IVF approximate nearest neighbour index over job seeker profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lists', type=int, default=256,
+                            help='Number of k-means buckets')
+        parser.add_argument('--probe', type=int, default=8,
+                            help='Default buckets scanned per query')
+        parser.add_argument('--sample-size', type=int, default=100000,
+                            help='Profiles sampled to train the centroids')
+        parser.add_argument('--iterations', type=int, default=10)
+
+    def handle(self, *args, **options):
+        store = CandidateFeatureStore()
+        started = time.monotonic()
+        ids, features = store.fetch()
+        if len(ids) == 0:
+            self.stdout.write(self.style.WARNING('No job seeker profiles to index'))
+            return
+
+        index = IVFIndex.train(
+            features,
+            n_lists=options['lists'],
+            n_probe=options['probe'],
+            n_iter=options['iterations'],
+            sample_size=options['sample_size'],
+        )
+        path = store.index_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        index.save(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(ids)} profiles into {index.n_lists} lists '
+            f'in {time.monotonic() - started:.1f}s -> {path}'
+        ))
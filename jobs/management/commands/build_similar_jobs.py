@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs.feature_store import CATCH_UP_MARGIN
+from jobs.models import Job
+from jobs.similar_jobs import (
+    BLOCK_SIZE, read_synced_at, rebuild_similar_jobs, refresh_similar_jobs, write_synced_at,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the SimilarJob neighbour table for every active job, or with --changed only '
+        'where jobs changed since the last run (run it periodically, e.g. from cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                            help='Jobs scored against all others per step')
+        parser.add_argument('--changed', action='store_true',
+                            help='Only refresh around jobs saved since the last run; rebuilds on the first run')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        synced_at, now = read_synced_at(), timezone.now()
+        if options['changed'] and synced_at is not None:
+            changed = Job.objects.filter(updated_at__gte=synced_at - CATCH_UP_MARGIN).values_list('id', flat=True)
+            count = refresh_similar_jobs(list(changed), block_size=options['block_size'])
+            action = 'Refreshed'
+        else:
+            count = rebuild_similar_jobs(block_size=options['block_size'])
+            action = 'Rebuilt'
+        write_synced_at(now)
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} similar jobs for {count} jobs in {time.monotonic() - started:.1f}s'
+        ))
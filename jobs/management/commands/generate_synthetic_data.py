@@ -0,0 +1,245 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.caching import JOB_SET_VERSION_KEY, SEEKER_SET_VERSION_KEY, bump_version
+from jobs.geo import geocode_queryset
+from jobs.models import Application, Job, JobSkill, ProfileSkill, SavedJob, UserProfile
+from jobs.salary import set_salary_columns
+from jobs.skills import backfill_skill_links, skill_dictionary
+
+
+# Job seekers per scale; jobs, employers and interactions scale with them
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+SKILLS_BY_CATEGORY = {
+    'it': ['python', 'django', 'javascript', 'react', 'sql', 'java', 'aws', 'docker', 'kubernetes', 'go'],
+    'business': ['strategy', 'excel', 'project management', 'negotiation', 'operations'],
+    'finance': ['accounting', 'excel', 'financial modelling', 'audit', 'tax', 'sql'],
+    'marketing': ['seo', 'content', 'social media', 'google analytics', 'copywriting'],
+    'sales': ['negotiation', 'crm', 'salesforce', 'lead generation', 'account management'],
+    'healthcare': ['patient care', 'nursing', 'first aid', 'clinical research', 'pharmacology'],
+    'education': ['teaching', 'curriculum design', 'tutoring', 'classroom management'],
+    'engineering': ['autocad', 'matlab', 'solidworks', 'c++', 'embedded systems', 'python'],
+    'other': ['communication', 'customer service', 'writing', 'logistics'],
+}
+CATEGORY_NAMES = list(SKILLS_BY_CATEGORY)
+LOCATIONS = [
+    'New York', 'London', 'Berlin', 'Paris', 'San Francisco', 'Toronto', 'Bangalore',
+    'Singapore', 'Sydney', 'Austin', 'Chicago', 'Amsterdam', 'Dublin', 'Remote',
+]
+TITLES = ['Engineer', 'Analyst', 'Manager', 'Specialist', 'Consultant', 'Coordinator', 'Associate']
+SENIORITY = ['Junior', '', 'Senior', 'Lead']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark', 'Wayne', 'Wonka', 'Soylent', 'Tyrell']
+# Share of interactions that stay in the seeker's own category
+CATEGORY_AFFINITY = 0.7
+
+
+def zipf_weights(n, exponent=1.1):
+    """Popularity weights so a few locations and skills dominate, as in real data"""
+    weights = 1 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate synthetic seekers, employers, jobs, applications and saved jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='1k',
+                            help='Number of job seekers to generate')
+        parser.add_argument('--seekers', type=int, help='Override the seeker count of --scale')
+        parser.add_argument('--jobs-per-seeker', type=float, default=0.5)
+        parser.add_argument('--applications-per-seeker', type=float, default=2.0)
+        parser.add_argument('--saves-per-seeker', type=float, default=1.0)
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Rows per bulk insert transaction')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic',
+                            help='Username prefix of the generated accounts')
+
+    def handle(self, *args, **options):
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        self.password = make_password(None)
+        self.run = f"{options['prefix']}{timezone.now():%Y%m%d%H%M%S}"
+        if User.objects.filter(username__startswith=f'{self.run}_').exists():
+            raise CommandError(f'Accounts with prefix {self.run}_ already exist, retry in a second')
+
+        n_seekers = options['seekers'] or SCALES[options['scale']]
+        n_jobs = max(1, int(n_seekers * options['jobs_per_seeker']))
+        n_employers = max(1, n_jobs // 50)
+        started = time.monotonic()
+
+        employer_ids = self.create_users('employer', n_employers, lambda start, stop: [
+            {'company_name': COMPANIES[i % len(COMPANIES)]} for i in range(start, stop)
+        ])
+        self.log('employers', n_employers, started)
+        seeker_ids, seeker_categories = self.create_seekers(n_seekers)
+        self.log('seekers', n_seekers, started)
+        job_ids, job_categories = self.create_jobs(n_jobs, employer_ids)
+        self.log('jobs', n_jobs, started)
+
+        jobs_by_category = {
+            category: job_ids[job_categories == index]
+            for index, category in enumerate(CATEGORY_NAMES)
+        }
+        n_applications = self.create_interactions(
+            Application, 'applicant_id', int(n_seekers * options['applications_per_seeker']),
+            seeker_ids, seeker_categories, job_ids, jobs_by_category,
+        )
+        self.log('applications', n_applications, started)
+        n_saved = self.create_interactions(
+            SavedJob, 'user_id', int(n_seekers * options['saves_per_seeker']),
+            seeker_ids, seeker_categories, job_ids, jobs_by_category,
+        )
+        self.log('saved jobs', n_saved, started)
+
+        # bulk_create skips signals: geocode and link the new rows, then tell running workers to catch up
+        jobs = Job.objects.filter(employer__username__startswith=f'{self.run}_')
+        profiles = UserProfile.objects.filter(user__username__startswith=f'{self.run}_')
+        geocode_queryset(jobs)
+        geocode_queryset(profiles)
+        backfill_skill_links(jobs, 'skills_required', JobSkill, 'job', skill_dictionary)
+        backfill_skill_links(profiles, 'skills', ProfileSkill, 'profile', skill_dictionary)
+        bump_version(JOB_SET_VERSION_KEY)
+        bump_version(SEEKER_SET_VERSION_KEY)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {self.run} in {time.monotonic() - started:.1f}s'
+        ))
+
+    def log(self, name, count, started):
+        self.stdout.write(f'{count} {name} ({time.monotonic() - started:.1f}s)')
+
+    def batches(self, n):
+        for start in range(0, n, self.batch_size):
+            yield start, min(start + self.batch_size, n)
+
+    def create_users(self, user_type, n, profile_fields=None):
+        """Create n users with profiles; profile_fields(start, stop) gives per-row kwargs"""
+        ids = []
+        for start, stop in self.batches(n):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(
+                        username=f'{self.run}_{user_type}_{i}',
+                        email=f'{self.run}_{user_type}_{i}@example.com',
+                        password=self.password,
+                    )
+                    for i in range(start, stop)
+                ])
+                extra = profile_fields(start, stop) if profile_fields else [{}] * (stop - start)
+                UserProfile.objects.bulk_create([
+                    UserProfile(user=user, user_type=user_type, **fields)
+                    for user, fields in zip(users, extra)
+                ])
+            ids.extend(user.pk for user in users)
+        return np.array(ids, dtype=np.int64)
+
+    def skills_text(self, category_index, count):
+        pool = SKILLS_BY_CATEGORY[CATEGORY_NAMES[category_index]]
+        picked = self.rng.choice(len(pool), size=min(count, len(pool)), replace=False, p=zipf_weights(len(pool)))
+        return ', '.join(pool[i] for i in picked)
+
+    def create_seekers(self, n):
+        rng = self.rng
+        categories = rng.choice(len(CATEGORY_NAMES), size=n, p=zipf_weights(len(CATEGORY_NAMES), 0.6))
+        locations = rng.choice(len(LOCATIONS), size=n, p=zipf_weights(len(LOCATIONS)))
+        experience = np.minimum(rng.gamma(2.0, 2.5, size=n).astype(int), 40)
+        skill_counts = rng.integers(2, 7, size=n)
+        education_lengths = rng.integers(0, 300, size=n)
+
+        def profile_fields(start, stop):
+            return [
+                {
+                    'location': LOCATIONS[locations[i]],
+                    'experience_years': int(experience[i]),
+                    'skills': self.skills_text(categories[i], skill_counts[i]),
+                    'education': 'BSc ' * (education_lengths[i] // 4),
+                    'resume': 'resumes/synthetic.pdf' if i % 3 else '',
+                }
+                for i in range(start, stop)
+            ]
+
+        return self.create_users('seeker', n, profile_fields), categories
+
+    def create_jobs(self, n, employer_ids):
+        rng = self.rng
+        job_types = [value for value, _ in Job.JOB_TYPES]
+        categories = rng.choice(len(CATEGORY_NAMES), size=n, p=zipf_weights(len(CATEGORY_NAMES), 0.6))
+        locations = rng.choice(len(LOCATIONS), size=n, p=zipf_weights(len(LOCATIONS)))
+        types = rng.choice(len(job_types), size=n, p=[0.6, 0.1, 0.12, 0.08, 0.1])
+        employers = rng.integers(0, len(employer_ids), size=n)
+        experience = np.minimum(rng.gamma(1.5, 2.0, size=n).astype(int), 20)
+        salary_min = np.round(rng.lognormal(10.8, 0.4, size=n), -3)
+        salary_max = salary_min + np.round(rng.uniform(5000, 40000, size=n), -3)
+        no_salary = rng.random(n) < 0.2
+        age_days = rng.exponential(20, size=n)
+        active = rng.random(n) < 0.9
+        now = timezone.now()
+
+        ids = []
+        for start, stop in self.batches(n):
+            jobs = []
+            for i in range(start, stop):
+                seniority = SENIORITY[i % len(SENIORITY)]
+                category = CATEGORY_NAMES[categories[i]]
+                jobs.append(Job(
+                    employer_id=int(employer_ids[employers[i]]),
+                    title=f'{seniority} {category.title()} {TITLES[i % len(TITLES)]}'.strip(),
+                    company_name=COMPANIES[employers[i] % len(COMPANIES)],
+                    description=f'Synthetic {category} role.',
+                    responsibilities='Deliver results.',
+                    requirements=f'{experience[i]}+ years of experience.',
+                    category=category,
+                    job_type=job_types[types[i]],
+                    location=LOCATIONS[locations[i]],
+                    salary_min=None if no_salary[i] else salary_min[i],
+                    salary_max=None if no_salary[i] else salary_max[i],
+                    experience_required=int(experience[i]),
+                    skills_required=self.skills_text(categories[i], int(rng.integers(2, 6))),
+                    is_active=bool(active[i]),
+                    posted_date=now - timedelta(days=float(age_days[i])),
+                ))
+            # bulk_create skips the pre_save signal deriving the salary columns
+            for job in jobs:
+                set_salary_columns(job)
+            with transaction.atomic():
+                Job.objects.bulk_create(jobs)
+            ids.extend(job.pk for job in jobs)
+        return np.array(ids, dtype=np.int64), categories
+
+    def create_interactions(self, model, user_field, n, seeker_ids, seeker_categories, job_ids, jobs_by_category):
+        """Create up to n unique (seeker, job) rows, mostly within the seeker's category"""
+        rng = self.rng
+        seekers = rng.integers(0, len(seeker_ids), size=n)
+        jobs = job_ids[rng.integers(0, len(job_ids), size=n)]
+        in_category = rng.random(n) < CATEGORY_AFFINITY
+        for index, category in enumerate(CATEGORY_NAMES):
+            category_jobs = jobs_by_category[category]
+            rows = np.flatnonzero(in_category & (seeker_categories[seekers] == index))
+            if len(category_jobs) and len(rows):
+                jobs[rows] = category_jobs[rng.integers(0, len(category_jobs), size=len(rows))]
+
+        pairs = np.unique(np.column_stack([seeker_ids[seekers], jobs]), axis=0)
+        rng.shuffle(pairs)
+        extra = {}
+        if model is Application:
+            extra = {
+                'resume': 'application_resumes/synthetic.pdf',
+                'cover_letter': 'Synthetic application.',
+                'contact_email': 'applicant@example.com',
+                'contact_phone': '555-0100',
+            }
+        for start, stop in self.batches(len(pairs)):
+            with transaction.atomic():
+                model.objects.bulk_create([
+                    model(job_id=int(job_id), **{user_field: int(user_id)}, **extra)
+                    for user_id, job_id in pairs[start:stop]
+                ])
+        return len(pairs)
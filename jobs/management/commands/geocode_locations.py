@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from jobs.caching import JOB_SET_VERSION_KEY, SEEKER_SET_VERSION_KEY, bump_version
+from jobs.geo import geocode_queryset
+from jobs.models import Job, UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Recompute job and profile coordinates from the gazetteer, e.g. after editing it'
+
+    def handle(self, *args, **options):
+        n_jobs = geocode_queryset(Job.objects.all())
+        n_profiles = geocode_queryset(UserProfile.objects.all())
+        # update() skips signals, so tell running workers to catch up
+        bump_version(JOB_SET_VERSION_KEY)
+        bump_version(SEEKER_SET_VERSION_KEY)
+        self.stdout.write(self.style.SUCCESS(f'Geocoded {n_jobs} jobs and {n_profiles} profiles'))
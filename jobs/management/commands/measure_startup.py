@@ -0,0 +1,80 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+
+# Run in a fresh interpreter so nothing is already imported
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns  # imports every view module, like a worker's first request
+{extra}
+elapsed = time.perf_counter() - started
+
+rss = None
+try:
+    with open('/proc/self/status') as f:
+        rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:'))
+except OSError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss *= 1 if sys.platform == 'darwin' else 1024
+
+heavy = ('numpy', 'scipy', 'sklearn', 'pandas')
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_bytes': rss,
+    'modules': len(sys.modules),
+    'heavy': [name for name in heavy if name in sys.modules],
+}}))
+'''
+
+SCENARIOS = (
+    ('worker startup', ''),
+    ('after first recommendation', 'import jobs.ml_recommender, jobs.similar_jobs'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure worker import time and RSS with and without the recommender stack loaded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Fresh interpreters per scenario; medians are reported')
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, extra in SCENARIOS:
+            runs = [self.probe(extra) for _ in range(options['repeat'])]
+            results[name] = {
+                'seconds': statistics.median(run['seconds'] for run in runs),
+                'rss_bytes': statistics.median(run['rss_bytes'] for run in runs),
+                'modules': runs[-1]['modules'],
+                'heavy': runs[-1]['heavy'],
+            }
+            self.stdout.write(
+                f"{name:<28}{results[name]['seconds'] * 1000:8.0f} ms"
+                f"{results[name]['rss_bytes'] / 2 ** 20:8.1f} MiB"
+                f"{results[name]['modules']:6d} modules"
+                f"  heavy: {', '.join(results[name]['heavy']) or '-'}"
+            )
+
+        lazy, loaded = results['worker startup'], results['after first recommendation']
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved per worker that never computes a recommendation: "
+            f"{(loaded['seconds'] - lazy['seconds']) * 1000:.0f} ms, "
+            f"{(loaded['rss_bytes'] - lazy['rss_bytes']) / 2 ** 20:.1f} MiB"
+        ))
+
+    def probe(self, extra):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(extra=extra)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
@@ -0,0 +1,61 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.ml_recommender import precompute_job_recommendations
+from jobs.models import UserProfile
+
+
+def _init_worker():
+    django.setup()
+    # Never reuse a connection inherited from the parent process
+    connections.close_all()
+
+
+def _process_chunk(user_ids, count):
+    return len(user_ids), precompute_job_recommendations(user_ids, count=count)
+
+
+class Command(BaseCommand):
+    help = 'Precompute job recommendations for all job seekers into JobRecommendation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=12,
+                            help='Recommendations to store per user')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Users per KNN batch')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes; 1 runs in-process')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        chunk_size = options['chunk_size']
+        user_ids = list(
+            UserProfile.objects.filter(user_type='seeker')
+            .order_by('user_id')
+            .values_list('user_id', flat=True)
+        )
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+        if options['workers'] > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                results = pool.map(_process_chunk, chunks, [count] * len(chunks))
+                totals = self._report(results, len(chunks))
+        else:
+            totals = self._report((_process_chunk(chunk, count) for chunk in chunks), len(chunks))
+
+        users, rows = totals
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {rows} recommendations for {users} job seekers'
+        ))
+
+    def _report(self, results, n_chunks):
+        users = rows = 0
+        for done, (chunk_users, chunk_rows) in enumerate(results, start=1):
+            users += chunk_users
+            rows += chunk_rows
+            self.stdout.write(f'Chunk {done}/{n_chunks}: {chunk_users} users')
+        return users, rows
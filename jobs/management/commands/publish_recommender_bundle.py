@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs.artifacts import publish_bundle
+from jobs.feature_store import CandidateFeatureStore, JobFeatureStore
+
+
+class Command(BaseCommand):
+    help = 'Build the job and candidate feature matrices and publish them as a new shared bundle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=3,
+                            help='Number of bundle versions to keep on disk')
+
+    def handle(self, *args, **options):
+        created_at = timezone.now()
+        arrays, metadata = {}, {}
+        for store in (JobFeatureStore(), CandidateFeatureStore()):
+            store.load()
+            store_arrays, store_metadata = store.export()
+            arrays.update(store_arrays)
+            metadata.update(store_metadata)
+            self.stdout.write(f'{store.bundle_prefix}: {len(store)} rows')
+
+        version = publish_bundle(arrays, metadata, created_at=created_at, keep=options['keep'])
+        self.stdout.write(self.style.SUCCESS(f'Published recommender bundle {version}'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.collaborative import CollaborativeModel, model_path
+
+
+class Command(BaseCommand):
+    help = 'Train collaborative-filtering factors from applications and saved jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=32,
+                            help='Number of latent factors')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        model = CollaborativeModel.train(n_factors=options['factors'])
+        if model is None:
+            self.stdout.write(self.style.WARNING('Not enough interactions to train on'))
+            return
+
+        path = model_path()
+        model.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Trained {model.n_factors} factors for {len(model.user_ids)} seekers and '
+            f'{len(model.job_ids)} jobs in {time.monotonic() - started:.1f}s -> {path}'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 00:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Formerly created and filled a Location table of normalized location names.
+
+    The recommenders encode locations as gazetteer coordinates since 0007,
+    which drops the table where an earlier version of this migration made it.
+    Kept empty so databases that applied it keep a consistent history.
+    """
+
+    dependencies = [
+        ('jobs', '0002_jobrecommendation'),
+    ]
+
+    operations = []
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 00:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0003_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_jobs', to='jobs.job')),
+                ('similar_job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='jobs.job')),
+            ],
+            options={
+                'ordering': ['job', 'rank'],
+                'unique_together': {('job', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 6.0 on 2026-10-17 01:10
+
+from django.db import migrations
+
+
+# External-content FTS5 index over jobs_job, kept in sync by triggers so
+# bulk_create and queryset.update() are covered as well as save()
+CREATE_TABLE = """
+    CREATE VIRTUAL TABLE jobs_job_fts USING fts5(
+        title, company_name, description, requirements, skills_required,
+        content='jobs_job', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+"""
+
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER jobs_job_fts_insert AFTER INSERT ON jobs_job BEGIN
+        INSERT INTO jobs_job_fts(rowid, title, company_name, description, requirements, skills_required)
+        VALUES (new.id, new.title, new.company_name, new.description, new.requirements, new.skills_required);
+    END
+    """,
+    """
+    CREATE TRIGGER jobs_job_fts_delete AFTER DELETE ON jobs_job BEGIN
+        INSERT INTO jobs_job_fts(jobs_job_fts, rowid, title, company_name, description, requirements, skills_required)
+        VALUES ('delete', old.id, old.title, old.company_name, old.description, old.requirements, old.skills_required);
+    END
+    """,
+    """
+    CREATE TRIGGER jobs_job_fts_update
+    AFTER UPDATE OF title, company_name, description, requirements, skills_required ON jobs_job BEGIN
+        INSERT INTO jobs_job_fts(jobs_job_fts, rowid, title, company_name, description, requirements, skills_required)
+        VALUES ('delete', old.id, old.title, old.company_name, old.description, old.requirements, old.skills_required);
+        INSERT INTO jobs_job_fts(rowid, title, company_name, description, requirements, skills_required)
+        VALUES (new.id, new.title, new.company_name, new.description, new.requirements, new.skills_required);
+    END
+    """,
+]
+
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS jobs_job_fts_insert',
+    'DROP TRIGGER IF EXISTS jobs_job_fts_delete',
+    'DROP TRIGGER IF EXISTS jobs_job_fts_update',
+]
+
+REBUILD_INDEX = "INSERT INTO jobs_job_fts(jobs_job_fts) VALUES ('rebuild')"
+
+
+def has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def create_search_index(apps, schema_editor):
+    # Other backends, and SQLite builds without FTS5, search with icontains
+    if has_fts5(schema_editor.connection):
+        schema_editor.execute(CREATE_TABLE)
+        for statement in CREATE_TRIGGERS:
+            schema_editor.execute(statement)
+        schema_editor.execute(REBUILD_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_TRIGGERS:
+            schema_editor.execute(statement)
+        schema_editor.execute('DROP TABLE IF EXISTS jobs_job_fts')
+
+
+def restore_search_triggers(apps, schema_editor):
+    """Recreate the triggers and reindex after a migration rebuilt jobs_job.
+
+    SQLite alters a column by copying the table, which drops its
+    triggers, so the later migrations that add fields to Job call this
+    after them. Rows written in between are picked up by the rebuild.
+    """
+    connection = schema_editor.connection
+    if has_fts5(connection) and 'jobs_job_fts' in connection.introspection.table_names():
+        for statement in DROP_TRIGGERS + CREATE_TRIGGERS:
+            schema_editor.execute(statement)
+        schema_editor.execute(REBUILD_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0004_similarjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 6.0 on 2026-10-17 01:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# auth_user belongs to django.contrib.auth, so its index for the admin users
+# table (newest first) is added here rather than through a model Meta
+USER_JOINED_INDEX = models.Index(fields=['-date_joined', '-id'], name='user_joined_idx')
+
+
+def add_user_joined_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), USER_JOINED_INDEX)
+
+
+def remove_user_joined_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), USER_JOINED_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0005_job_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['status', '-applied_date', '-id'], name='application_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['-applied_date', '-id'], name='application_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(condition=models.Q(('is_resolved', False)), fields=['-created_at', '-id'], name='contact_unresolved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['-created_at', '-id'], name='contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-posted_date', '-id'], name='job_active_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-posted_date', '-id'], name='job_active_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['job_type', '-posted_date', '-id'], name='job_active_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['-posted_date', '-id'], name='job_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['user_type'], name='profile_user_type_idx'),
+        ),
+        migrations.RunPython(add_user_joined_index, remove_user_joined_index),
+    ]
@@ -0,0 +1,353 @@
+# Generated by Django 6.0 on 2026-10-17 01:15
+
+import csv
+import io
+import re
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copies of jobs/data/gazetteer.csv and the jobs.geo geocoding as of
+# this migration, which must not change with the live gazetteer
+GAZETTEER = """\
+name,country,latitude,longitude,aliases
+New York,US,40.7128,-74.0060,new york city|nyc|new york ny|manhattan|ny
+Brooklyn,US,40.6782,-73.9442,brooklyn ny
+Jersey City,US,40.7178,-74.0431,jersey city nj
+Newark,US,40.7357,-74.1724,newark nj
+Boston,US,42.3601,-71.0589,boston ma
+Cambridge MA,US,42.3736,-71.1097,"cambridge, ma|cambridge, massachusetts"
+Philadelphia,US,39.9526,-75.1652,philly|philadelphia pa
+Pittsburgh,US,40.4406,-79.9959,
+Washington,US,38.9072,-77.0369,"washington dc|washington, d.c.|dc|d.c."
+Baltimore,US,39.2904,-76.6122,
+Arlington VA,US,38.8816,-77.0910,"arlington, va|arlington, virginia"
+Raleigh,US,35.7796,-78.6382,
+Durham,US,35.9940,-78.8986,"durham, nc"
+Charlotte,US,35.2271,-80.8431,
+Atlanta,US,33.7490,-84.3880,atl
+Miami,US,25.7617,-80.1918,
+Orlando,US,28.5383,-81.3792,
+Tampa,US,27.9506,-82.4572,
+Jacksonville,US,30.3322,-81.6557,
+Nashville,US,36.1627,-86.7816,
+Chicago,US,41.8781,-87.6298,chi
+Detroit,US,42.3314,-83.0458,
+Columbus,US,39.9612,-82.9988,"columbus, oh"
+Cleveland,US,41.4993,-81.6944,
+Cincinnati,US,39.1031,-84.5120,
+Indianapolis,US,39.7684,-86.1581,
+Milwaukee,US,43.0389,-87.9065,
+Minneapolis,US,44.9778,-93.2650,twin cities|minneapolis-saint paul
+St. Louis,US,38.6270,-90.1994,saint louis|st louis
+Kansas City,US,39.0997,-94.5786,
+Denver,US,39.7392,-104.9903,
+Boulder,US,40.0150,-105.2705,
+Salt Lake City,US,40.7608,-111.8910,slc
+Phoenix,US,33.4484,-112.0740,
+Las Vegas,US,36.1699,-115.1398,vegas
+Dallas,US,32.7767,-96.7970,dallas-fort worth|dfw
+Fort Worth,US,32.7555,-97.3308,
+Houston,US,29.7604,-95.3698,
+Austin,US,30.2672,-97.7431,"austin, tx|austin, texas"
+San Antonio,US,29.4241,-98.4936,
+Los Angeles,US,34.0522,-118.2437,la|l.a.|los angeles ca
+San Diego,US,32.7157,-117.1611,
+Irvine,US,33.6846,-117.8265,
+San Francisco,US,37.7749,-122.4194,sf|san francisco ca|san francisco bay area|bay area|sf bay area
+Oakland,US,37.8044,-122.2712,
+San Jose,US,37.3382,-121.8863,"san jose, ca|silicon valley"
+Palo Alto,US,37.4419,-122.1430,
+Mountain View,US,37.3861,-122.0839,
+Sunnyvale,US,37.3688,-122.0363,
+Sacramento,US,38.5816,-121.4944,
+Portland,US,45.5152,-122.6784,"portland, or|portland, oregon"
+Seattle,US,47.6062,-122.3321,seattle wa
+Redmond,US,47.6740,-122.1215,
+Anchorage,US,61.2181,-149.9003,
+Honolulu,US,21.3069,-157.8583,
+Toronto,CA,43.6532,-79.3832,gta|greater toronto area|toronto on
+Ottawa,CA,45.4215,-75.6972,
+Montreal,CA,45.5017,-73.5673,montréal
+Quebec City,CA,46.8139,-71.2080,québec|quebec
+Vancouver,CA,49.2827,-123.1207,"vancouver, bc"
+Calgary,CA,51.0447,-114.0719,
+Edmonton,CA,53.5461,-113.4938,
+Winnipeg,CA,49.8951,-97.1384,
+Waterloo ON,CA,43.4643,-80.5204,"waterloo, on|waterloo, ontario|kitchener-waterloo"
+London Ontario,CA,42.9849,-81.2453,"london, on|london, ontario"
+Halifax,CA,44.6488,-63.5752,
+Mexico City,MX,19.4326,-99.1332,cdmx|ciudad de méxico
+Guadalajara,MX,20.6597,-103.3496,
+Monterrey,MX,25.6866,-100.3161,
+Bogota,CO,4.7110,-74.0721,bogotá
+Medellin,CO,6.2442,-75.5812,medellín
+Lima,PE,-12.0464,-77.0428,
+Santiago,CL,-33.4489,-70.6693,santiago de chile
+Buenos Aires,AR,-34.6037,-58.3816,
+Sao Paulo,BR,-23.5505,-46.6333,são paulo
+Rio de Janeiro,BR,-22.9068,-43.1729,rio
+Montevideo,UY,-34.9011,-56.1645,
+London,GB,51.5074,-0.1278,greater london|city of london|london uk|london england|london united kingdom|ldn
+Manchester,GB,53.4808,-2.2426,greater manchester
+Birmingham,GB,52.4862,-1.8904,"birmingham, uk"
+Leeds,GB,53.8008,-1.5491,
+Liverpool,GB,53.4084,-2.9916,
+Bristol,GB,51.4545,-2.5879,
+Sheffield,GB,53.3811,-1.4701,
+Newcastle,GB,54.9783,-1.6178,newcastle upon tyne
+Nottingham,GB,52.9548,-1.1581,
+Cambridge,GB,52.2053,0.1218,"cambridge, uk"
+Oxford,GB,51.7520,-1.2577,
+Reading,GB,51.4543,-0.9781,
+Brighton,GB,50.8225,-0.1372,
+Edinburgh,GB,55.9533,-3.1883,
+Glasgow,GB,55.8642,-4.2518,
+Cardiff,GB,51.4816,-3.1791,
+Belfast,GB,54.5973,-5.9301,
+Dublin,IE,53.3498,-6.2603,"dublin, ireland|baile átha cliath"
+Cork,IE,51.8985,-8.4756,
+Galway,IE,53.2707,-9.0568,
+Paris,FR,48.8566,2.3522,paris france|île-de-france|ile-de-france
+Lyon,FR,45.7640,4.8357,
+Marseille,FR,43.2965,5.3698,
+Toulouse,FR,43.6047,1.4442,
+Nice,FR,43.7102,7.2620,
+Bordeaux,FR,44.8378,-0.5792,
+Lille,FR,50.6292,3.0573,
+Nantes,FR,47.2184,-1.5536,
+Brussels,BE,50.8503,4.3517,bruxelles|brussel
+Antwerp,BE,51.2194,4.4025,antwerpen
+Amsterdam,NL,52.3676,4.9041,
+Rotterdam,NL,51.9244,4.4777,
+The Hague,NL,52.0705,4.3007,den haag|'s-gravenhage
+Utrecht,NL,52.0907,5.1214,
+Eindhoven,NL,51.4416,5.4697,
+Luxembourg,LU,49.6116,6.1319,luxembourg city
+Berlin,DE,52.5200,13.4050,berlin germany
+Hamburg,DE,53.5511,9.9937,
+Munich,DE,48.1351,11.5820,münchen|muenchen
+Frankfurt,DE,50.1109,8.6821,frankfurt am main
+Cologne,DE,50.9375,6.9603,köln|koeln
+Dusseldorf,DE,51.2277,6.7735,düsseldorf|duesseldorf
+Stuttgart,DE,48.7758,9.1829,
+Leipzig,DE,51.3397,12.3731,
+Dresden,DE,51.0504,13.7373,
+Zurich,CH,47.3769,8.5417,zürich
+Geneva,CH,46.2044,6.1432,genève|genf
+Basel,CH,47.5596,7.5886,
+Vienna,AT,48.2082,16.3738,wien
+Prague,CZ,50.0755,14.4378,praha
+Warsaw,PL,52.2297,21.0122,warszawa
+Krakow,PL,50.0647,19.9450,kraków|cracow
+Wroclaw,PL,51.1079,17.0385,wrocław
+Budapest,HU,47.4979,19.0402,
+Bucharest,RO,44.4268,26.1025,bucurești
+Sofia,BG,42.6977,23.3219,
+Belgrade,RS,44.7866,20.4489,beograd
+Zagreb,HR,45.8150,15.9819,
+Athens,GR,37.9838,23.7275,athína
+Istanbul,TR,41.0082,28.9784,
+Ankara,TR,39.9334,32.8597,
+Madrid,ES,40.4168,-3.7038,
+Barcelona,ES,41.3851,2.1734,
+Valencia,ES,39.4699,-0.3763,
+Seville,ES,37.3891,-5.9845,sevilla
+Malaga,ES,36.7213,-4.4214,málaga
+Lisbon,PT,38.7223,-9.1393,lisboa
+Porto,PT,41.1579,-8.6291,oporto
+Rome,IT,41.9028,12.4964,roma
+Milan,IT,45.4642,9.1900,milano
+Turin,IT,45.0703,7.6869,torino
+Naples,IT,40.8518,14.2681,napoli
+Bologna,IT,44.4949,11.3426,
+Florence,IT,43.7696,11.2558,firenze
+Copenhagen,DK,55.6761,12.5683,københavn|kobenhavn
+Aarhus,DK,56.1629,10.2039,
+Stockholm,SE,59.3293,18.0686,
+Gothenburg,SE,57.7089,11.9746,göteborg|goteborg
+Malmo,SE,55.6050,13.0038,malmö
+Oslo,NO,59.9139,10.7522,
+Bergen,NO,60.3913,5.3221,
+Helsinki,FI,60.1699,24.9384,
+Tallinn,EE,59.4370,24.7536,
+Riga,LV,56.9496,24.1052,
+Vilnius,LT,54.6872,25.2797,
+Reykjavik,IS,64.1466,-21.9426,reykjavík
+Kyiv,UA,50.4501,30.5234,kiev
+Tel Aviv,IL,32.0853,34.7818,tel aviv-yafo|tel-aviv
+Jerusalem,IL,31.7683,35.2137,
+Dubai,AE,25.2048,55.2708,
+Abu Dhabi,AE,24.4539,54.3773,
+Doha,QA,25.2854,51.5310,
+Riyadh,SA,24.7136,46.6753,
+Cairo,EG,30.0444,31.2357,
+Lagos,NG,6.5244,3.3792,
+Nairobi,KE,-1.2921,36.8219,
+Accra,GH,5.6037,-0.1870,
+Johannesburg,ZA,-26.2041,28.0473,joburg|jozi
+Cape Town,ZA,-33.9249,18.4241,
+Casablanca,MA,33.5731,-7.5898,
+Mumbai,IN,19.0760,72.8777,bombay
+Pune,IN,18.5204,73.8567,
+Delhi,IN,28.7041,77.1025,new delhi|ncr|delhi ncr
+Gurgaon,IN,28.4595,77.0266,gurugram
+Noida,IN,28.5355,77.3910,
+Bangalore,IN,12.9716,77.5946,bengaluru|bangalore india
+Hyderabad,IN,17.3850,78.4867,"hyderabad, india"
+Chennai,IN,13.0827,80.2707,madras
+Kolkata,IN,22.5726,88.3639,calcutta
+Ahmedabad,IN,23.0225,72.5714,
+Kochi,IN,9.9312,76.2673,cochin
+Karachi,PK,24.8607,67.0011,
+Lahore,PK,31.5204,74.3587,
+Dhaka,BD,23.8103,90.4125,
+Colombo,LK,6.9271,79.8612,
+Singapore,SG,1.3521,103.8198,singapore city
+Kuala Lumpur,MY,3.1390,101.6869,kl
+Bangkok,TH,13.7563,100.5018,
+Ho Chi Minh City,VN,10.8231,106.6297,saigon|hcmc
+Hanoi,VN,21.0278,105.8342,
+Jakarta,ID,-6.2088,106.8456,
+Manila,PH,14.5995,120.9842,metro manila
+Hong Kong,HK,22.3193,114.1694,hk
+Shenzhen,CN,22.5431,114.0579,
+Guangzhou,CN,23.1291,113.2644,canton
+Shanghai,CN,31.2304,121.4737,
+Beijing,CN,39.9042,116.4074,peking
+Hangzhou,CN,30.2741,120.1551,
+Chengdu,CN,30.5728,104.0668,
+Taipei,TW,25.0330,121.5654,
+Seoul,KR,37.5665,126.9780,
+Busan,KR,35.1796,129.0756,
+Tokyo,JP,35.6762,139.6503,
+Osaka,JP,34.6937,135.5023,
+Kyoto,JP,35.0116,135.7681,
+Sydney,AU,-33.8688,151.2093,sydney nsw
+Melbourne,AU,-37.8136,144.9631,"melbourne, vic"
+Brisbane,AU,-27.4698,153.0251,
+Perth,AU,-31.9505,115.8605,
+Adelaide,AU,-34.9285,138.6007,
+Canberra,AU,-35.2809,149.1300,
+Auckland,NZ,-36.8485,174.7633,
+Wellington,NZ,-41.2865,174.7762,
+"""
+
+WHITESPACE = re.compile(r'\s+')
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def normalize_location(name):
+    return WHITESPACE.sub(' ', (name or '').strip()).casefold()
+
+
+def encode_geohash(latitude, longitude):
+    bounds = [[-90.0, 90.0], [-180.0, 180.0]]
+    value = (latitude, longitude)
+    chars, bits, n_bits, axis = [], 0, 0, 1  # Geohash starts with a longitude bit
+    while len(chars) < GEOHASH_PRECISION:
+        low, high = bounds[axis]
+        middle = (low + high) / 2
+        bits <<= 1
+        if value[axis] >= middle:
+            bits |= 1
+            bounds[axis][0] = middle
+        else:
+            bounds[axis][1] = middle
+        axis, n_bits = 1 - axis, n_bits + 1
+        if n_bits == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, n_bits = 0, 0
+    return ''.join(chars)
+
+
+def read_gazetteer():
+    """{normalized name or alias: (latitude, longitude, geohash)}"""
+    places = {}
+    for row in csv.DictReader(io.StringIO(GAZETTEER)):
+        latitude, longitude = float(row['latitude']), float(row['longitude'])
+        place = (latitude, longitude, encode_geohash(latitude, longitude))
+        for name in [row['name'], *row['aliases'].split('|')]:
+            if name:
+                places.setdefault(normalize_location(name), place)
+    return places
+
+
+def geocode(places, text):
+    """The whole text first, then with trailing comma separated parts dropped"""
+    parts = [part.strip() for part in normalize_location(text).split(',')]
+    for end in range(len(parts), 0, -1):
+        place = places.get(', '.join(parts[:end]))
+        if place is not None:
+            return place
+    return None, None, ''
+
+
+def geocode_locations(apps, schema_editor):
+    # Later gazetteer changes are applied with `manage.py geocode_locations`
+    places = read_gazetteer()
+    for model in ('Job', 'UserProfile'):
+        rows = apps.get_model('jobs', model).objects.all()
+        # One UPDATE per distinct location
+        for location in rows.values_list('location', flat=True).distinct().order_by():
+            latitude, longitude, geohash = geocode(places, location)
+            rows.filter(location=location).update(latitude=latitude, longitude=longitude, geohash=geohash)
+
+
+# Adding fields rebuilds jobs_job on SQLite, dropping the full-text search triggers
+search_index = import_module('jobs.migrations.0005_job_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0006_access_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Unapplying the AddFields below rebuilds the table again; restore the triggers after them
+        migrations.RunPython(migrations.RunPython.noop, search_index.restore_search_triggers),
+        migrations.AddField(
+            model_name='job',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(search_index.restore_search_triggers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['geohash'], name='job_active_geohash_idx'),
+        ),
+        migrations.RunPython(geocode_locations, migrations.RunPython.noop),
+        # Location ids were arbitrary codes for the recommenders, now replaced by coordinates.
+        # 0003 no longer creates the table, so only databases that applied its old version have one.
+        migrations.RunSQL('DROP TABLE IF EXISTS jobs_location', migrations.RunSQL.noop),
+    ]
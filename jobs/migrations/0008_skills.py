@@ -0,0 +1,165 @@
+# Generated by Django 6.0 on 2026-10-17 01:22
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of jobs.skills as of this migration, which must not change
+# with the live alias table or tokenizer
+SKILL_ALIASES = {
+    'js': 'javascript',
+    'ts': 'typescript',
+    'reactjs': 'react',
+    'react.js': 'react',
+    'node': 'node.js',
+    'nodejs': 'node.js',
+    'vuejs': 'vue',
+    'vue.js': 'vue',
+    'postgres': 'postgresql',
+    'psql': 'postgresql',
+    'golang': 'go',
+    'ml': 'machine learning',
+    'ai': 'artificial intelligence',
+    'k8s': 'kubernetes',
+    'ms excel': 'excel',
+    'microsoft excel': 'excel',
+    'c sharp': 'c#',
+    'cpp': 'c++',
+}
+
+SKILL_SEPARATORS = re.compile(r'[,;\n]')
+WHITESPACE = re.compile(r'\s+')
+MAX_SKILL_LENGTH = 100
+BATCH_SIZE = 1000
+
+
+def tokenize_skills(text):
+    """Split comma separated skill text into unique canonical skills"""
+    if not text:
+        return []
+    skills = (WHITESPACE.sub(' ', skill.strip().lower()) for skill in SKILL_SEPARATORS.split(text))
+    skills = (SKILL_ALIASES.get(skill, skill) for skill in skills)
+    return list(dict.fromkeys(skill for skill in skills if skill and len(skill) <= MAX_SKILL_LENGTH))
+
+
+def seed_aliases(apps, schema_editor):
+    Skill = apps.get_model('jobs', 'Skill')
+    SkillAlias = apps.get_model('jobs', 'SkillAlias')
+    Skill.objects.bulk_create([Skill(name=name) for name in sorted(set(SKILL_ALIASES.values()))])
+    skill_ids = dict(Skill.objects.values_list('name', 'id'))
+    SkillAlias.objects.bulk_create([
+        SkillAlias(name=alias, skill_id=skill_ids[name]) for alias, name in sorted(SKILL_ALIASES.items())
+    ])
+
+
+def link_owners(Skill, owners, text_field, link_model, owner_field):
+    """Link every owner to the skills of its text, BATCH_SIZE owners at a time.
+
+    The link tables are new, so links are only ever added; aliases were
+    already folded by tokenize_skills.
+    """
+    last_id = 0
+    while True:
+        rows = list(owners.filter(pk__gt=last_id).order_by('pk').values_list('pk', text_field)[:BATCH_SIZE])
+        if not rows:
+            return
+        names = {owner_id: tokenize_skills(text) for owner_id, text in rows}
+        wanted = {name for owner_names in names.values() for name in owner_names}
+        skill_ids = dict(Skill.objects.filter(name__in=wanted).values_list('name', 'id'))
+        Skill.objects.bulk_create([Skill(name=name) for name in sorted(wanted - skill_ids.keys())])
+        skill_ids.update(Skill.objects.filter(name__in=wanted - skill_ids.keys()).values_list('name', 'id'))
+        link_model.objects.bulk_create([
+            link_model(**{f'{owner_field}_id': owner_id, 'skill_id': skill_ids[name]})
+            for owner_id, owner_names in names.items() for name in owner_names
+        ])
+        last_id = rows[-1][0]
+
+
+def link_skills(apps, schema_editor):
+    # Repeated later, e.g. after merging skills, with `manage.py backfill_skills`
+    Skill = apps.get_model('jobs', 'Skill')
+    link_owners(
+        Skill, apps.get_model('jobs', 'Job').objects.all(), 'skills_required',
+        apps.get_model('jobs', 'JobSkill'), 'job',
+    )
+    link_owners(
+        Skill, apps.get_model('jobs', 'UserProfile').objects.all(), 'skills',
+        apps.get_model('jobs', 'ProfileSkill'), 'profile',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0007_job_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Normalized lowercase name', max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='skill_links', to='jobs.userprofile')),
+                ('skill', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='profile_links', to='jobs.skill')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='skill_links', to='jobs.job')),
+                ('skill', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='job_links', to='jobs.skill')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='skill_set',
+            field=models.ManyToManyField(blank=True, related_name='jobs', through='jobs.JobSkill', to='jobs.skill'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='skill_set',
+            field=models.ManyToManyField(blank=True, related_name='profiles', through='jobs.ProfileSkill', to='jobs.skill'),
+        ),
+        migrations.CreateModel(
+            name='SkillAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Normalized lowercase name', max_length=100, unique=True)),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='jobs.skill')),
+            ],
+            options={
+                'verbose_name_plural': 'skill aliases',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='profileskill',
+            index=models.Index(fields=['skill', 'profile'], name='profile_skill_skill_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='profileskill',
+            unique_together={('profile', 'skill')},
+        ),
+        migrations.AddIndex(
+            model_name='jobskill',
+            index=models.Index(fields=['skill', 'job'], name='job_skill_skill_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='jobskill',
+            unique_together={('job', 'skill')},
+        ),
+        migrations.RunPython(seed_aliases, migrations.RunPython.noop),
+        migrations.RunPython(link_skills, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 6.0 on 2026-10-17 01:25
+
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copy of jobs.salary as of this migration
+SALARY_BAND_WIDTH = 10000
+MAX_SALARY_BAND = 30
+BATCH_SIZE = 1000
+
+
+def derive_salary_columns(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    last_id = 0
+    while True:
+        jobs = list(
+            Job.objects.filter(pk__gt=last_id).order_by('pk').only('salary_min', 'salary_max')[:BATCH_SIZE]
+        )
+        if not jobs:
+            return
+        for job in jobs:
+            bounds = [bound for bound in (job.salary_min, job.salary_max) if bound]
+            job.salary_mid = int(round(sum(bounds) / len(bounds))) if bounds else 0
+            job.salary_band = min(job.salary_mid // SALARY_BAND_WIDTH, MAX_SALARY_BAND) if job.salary_mid else None
+        Job.objects.bulk_update(jobs, ['salary_mid', 'salary_band'])
+        last_id = jobs[-1].pk
+
+
+# Adding fields rebuilds jobs_job on SQLite, dropping the full-text search triggers
+search_index = import_module('jobs.migrations.0005_job_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0008_skills'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Unapplying the AddFields below rebuilds the table again; restore the triggers after them
+        migrations.RunPython(migrations.RunPython.noop, search_index.restore_search_triggers),
+        migrations.AddField(
+            model_name='job',
+            name='salary_band',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_mid',
+            field=models.IntegerField(default=0, editable=False, help_text='Midpoint, 0 when no salary is given'),
+        ),
+        migrations.RunPython(search_index.restore_search_triggers, migrations.RunPython.noop),
+        # Filled before the indexes are built, rather than updating them row by row
+        migrations.RunPython(derive_salary_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['salary_mid', 'id'], name='job_active_salary_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['salary_band'], name='job_active_band_idx'),
+        ),
+    ]
@@ -1,121 +1,268 @@
+from collections import defaultdict
+
 import numpy as np
-import pandas as pd
-from sklearn.neighbors import NearestNeighbors
-from sklearn.preprocessing import StandardScaler
-from django.db.models import Count, Q
-from .models import Job, Application, SavedJob, UserProfile
+from django.conf import settings
+from django.db import transaction
+
+from . import collaborative
+from .caching import (
+    RECOMMENDATION_CACHE_SIZE,
+    get_cached_candidates,
+    get_cached_recommendations,
+    get_job_set_version,
+    get_seeker_set_version,
+    set_cached_candidates,
+    set_cached_recommendations,
+)
+from .candidate_pipeline import CandidatePipeline, seeker_filter_index
+from .feature_store import candidate_store, encode_categorical, job_store, link_count
+from .geo import sphere_coordinates
+from .models import Job, Application, JobSkill, SavedJob, UserProfile, JobRecommendation
+from .profiling import count_event, record_size, stage
+from .skill_matcher import skill_matcher
+from .skills import tokenize_skills
+
+
+# Candidates fetched per requested slot in recommend_for_jobs, to leave room
+# for de-duplication across jobs
+DEDUPLICATION_OVERFETCH = 3
+
+
+def most_common_per_row(rows, codes, n_codes, n_rows):
+    """Most frequent code for each row index, vectorized over all rows"""
+    counts = np.bincount(
+        rows * n_codes + codes.astype(np.int64), minlength=n_rows * n_codes
+    ).reshape(n_rows, n_codes)
+    return counts.argmax(axis=1)
 
 
 class JobRecommender:
     """KNN-based job recommendation system for job seekers"""
     
-    def __init__(self):
+    def __init__(self, store=None):
         self.model = None
-        self.scaler = StandardScaler()
-        self.job_features = None
+        self.store = job_store if store is None else store
+        self.scaler = None
         self.job_ids = None
         
     def prepare_job_features(self, jobs):
-        """Convert jobs into numerical features for KNN"""
-        features = []
-        job_ids = []
-        
-        categories = list(set([job.category for job in jobs]))
-        job_types = list(set([job.job_type for job in jobs]))
-        locations = list(set([job.location for job in jobs]))
-        
-        for job in jobs:
-            category_encoded = categories.index(job.category)
-            job_type_encoded = job_types.index(job.job_type)
-            location_encoded = locations.index(job.location) if job.location in locations else 0
-            
-            experience = job.experience_required
-            salary = (job.salary_min + job.salary_max) / 2 if job.salary_min and job.salary_max else 0
+        """Convert a job queryset into numerical features for KNN"""
+        job_ids, features = self.store.build_features(jobs.values_list(*self.store.columns))
+        return features, job_ids.tolist()
+    
+    def prepare_user_preference_matrix(self, user_ids):
+        """Build preference vectors for many users at once.
+        
+        Preferences come from each user's profile and the jobs they applied
+        to: the most common category and job type, the average experience
+        required, and the coordinates of the profile location (or of the
+        most recent applied job's). Returns (user_ids, matrix) for users
+        with a profile.
+        """
+        with stage('query'):
+            profiles = list(UserProfile.objects.filter(user_id__in=user_ids).values_list(
+                'user_id', 'experience_years', 'latitude', 'longitude'
+            ).order_by('user_id'))
+        if not profiles:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.store.n_features))
+        
+        profile_ids, experience, latitudes, longitudes = zip(*profiles)
+        profile_ids = np.asarray(profile_ids, dtype=np.int64)
+        n_users = len(profile_ids)
+        category = np.full(n_users, self.store.categories['it'], dtype=float)
+        job_type = np.full(n_users, self.store.job_types['full-time'], dtype=float)
+        experience = np.asarray(experience, dtype=float)
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        
+        # Newest first, so the first row per user is their latest application
+        with stage('query'):
+            applied = list(Application.objects.filter(applicant_id__in=profile_ids.tolist()).values_list(
+                'applicant_id', 'job__category', 'job__job_type',
+                'job__experience_required', 'job__latitude', 'job__longitude'
+            ).order_by('-applied_date'))
+        if applied:
+            (applicant_ids, categories, job_types, applied_experience,
+             applied_latitudes, applied_longitudes) = zip(*applied)
+            rows = np.searchsorted(profile_ids, np.asarray(applicant_ids, dtype=np.int64))
+            counts = np.bincount(rows, minlength=n_users)
+            has_applied = counts > 0
             
-            feature_vector = [
-                category_encoded,
-                job_type_encoded,
-                experience,
-                salary,
-                location_encoded
-            ]
+            category[has_applied] = most_common_per_row(
+                rows, encode_categorical(categories, self.store.categories), len(self.store.categories), n_users
+            )[has_applied]
+            job_type[has_applied] = most_common_per_row(
+                rows, encode_categorical(job_types, self.store.job_types), len(self.store.job_types), n_users
+            )[has_applied]
+            experience_sum = np.bincount(rows, weights=np.asarray(applied_experience, dtype=float), minlength=n_users)
+            experience[has_applied] = experience_sum[has_applied] / counts[has_applied]
             
-            features.append(feature_vector)
-            job_ids.append(job.id)
-        
-        return np.array(features), job_ids
+            first_rows, first_index = np.unique(rows, return_index=True)
+            missing = np.isnan(latitudes[first_rows])
+            latitudes[first_rows[missing]] = np.asarray(applied_latitudes, dtype=float)[first_index][missing]
+            longitudes[first_rows[missing]] = np.asarray(applied_longitudes, dtype=float)[first_index][missing]
+        
+        matrix = np.column_stack([
+            category,
+            job_type,
+            experience,
+            np.zeros(n_users),
+            sphere_coordinates(latitudes, longitudes),
+        ])
+        return profile_ids, matrix
     
-    def prepare_user_preferences(self, user):
-        """Extract user preferences based on their profile and activity"""
-        profile = user.profile
-        applications = Application.objects.filter(applicant=user)
-        
-        if applications.exists():
-            applied_jobs = [app.job for app in applications]
-            categories = [job.category for job in applied_jobs]
-            most_common_category = max(set(categories), key=categories.count) if categories else 'it'
-            avg_experience = sum([job.experience_required for job in applied_jobs]) / len(applied_jobs)
-            job_types = [job.job_type for job in applied_jobs]
-            most_common_type = max(set(job_types), key=job_types.count) if job_types else 'full-time'
-            preferred_location = profile.location if profile.location else applied_jobs[0].location
-        else:
-            most_common_category = 'it'
-            avg_experience = profile.experience_years
-            most_common_type = 'full-time'
-            preferred_location = profile.location if profile.location else ''
-        
-        return {
-            'category': most_common_category,
-            'job_type': most_common_type,
-            'experience': avg_experience,
-            'location': preferred_location
-        }
+    def get_excluded_job_ids(self, user_ids):
+        """Map each user id to the set of jobs they already applied to or saved"""
+        excluded = defaultdict(set)
+        with stage('query'):
+            for user_id, job_id in Application.objects.filter(
+                applicant_id__in=user_ids
+            ).values_list('applicant_id', 'job_id').order_by():
+                excluded[user_id].add(job_id)
+            for user_id, job_id in SavedJob.objects.filter(
+                user_id__in=user_ids
+            ).values_list('user_id', 'job_id').order_by():
+                excluded[user_id].add(job_id)
+        return excluded
+    
+    def recommend_for_users(self, user_ids, n_recommendations=6):
+        """Recommend jobs for many users with a single multi-query KNN.
+        
+        Users whose skills match jobs in the skill matcher get the
+        feature-distance score blended with skill similarity, and users
+        with collaborative-filtering factors get that blended with
+        collaborative scores; cold-start users are ranked on content
+        alone. Returns {user_id: [(job_id, score), ...]} ordered best
+        first, scores in [0, 1].
+        """
+        user_ids = list(user_ids)
+        results = {user_id: [] for user_id in user_ids}
+        cf_model = collaborative.current_model() if settings.COLLABORATIVE_WEIGHT else None
+        with stage('fit'), self.store.lock:
+            index = self.store.ensure_current().get_index()
+            if index is None:
+                return results
+            self.scaler, knn, self.job_ids = index
+            # Rows move on updates, so blending needs a snapshot matching job_ids
+            features = self.store.features.copy() if cf_model is not None or settings.SKILL_MATCH_WEIGHT else None
+        
+        with stage('features'):
+            profile_ids, matrix = self.prepare_user_preference_matrix(user_ids)
+        if len(profile_ids) == 0:
+            return results
+        excluded = self.get_excluded_job_ids(user_ids)
+        
+        # Over-fetch so that excluded jobs can be dropped without a second query
+        max_excluded = max((len(job_ids) for job_ids in excluded.values()), default=0)
+        n_neighbors = min(n_recommendations + max_excluded, len(self.job_ids))
+        record_size('neighbours', n_neighbors)
+        with stage('scale'):
+            queries = self.scaler.transform(matrix)
+        with stage('search'):
+            distances, indices = knn.kneighbors(queries, n_neighbors=n_neighbors)
+        
+        cf_rows = cf_model.user_rows(profile_ids) if cf_model is not None else np.full(len(profile_ids), -1)
+        content_only = int((cf_rows < 0).sum()) if settings.COLLABORATIVE_WEIGHT else 0
+        if content_only:
+            # Untrained model or users without interactions: content ranking only
+            count_event('fallback:content_only', content_only)
+        if (cf_rows >= 0).any():
+            job_factors = cf_model.job_factors_for(self.job_ids)
+        skill_matches = {}
+        if settings.SKILL_MATCH_WEIGHT:
+            skill_matches = self.skill_matched_rows(profile_ids, excluded, n_neighbors)
+        
+        with stage('blend'):
+            for i, user_id in enumerate(profile_ids.tolist()):
+                rows, scores = indices[i], 1 / (1 + distances[i])
+                cf_scores = job_factors @ cf_model.user_factors[cf_rows[i]] if cf_rows[i] >= 0 else None
+                if cf_scores is not None or user_id in skill_matches:
+                    rows, scores = self.blend(
+                        rows, queries[i], features, n_neighbors, cf_scores, skill_matches.get(user_id)
+                    )
+                skip = excluded.get(user_id, ())
+                results[user_id] = [
+                    (job_id, score) for job_id, score in zip(self.job_ids[rows].tolist(), scores.tolist())
+                    if job_id not in skip
+                ][:n_recommendations]
+        return results
+    
+    def skill_matched_rows(self, profile_ids, excluded, n_candidates):
+        """{user_id: (rows, scores)} of the jobs best matching each user's skills, as rows of job_ids"""
+        with stage('query'):
+            skills = list(UserProfile.objects.filter(user_id__in=profile_ids.tolist()).exclude(
+                skills=''
+            ).values_list('user_id', 'skills'))
+        if not skills:
+            return {}
+        with stage('fit'):
+            skill_matcher.ensure_current()
+        
+        # Jobs the matcher knows but the feature snapshot does not are left out
+        order = np.argsort(self.job_ids)
+        matches = {}
+        with stage('search'):
+            for user_id, text in skills:
+                matched = skill_matcher.match_jobs(text, n_candidates, excluded.get(user_id, ()))
+                if not matched:
+                    continue
+                job_ids, scores = (np.asarray(values) for values in zip(*matched))
+                positions = np.searchsorted(self.job_ids, job_ids, sorter=order).clip(max=len(self.job_ids) - 1)
+                rows = order[positions]
+                known = self.job_ids[rows] == job_ids
+                if known.any():
+                    matches[user_id] = rows[known], scores[known]
+        return matches
+    
+    def blend(self, content_rows, query, features, n_candidates, cf_scores=None, skill_matches=None):
+        """Rerank the content neighbours together with the top collaborative and skill-matched jobs.
+        
+        Returns (rows, scores) best first. A score starts as 1 / (1 + feature
+        distance); with skill matches it is mixed with the TF-IDF skill
+        similarity by SKILL_MATCH_WEIGHT, then with collaborative scores,
+        scaled to the user's best candidate, by COLLABORATIVE_WEIGHT.
+        """
+        rows = content_rows
+        if cf_scores is not None:
+            rows = np.union1d(rows, np.argpartition(-cf_scores, n_candidates - 1)[:n_candidates])
+        if skill_matches is not None:
+            skill_rows, skill_scores = skill_matches
+            rows = np.union1d(rows, skill_rows)
+        
+        scores = 1 / (1 + np.sqrt(((self.scaler.transform(features[rows]) - query) ** 2).sum(axis=1)))
+        if skill_matches is not None:
+            skills = np.zeros(len(rows))
+            skills[np.searchsorted(rows, skill_rows)] = skill_scores
+            weight = settings.SKILL_MATCH_WEIGHT
+            scores = (1 - weight) * scores + weight * skills
+        if cf_scores is not None:
+            cf = np.maximum(cf_scores[rows], 0)
+            if cf.max() > 0:
+                cf = cf / cf.max()
+            weight = settings.COLLABORATIVE_WEIGHT
+            scores = (1 - weight) * scores + weight * cf
+        
+        order = np.argsort(-scores, kind='stable')
+        return rows[order], scores[order]
+    
+    def save_recommendations(self, results):
+        """Replace the stored JobRecommendation rows of the given users"""
+        rows = [
+            JobRecommendation(user_id=user_id, job_id=job_id, rank=rank, score=score)
+            for user_id, recommended in results.items()
+            for rank, (job_id, score) in enumerate(recommended, start=1)
+        ]
+        with transaction.atomic():
+            JobRecommendation.objects.filter(user_id__in=list(results)).delete()
+            JobRecommendation.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
     
     def get_recommendations(self, user, n_recommendations=6):
-        """Get job recommendations for a user using KNN algorithm"""
-        applied_job_ids = Application.objects.filter(applicant=user).values_list('job_id', flat=True)
-        saved_job_ids = SavedJob.objects.filter(user=user).values_list('job_id', flat=True)
-        excluded_ids = list(applied_job_ids) + list(saved_job_ids)
-        
-        available_jobs = Job.objects.filter(is_active=True).exclude(id__in=excluded_ids)
-        
-        if not available_jobs.exists():
-            return []
-        
-        job_features, job_ids = self.prepare_job_features(available_jobs)
-        
-        if len(job_features) == 0:
-            return []
-        
-        job_features_scaled = self.scaler.fit_transform(job_features)
-        user_prefs = self.prepare_user_preferences(user)
-        
-        jobs_list = list(available_jobs)
-        categories = list(set([job.category for job in jobs_list]))
-        job_types = list(set([job.job_type for job in jobs_list]))
-        locations = list(set([job.location for job in jobs_list]))
-        
-        category_encoded = categories.index(user_prefs['category']) if user_prefs['category'] in categories else 0
-        job_type_encoded = job_types.index(user_prefs['job_type']) if user_prefs['job_type'] in job_types else 0
-        location_encoded = locations.index(user_prefs['location']) if user_prefs['location'] in locations else 0
-        
-        user_vector = np.array([[
-            category_encoded,
-            job_type_encoded,
-            user_prefs['experience'],
-            0,
-            location_encoded
-        ]])
-        
-        user_vector_scaled = self.scaler.transform(user_vector)
-        
-        n_neighbors = min(n_recommendations, len(job_features))
-        knn = NearestNeighbors(n_neighbors=n_neighbors, metric='euclidean')
-        knn.fit(job_features_scaled)
-        
-        distances, indices = knn.kneighbors(user_vector_scaled)
-        recommended_job_ids = [job_ids[i] for i in indices[0]]
-        recommended_jobs = Job.objects.filter(id__in=recommended_job_ids)
+        """Get job recommendations for a user using the prebuilt job index"""
+        recommended = self.recommend_for_users([user.id], n_recommendations)[user.id]
+        recommended_job_ids = [job_id for job_id, _ in recommended]
+        with stage('query'):
+            recommended_jobs = list(Job.objects.filter(id__in=recommended_job_ids))
         
         recommended_jobs_sorted = sorted(
             recommended_jobs,
@@ -129,129 +276,244 @@ class JobRecommender:
 class CandidateRecommender:
     """KNN-based candidate recommendation system for employers"""
     
-    def __init__(self):
+    def __init__(self, store=None, pipeline=None):
         self.model = None
-        self.scaler = StandardScaler()
+        self.store = candidate_store if store is None else store
+        self.pipeline = pipeline
         
     def prepare_candidate_features(self, candidates):
-        """Convert candidate profiles into numerical features"""
-        features = []
-        candidate_ids = []
-        
-        # Get all unique values for encoding
-        all_locations = list(set([c.location if c.location else '' for c in candidates]))
-        
-        for candidate in candidates:
-            # Experience years
-            experience = candidate.experience_years
-            
-            # Location encoding
-            location_encoded = all_locations.index(candidate.location) if candidate.location in all_locations else 0
-            
-            # Skills count (rough measure of qualification)
-            skills_count = len(candidate.skills.split(',')) if candidate.skills else 0
-            
-            # Has resume
-            has_resume = 1 if candidate.resume else 0
-            
-            # Education length (rough measure)
-            education_length = len(candidate.education) if candidate.education else 0
-            
-            feature_vector = [
-                experience,
-                location_encoded,
-                skills_count,
-                has_resume,
-                min(education_length / 100, 10)  # Normalize
-            ]
-            
-            features.append(feature_vector)
-            candidate_ids.append(candidate.user.id)
+        """Convert a candidate profile queryset into numerical features.
         
-        return np.array(features), candidate_ids
+        Text-derived features are computed by the database so no profile
+        objects or Python strings are built per row.
+        """
+        candidate_ids, features = self.store.build_features(self.store.annotate(candidates))
+        return features, candidate_ids.tolist()
     
     def prepare_job_requirements(self, job):
         """Extract job requirements as a feature vector"""
-        # Get all candidates to get location list
-        all_profiles = UserProfile.objects.filter(user_type='seeker')
-        all_locations = list(set([p.location if p.location else '' for p in all_profiles]))
-        
-        location_encoded = all_locations.index(job.location) if job.location in all_locations else 0
-        
         # Required skills count
-        required_skills = len(job.skills_required.split(',')) if job.skills_required else 0
+        required_skills = len(tokenize_skills(job.skills_required))
         
         return {
             'experience': job.experience_required,
-            'location': location_encoded,
+            'coordinates': sphere_coordinates([job.latitude], [job.longitude])[0],
             'skills_count': required_skills,
             'has_resume': 1,  # Prefer candidates with resumes
             'education': 5  # Mid-range preference
         }
     
-    def get_recommendations(self, job, n_recommendations=10):
-        """Get candidate recommendations for a job using KNN"""
+    def get_recommendations(self, job, n_recommendations=10, n_probe=None):
+        """Get candidate recommendations for a job.
+        
+        Ranked by the retrieve-then-rerank CandidatePipeline when
+        CANDIDATE_RANKER is 'pipeline', else by distance in the candidate
+        index, which is also the fallback when the pipeline finds no one.
+        n_probe overrides CANDIDATE_INDEX_N_PROBE when the IVF
+        backend is active, trading recall for latency.
+        """
         # Get all job seekers who haven't applied to this job
-        applied_user_ids = Application.objects.filter(job=job).values_list('applicant_id', flat=True)
-        
-        available_candidates = UserProfile.objects.filter(
-            user_type='seeker'
-        ).exclude(user_id__in=applied_user_ids).select_related('user')
-        
-        if not available_candidates.exists():
-            return []
-        
-        candidate_features, candidate_ids = self.prepare_candidate_features(available_candidates)
-        
-        if len(candidate_features) == 0:
-            return []
-        
-        candidate_features_scaled = self.scaler.fit_transform(candidate_features)
-        job_reqs = self.prepare_job_requirements(job)
-        
-        # Get location list again for encoding
-        all_locations = list(set([c.location if c.location else '' for c in available_candidates]))
-        
-        job_vector = np.array([[
-            job_reqs['experience'],
-            job_reqs['location'],
-            job_reqs['skills_count'],
-            job_reqs['has_resume'],
-            job_reqs['education']
-        ]])
-        
-        job_vector_scaled = self.scaler.transform(job_vector)
-        
-        n_neighbors = min(n_recommendations, len(candidate_features))
-        knn = NearestNeighbors(n_neighbors=n_neighbors, metric='euclidean')
-        knn.fit(candidate_features_scaled)
-        
-        distances, indices = knn.kneighbors(job_vector_scaled)
-        recommended_candidate_ids = [candidate_ids[i] for i in indices[0]]
+        with stage('query'):
+            applied_user_ids = set(Application.objects.filter(job=job).values_list('applicant_id', flat=True))
+        
+        if settings.CANDIDATE_RANKER == 'pipeline':
+            pipeline = self.pipeline or CandidatePipeline()
+            ranked = pipeline.recommend(job, n_recommendations, exclude_ids=applied_user_ids)
+            recommended_candidate_ids = [user_id for user_id, _ in ranked]
+            if not recommended_candidate_ids:
+                # No seeker shares a skill or fits the location and experience window
+                count_event('fallback:knn')
+                recommended_candidate_ids = self.nearest_candidate_ids(
+                    job, n_recommendations, applied_user_ids, n_probe
+                )
+        else:
+            recommended_candidate_ids = self.nearest_candidate_ids(job, n_recommendations, applied_user_ids, n_probe)
         
         # Get User objects
         from django.contrib.auth.models import User
-        recommended_candidates = User.objects.filter(
-            id__in=recommended_candidate_ids
-        ).select_related('profile')
+        with stage('query'):
+            recommended_candidates = list(User.objects.filter(
+                id__in=recommended_candidate_ids
+            ).select_related('profile'))
         
-        # Sort by match quality (distance)
+        # Sort by match quality
         recommended_candidates_sorted = sorted(
             recommended_candidates,
             key=lambda c: recommended_candidate_ids.index(c.id)
         )
         
         return recommended_candidates_sorted
+    
+    def nearest_candidate_ids(self, job, n_recommendations, applied_user_ids, n_probe=None):
+        """Ids of the seekers closest to the job's requirements in the candidate index"""
+        with stage('fit'):
+            self.store.ensure_current()
+            if self.store.ann is None:
+                self.store.get_index()
+        if len(self.store) == 0:
+            return []
+        
+        with stage('features'):
+            job_reqs = self.prepare_job_requirements(job)
+            job_vector = np.array([[
+                job_reqs['experience'],
+                *job_reqs['coordinates'],
+                job_reqs['skills_count'],
+                job_reqs['has_resume'],
+                job_reqs['education']
+            ]])
+        
+        # Over-fetch so that applicants can be dropped without a second query
+        k = n_recommendations + len(applied_user_ids)
+        record_size('neighbours', k)
+        with stage('search'):
+            distances, ids = self.store.search(job_vector, k, n_probe=n_probe)
+        return [
+            user_id for user_id in ids[0].tolist() if user_id not in applied_user_ids
+        ][:n_recommendations]
+    
+    def prepare_job_matrix(self, jobs):
+        """Requirement vectors for many jobs at once, as (job_ids, matrix)"""
+        rows = list(jobs.annotate(skills_count=link_count(JobSkill, 'job')).values_list(
+            'id', 'experience_required', 'latitude', 'longitude', 'skills_count'
+        ).order_by('id'))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.store.n_features))
+        job_ids, experience, latitudes, longitudes, skills_count = zip(*rows)
+        matrix = np.column_stack([
+            np.asarray(experience, dtype=float),
+            sphere_coordinates(latitudes, longitudes),
+            np.asarray(skills_count, dtype=float),
+            np.ones(len(rows)),  # Prefer candidates with resumes
+            np.full(len(rows), 5.0),  # Mid-range education preference
+        ])
+        return np.asarray(job_ids, dtype=np.int64), matrix
+    
+    def recommend_for_jobs(self, jobs, n_recommendations=6, n_probe=None):
+        """Rank candidates for many jobs with one search over the candidate index.
+        
+        Each candidate is recommended for at most one job, the one they are
+        closest to, so a dashboard covering many similar roles does not
+        repeat the same people. Jobs can get fewer than n_recommendations
+        when their neighbourhoods overlap heavily.
+        Returns {job_id: [(user_id, distance), ...]} ordered best first.
+        """
+        with stage('features'):
+            job_ids, matrix = self.prepare_job_matrix(jobs)
+        results = {job_id: [] for job_id in job_ids.tolist()}
+        if not results:
+            return results
+        
+        with stage('query'):
+            applied = defaultdict(set)
+            for job_id, user_id in Application.objects.filter(
+                job_id__in=job_ids.tolist()
+            ).values_list('job_id', 'applicant_id').order_by():
+                applied[job_id].add(user_id)
+        
+        with stage('fit'):
+            self.store.ensure_current()
+            if self.store.ann is None:
+                self.store.get_index()
+        if len(self.store) == 0:
+            return results
+        
+        # Over-fetch for applicants and for candidates claimed by other jobs
+        max_applied = max((len(user_ids) for user_ids in applied.values()), default=0)
+        k = n_recommendations * DEDUPLICATION_OVERFETCH + max_applied
+        record_size('jobs', len(job_ids))
+        record_size('neighbours', k)
+        with stage('search'):
+            distances, ids = self.store.search(matrix, k, n_probe=n_probe)
+        
+        with stage('blend'):
+            rows = np.repeat(np.arange(len(job_ids)), [len(row) for row in ids])
+            distances = np.concatenate(distances)
+            ids = np.concatenate(ids)
+            assigned = set()
+            # Closest (job, candidate) pairs first, across all jobs
+            for i in np.argsort(distances, kind='stable').tolist():
+                job_id, user_id = int(job_ids[rows[i]]), int(ids[i])
+                recommended = results[job_id]
+                if user_id in assigned or user_id in applied[job_id] or len(recommended) >= n_recommendations:
+                    continue
+                recommended.append((user_id, float(distances[i])))
+                assigned.add(user_id)
+        return results
 
 
 # Convenience functions
 def get_job_recommendations(user, count=6):
-    """Get job recommendations for a job seeker"""
+    """Get job recommendations for a job seeker, served from the per-user cache"""
+    if count > RECOMMENDATION_CACHE_SIZE:
+        return JobRecommender().get_recommendations(user, n_recommendations=count)
+    
+    job_ids = get_cached_recommendations(user.id)
+    if job_ids is None:
+        version = get_job_set_version()
+        recommended_jobs = JobRecommender().get_recommendations(
+            user, n_recommendations=RECOMMENDATION_CACHE_SIZE
+        )
+        set_cached_recommendations(user.id, [job.id for job in recommended_jobs], version)
+        return recommended_jobs[:count]
+    
+    jobs_by_id = Job.objects.in_bulk(job_ids[:count])
+    return [jobs_by_id[job_id] for job_id in job_ids[:count] if job_id in jobs_by_id]
+
+
+def precompute_job_recommendations(user_ids, count=12):
+    """Compute and store JobRecommendation rows for a batch of users"""
     recommender = JobRecommender()
-    return recommender.get_recommendations(user, n_recommendations=count)
+    return recommender.save_recommendations(
+        recommender.recommend_for_users(user_ids, n_recommendations=count)
+    )
+
+
+def seeker_index_version(pipeline=False):
+    """Seeker-set version the candidate indexes in use were built from, or None while any lags it.
+
+    The feature store, skill matcher and seeker filter index each reload
+    at most once a minute, so they can trail the published version. With
+    pipeline, the skill matcher and filter index are checked, and the
+    feature store only if its KNN fallback has loaded it.
+    """
+    version = get_seeker_set_version()
+    built = []
+    if pipeline:
+        built += [(skill_matcher.versions or (None, None))[1], seeker_filter_index.versions]
+    if not pipeline or candidate_store.loaded_at:
+        built.append(candidate_store.version)
+    return version if all(index_version == version for index_version in built) else None
 
 
 def get_candidate_recommendations(job, count=10):
-    """Get candidate recommendations for a job posting"""
-    recommender = CandidateRecommender()
-    return recommender.get_recommendations(job, n_recommendations=count)
\ No newline at end of file
+    """Get candidate recommendations for a job posting, served from the per-job cache"""
+    if count > RECOMMENDATION_CACHE_SIZE:
+        return CandidateRecommender().get_recommendations(job, n_recommendations=count)
+    
+    user_ids = get_cached_candidates(job.id)
+    if user_ids is None:
+        version = get_seeker_set_version()
+        candidates = CandidateRecommender().get_recommendations(
+            job, n_recommendations=RECOMMENDATION_CACHE_SIZE
+        )
+        # Lists built from an index still catching up are served but not kept
+        if seeker_index_version(settings.CANDIDATE_RANKER == 'pipeline') == version:
+            set_cached_candidates(job.id, [candidate.id for candidate in candidates], version)
+        return candidates[:count]
+    
+    from django.contrib.auth.models import User
+    users_by_id = User.objects.select_related('profile').in_bulk(user_ids[:count])
+    return [users_by_id[user_id] for user_id in user_ids[:count] if user_id in users_by_id]
+
+
+def get_candidate_recommendations_for_jobs(jobs, count=6):
+    """Map each job in a queryset to its recommended candidates, one search for all"""
+    from django.contrib.auth.models import User
+    results = CandidateRecommender().recommend_for_jobs(jobs, n_recommendations=count)
+    user_ids = [user_id for recommended in results.values() for user_id, _ in recommended]
+    users_by_id = User.objects.select_related('profile').in_bulk(user_ids)
+    return {
+        job_id: [users_by_id[user_id] for user_id, _ in recommended if user_id in users_by_id]
+        for job_id, recommended in results.items()
+    }
@@ -2,6 +2,30 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+
+class Skill(models.Model):
+    """Canonical skill, shared by the skill links of jobs and profiles"""
+    name = models.CharField(max_length=100, unique=True, help_text="Normalized lowercase name")
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class SkillAlias(models.Model):
+    """Another spelling of a skill, folded onto it when skill text is parsed"""
+    name = models.CharField(max_length=100, unique=True, help_text="Normalized lowercase name")
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='aliases')
+
+    class Meta:
+        verbose_name_plural = 'skill aliases'
+
+    def __str__(self):
+        return f"{self.name} -> {self.skill.name}"
+
+
 class UserProfile(models.Model):
     """Extended user profile for job seekers and employers"""
     USER_TYPES = (
@@ -13,12 +37,18 @@ class UserProfile(models.Model):
     user_type = models.CharField(max_length=10, choices=USER_TYPES)
     phone = models.CharField(max_length=15, blank=True)
     location = models.CharField(max_length=100, blank=True)
+    # Gazetteer coordinates of location, set on save; empty when it is not found
+    latitude = models.FloatField(blank=True, null=True, editable=False)
+    longitude = models.FloatField(blank=True, null=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
     bio = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
     
     # Job Seeker specific fields
     resume = models.FileField(upload_to='resumes/', blank=True, null=True)
     skills = models.TextField(blank=True, help_text="Comma separated skills")
+    # Parsed from skills on save
+    skill_set = models.ManyToManyField(Skill, through='ProfileSkill', related_name='profiles', blank=True)
     experience_years = models.IntegerField(default=0)
     education = models.TextField(blank=True)
     
@@ -31,6 +61,12 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Seeker lists and counts for the recommenders and admin dashboards
+            models.Index(fields=['user_type'], name='profile_user_type_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} - {self.user_type}"
 
@@ -67,10 +103,19 @@ class Job(models.Model):
     category = models.CharField(max_length=50, choices=CATEGORIES)
     job_type = models.CharField(max_length=20, choices=JOB_TYPES)
     location = models.CharField(max_length=100)
+    # Gazetteer coordinates of location, set on save; empty when it is not found
+    latitude = models.FloatField(blank=True, null=True, editable=False)
+    longitude = models.FloatField(blank=True, null=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
     salary_min = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     salary_max = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # Derived from the salary range on save, for salary filters, sorts and features
+    salary_mid = models.IntegerField(default=0, editable=False, help_text="Midpoint, 0 when no salary is given")
+    salary_band = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
     experience_required = models.IntegerField(default=0, help_text="Years of experience")
     skills_required = models.TextField(help_text="Comma separated skills")
+    # Parsed from skills_required on save
+    skill_set = models.ManyToManyField(Skill, through='JobSkill', related_name='jobs', blank=True)
     is_active = models.BooleanField(default=True)
     posted_date = models.DateTimeField(default=timezone.now)
     deadline = models.DateField(blank=True, null=True)
@@ -79,6 +124,27 @@ class Job(models.Model):
     
     class Meta:
         ordering = ['-posted_date']
+        indexes = [
+            # Public listings: active jobs, newest first, optionally by category or type
+            models.Index(
+                fields=['-posted_date', '-id'], condition=models.Q(is_active=True), name='job_active_posted_idx'
+            ),
+            models.Index(
+                fields=['category', '-posted_date', '-id'], condition=models.Q(is_active=True),
+                name='job_active_category_idx',
+            ),
+            models.Index(
+                fields=['job_type', '-posted_date', '-id'], condition=models.Q(is_active=True),
+                name='job_active_type_idx',
+            ),
+            # Salary sorts and minimum salary filters, and the salary histogram
+            models.Index(fields=['salary_mid', 'id'], condition=models.Q(is_active=True), name='job_active_salary_idx'),
+            models.Index(fields=['salary_band'], condition=models.Q(is_active=True), name='job_active_band_idx'),
+            # Radius searches narrow active jobs by geohash prefix ranges
+            models.Index(fields=['geohash'], condition=models.Q(is_active=True), name='job_active_geohash_idx'),
+            # Admin tables and date-range counts over all jobs
+            models.Index(fields=['-posted_date', '-id'], name='job_posted_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} at {self.company_name}"
@@ -91,6 +157,39 @@ class Job(models.Model):
         return "Negotiable"
 
 
+class JobSkill(models.Model):
+    """A skill required by a job"""
+    # Both lookups are served by the composite indexes, not single column ones
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='skill_links', db_index=False)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='job_links', db_index=False)
+
+    class Meta:
+        unique_together = ['job', 'skill']
+        indexes = [
+            # Jobs requiring a skill, for the listing filter and facet
+            models.Index(fields=['skill', 'job'], name='job_skill_skill_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job.title} requires {self.skill.name}"
+
+
+class ProfileSkill(models.Model):
+    """A skill listed on a user profile"""
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='skill_links', db_index=False)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='profile_links', db_index=False)
+
+    class Meta:
+        unique_together = ['profile', 'skill']
+        indexes = [
+            # Profiles listing a skill
+            models.Index(fields=['skill', 'profile'], name='profile_skill_skill_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.profile.user.username} knows {self.skill.name}"
+
+
 class Application(models.Model):
     """Job application model"""
     STATUS_CHOICES = (
@@ -114,6 +213,11 @@ class Application(models.Model):
     class Meta:
         ordering = ['-applied_date']
         unique_together = ['job', 'applicant']
+        indexes = [
+            # Admin applications table, filtered by status or not, newest first
+            models.Index(fields=['status', '-applied_date', '-id'], name='application_status_idx'),
+            models.Index(fields=['-applied_date', '-id'], name='application_applied_idx'),
+        ]
     
     def __str__(self):
         return f"{self.applicant.username} applied for {self.job.title}"
@@ -132,6 +236,37 @@ class SavedJob(models.Model):
         return f"{self.user.username} saved {self.job.title}"
 
 
+class JobRecommendation(models.Model):
+    """Precomputed job recommendations for a job seeker"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='job_recommendations')
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='recommended_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['user', 'rank']
+        unique_together = ['user', 'rank']
+    
+    def __str__(self):
+        return f"#{self.rank} {self.job.title} for {self.user.username}"
+
+
+class SimilarJob(models.Model):
+    """Precomputed nearest neighbours of a job"""
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='similar_jobs')
+    similar_job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='similar_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['job', 'rank']
+        unique_together = ['job', 'rank']
+    
+    def __str__(self):
+        return f"#{self.rank} {self.similar_job.title} similar to {self.job.title}"
+
+
 class Contact(models.Model):
     """Contact form submissions"""
     name = models.CharField(max_length=100)
@@ -141,5 +276,14 @@ class Contact(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_resolved = models.BooleanField(default=False)
     
+    class Meta:
+        indexes = [
+            # Boolean filters compile to NOT is_resolved, which only a partial index can serve
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(is_resolved=False), name='contact_unresolved_idx'
+            ),
+            models.Index(fields=['-created_at', '-id'], name='contact_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.name} - {self.subject}"
\ No newline at end of file
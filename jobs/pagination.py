@@ -0,0 +1,174 @@
+import datetime
+import decimal
+import hashlib
+import json
+import math
+from functools import cached_property
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+# Seconds a total count is reused for the same filtered queryset
+COUNT_CACHE_TIMEOUT = 60
+
+
+def encode_cursor(values, number, reverse=False):
+    """Opaque URL-safe token for a position in a keyset ordering"""
+    values = [
+        value.isoformat() if isinstance(value, (datetime.date, datetime.datetime))
+        else str(value) if isinstance(value, decimal.Decimal)
+        else value
+        for value in values
+    ]
+    payload = json.dumps({'v': values, 'n': number, 'r': reverse}, separators=(',', ':'))
+    return urlsafe_base64_encode(payload.encode())
+
+
+def decode_cursor(cursor):
+    """Return (values, page number, reverse), or None for a missing or malformed cursor"""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(urlsafe_base64_decode(cursor))
+        values, number, reverse = payload['v'], int(payload['n']), bool(payload['r'])
+    except (ValueError, TypeError, KeyError):
+        return None
+    if not isinstance(values, list):
+        return None
+    return values, number, reverse
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, iterable like a Paginator page.
+
+    Cursors are plain strings, so a page can be rebuilt from a cache
+    entry without the rows that produced them.
+    """
+
+    def __init__(self, paginator, object_list, number, previous_cursor=None, next_cursor=None):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.number = number
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class KeysetPaginator:
+    """Paginate by seeking past the last row shown instead of with OFFSET.
+
+    ordering is a sequence of field or annotation names, each optionally
+    prefixed with '-', ending in a unique one such as 'id' so that every
+    row has a distinct position. Fields must not be NULL. Every page costs
+    the same index range scan however deep it is; the total count is
+    either passed in or computed once and cached for COUNT_CACHE_TIMEOUT.
+    Cursors carry the page number, so pages can still be labelled.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = [field.startswith('-') for field in self.ordering]
+        self._count = count
+
+    @cached_property
+    def count(self):
+        """Total rows, as given or cached per distinct query"""
+        if self._count is not None:
+            return self._count
+        try:
+            sql = str(self.queryset.query)
+        except EmptyResultSet:
+            return 0
+        key = 'pagination:count:' + hashlib.md5(sql.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    @property
+    def last_cursor(self):
+        """Cursor of the last page, read backwards from the end"""
+        return encode_cursor([], self.num_pages, reverse=True)
+
+    def cursor_for(self, obj, number, reverse=False):
+        return encode_cursor([getattr(obj, field) for field in self.fields], number, reverse)
+
+    def seek(self, values, reverse):
+        """Filter for rows strictly after values in the ordering, or before when reverse.
+
+        Expanded as (a < x) OR (a = x AND b < y) ..., and led by a redundant
+        a <= x so the database can range-scan an index on the first field.
+        """
+        lookups = ['lt' if descending != reverse else 'gt' for descending in self.descending]
+        expanded = Q()
+        for i, field in enumerate(self.fields):
+            equal = dict(zip(self.fields[:i], values[:i]))
+            expanded |= Q(**equal, **{f'{field}__{lookups[i]}': values[i]})
+        inclusive = 'lte' if lookups[0] == 'lt' else 'gte'
+        return Q(**{f'{self.fields[0]}__{inclusive}': values[0]}) & expanded
+
+    def page(self, cursor=None):
+        """The page at cursor, or the first page when it is missing or invalid"""
+        position = decode_cursor(cursor)
+        values, number, reverse = position if position else ([], 1, False)
+        if values and len(values) != len(self.fields):
+            values, number, reverse = [], 1, False
+
+        queryset = self.queryset
+        if values:
+            try:
+                queryset = queryset.filter(self.seek(values, reverse))
+            except (ValidationError, ValueError, TypeError):
+                # A tampered cursor whose values do not fit the fields
+                values, number, reverse = [], 1, False
+        ordering = self.ordering
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+        if reverse and not values:
+            # The last page holds only the remainder, so it lines up with the pages read forwards
+            number = self.num_pages
+            rows = list(queryset.order_by(*ordering)[:max(self.count - (number - 1) * self.per_page, 0)])
+            more = number > 1
+        else:
+            # One extra row tells whether there is another page in this direction
+            rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            number = max(number, 1)
+            has_previous, has_next = more, bool(values) or number < self.num_pages
+        else:
+            has_previous, has_next = bool(values), more
+
+        return KeysetPage(
+            self, rows, number,
+            self.cursor_for(rows[0], number - 1, reverse=True) if has_previous and rows else None,
+            self.cursor_for(rows[-1], number + 1) if has_next and rows else None,
+        )
@@ -0,0 +1,214 @@
+import bisect
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+
+_local = threading.local()
+
+# Upper bucket bounds of the in-process histograms; one overflow bucket follows
+DURATION_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+SIZE_BUCKETS = (1, 10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000, 300000, 1000000)
+HISTOGRAM_PERCENTILES = (50, 95, 99)
+
+
+class stage:
+    """Time a named block of a recommender call.
+
+    Durations are only recorded while collect_stages() is active on the
+    current thread, so outside a benchmark or instrument() block this
+    costs one attribute lookup.
+    """
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings[self.name] += time.perf_counter() - self.started
+
+
+def record_size(name, value):
+    """Record the size of a candidate pool or result set, if collecting"""
+    sizes = getattr(_local, 'sizes', None)
+    if sizes is not None:
+        sizes[name].append(value)
+
+
+def count_event(name, amount=1):
+    """Count a fallback or other notable event, if collecting"""
+    events = getattr(_local, 'events', None)
+    if events is not None:
+        events[name] += amount
+
+
+@contextmanager
+def _collect(attribute, factory):
+    """Collect into a fresh thread-local dict, then add it to any outer collector"""
+    previous = getattr(_local, attribute, None)
+    collected = defaultdict(factory)
+    setattr(_local, attribute, collected)
+    try:
+        yield collected
+    finally:
+        setattr(_local, attribute, previous)
+        if previous is not None:
+            for name, value in collected.items():
+                previous[name] += value
+
+
+def collect_stages():
+    """Collect {stage name: seconds} for the calls made inside the block"""
+    return _collect('timings', float)
+
+
+class Histogram:
+    """Fixed-bucket histogram; percentiles are estimated from bucket bounds"""
+
+    __slots__ = ('bounds', 'buckets', 'count', 'sum', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, capped at the max"""
+        rank = self.count * p / 100
+        seen = 0
+        for bound, count in zip(self.bounds, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        summary = {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'max': self.max,
+        }
+        for p in HISTOGRAM_PERCENTILES:
+            summary[f'p{p}'] = self.percentile(p)
+        summary['buckets'] = [
+            {'le': bound, 'count': count}
+            for bound, count in zip(self.bounds + (None,), self.buckets)
+        ]
+        return summary
+
+
+class MetricsRegistry:
+    """Histograms and counters per (operation, source), shared by the threads of one process.
+
+    operation names the recommender entry point and source the page or
+    caller that asked for it. Nothing is shared between worker processes,
+    so each reports only the requests it served since it started or was
+    reset.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = timezone.now()
+            self.entries = {}
+
+    def _entry(self, operation, source):
+        entry = self.entries.get((operation, source))
+        if entry is None:
+            entry = self.entries[(operation, source)] = {
+                'counters': defaultdict(int),
+                'durations': {},
+                'sizes': {},
+            }
+        return entry
+
+    @staticmethod
+    def _histogram(histograms, name, bounds):
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram(bounds)
+        return histogram
+
+    def increment(self, operation, name, source='', amount=1):
+        with self.lock:
+            self._entry(operation, source)['counters'][name] += amount
+
+    def observe_duration(self, operation, name, seconds, source=''):
+        with self.lock:
+            durations = self._entry(operation, source)['durations']
+            self._histogram(durations, name, DURATION_BUCKETS_MS).observe(seconds * 1000)
+
+    def record(self, operation, source, total, timings, sizes, events):
+        """Add one instrumented call: total and per-stage seconds, sizes and events"""
+        with self.lock:
+            entry = self._entry(operation, source)
+            entry['counters']['calls'] += 1
+            self._histogram(entry['durations'], 'total', DURATION_BUCKETS_MS).observe(total * 1000)
+            for name, seconds in timings.items():
+                self._histogram(entry['durations'], name, DURATION_BUCKETS_MS).observe(seconds * 1000)
+            for name, values in sizes.items():
+                histogram = self._histogram(entry['sizes'], name, SIZE_BUCKETS)
+                for value in values:
+                    histogram.observe(value)
+            for name, count in events.items():
+                entry['counters'][name] += count
+
+    def snapshot(self):
+        """JSON-serializable copy of every histogram and counter"""
+        with self.lock:
+            operations = [
+                {
+                    'operation': operation,
+                    'source': source,
+                    'counters': dict(sorted(entry['counters'].items())),
+                    'durations_ms': {name: h.summary() for name, h in entry['durations'].items()},
+                    'sizes': {name: h.summary() for name, h in entry['sizes'].items()},
+                }
+                for (operation, source), entry in sorted(self.entries.items())
+            ]
+            return {
+                'pid': os.getpid(),
+                'since': self.started_at.isoformat(),
+                'operations': operations,
+            }
+
+
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def instrument(operation, source=''):
+    """Record the stages, pool sizes, events and errors of the block into metrics"""
+    with collect_stages() as timings, _collect('sizes', list) as sizes, _collect('events', int) as events:
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as error:
+            events['error'] += 1
+            events[f'error:{type(error).__name__}'] += 1
+            raise
+        finally:
+            metrics.record(operation, source, time.perf_counter() - started, timings, sizes, events)
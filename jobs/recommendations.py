@@ -0,0 +1,240 @@
+"""Lightweight entry points to the recommenders.
+
+Views and signals import this module instead of ml_recommender, so numpy,
+scipy and scikit-learn are only imported by a process the first time it
+actually computes a recommendation. Cache hits and reads of precomputed
+tables are served with the ORM alone.
+
+The poll_* functions never compute in the calling thread: on a cache miss
+they start the computation in a small background pool and return None, so
+request handlers can answer straight away and be asked again.
+
+Every entry point records cache hits and misses, and computations record
+their stages, pool sizes, fallbacks and errors, into profiling.metrics
+under an operation name and the source (page layout) that asked.
+"""
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+
+from .caching import (
+    JOB_SET_VERSION_KEY,
+    RECOMMENDATION_CACHE_SIZE,
+    SEEKER_SET_VERSION_KEY,
+    bump_version,
+    get_cached_candidates,
+    get_cached_employer_candidates,
+    get_cached_recommendations,
+    get_job_set_version,
+    get_seeker_set_version,
+    set_cached_employer_candidates,
+)
+from .models import Job, SimilarJob
+from .profiling import instrument, metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Finished computations wait this many seconds for the poll that collects
+# them, and at most this many are kept; pages that stop polling lose theirs
+FINISHED_TTL = 60
+MAX_FINISHED = 256
+
+_lock = threading.Lock()
+_executor = None
+# Running computations by (operation, object id, count)
+_pending = {}
+# (finish time, future) of finished, unclaimed computations, oldest first
+_finished = OrderedDict()
+
+
+def cached_job_recommendations(user, count=6):
+    """Recommended jobs from the cache, or None on a miss"""
+    job_ids = get_cached_recommendations(user.id) if count <= RECOMMENDATION_CACHE_SIZE else None
+    if job_ids is None:
+        return None
+    jobs_by_id = Job.objects.in_bulk(job_ids[:count])
+    return [jobs_by_id[job_id] for job_id in job_ids[:count] if job_id in jobs_by_id]
+
+
+def cached_candidate_recommendations(job, count=10):
+    """Recommended candidates from the cache, or None on a miss"""
+    user_ids = get_cached_candidates(job.id) if count <= RECOMMENDATION_CACHE_SIZE else None
+    if user_ids is None:
+        return None
+    users_by_id = User.objects.select_related('profile').in_bulk(user_ids[:count])
+    return [users_by_id[user_id] for user_id in user_ids[:count] if user_id in users_by_id]
+
+
+def cached_employer_candidates(employer, count=6):
+    """[(job, [candidate, ...]), ...] for an employer's active jobs from the cache, or None"""
+    job_candidates = get_cached_employer_candidates(employer.id, count)
+    if job_candidates is None:
+        return None
+    jobs = Job.objects.filter(employer=employer, is_active=True)
+    user_ids = [user_id for user_ids in job_candidates.values() for user_id in user_ids]
+    users_by_id = User.objects.select_related('profile').in_bulk(user_ids)
+    return [
+        (job, [users_by_id[user_id] for user_id in job_candidates.get(job.id, ()) if user_id in users_by_id])
+        for job in jobs
+    ]
+
+
+def _cached(operation, source, cached):
+    """Call cached(), counting a hit or miss and timing the lookup"""
+    started = time.perf_counter()
+    result = cached()
+    metrics.observe_duration(operation, 'cache_lookup', time.perf_counter() - started, source)
+    metrics.increment(operation, 'cache_miss' if result is None else 'cache_hit', source)
+    return result
+
+
+def _run_in_background(operation, source, compute):
+    try:
+        with instrument(operation, source):
+            return compute()
+    finally:
+        # Pool threads outlive requests, so nothing else closes their connections
+        connections.close_all()
+
+
+def _finish(key, future):
+    """Move a completed computation from _pending to _finished"""
+    with _lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+        _finished[key] = (time.monotonic(), future)
+        _finished.move_to_end(key)
+        _evict_finished()
+
+
+def _evict_finished():
+    """Drop unclaimed results past FINISHED_TTL or MAX_FINISHED; call holding _lock"""
+    expired = time.monotonic() - FINISHED_TTL
+    while _finished and (len(_finished) > MAX_FINISHED or next(iter(_finished.values()))[0] < expired):
+        _finished.popitem(last=False)
+
+
+def _poll(key, source, cached, compute):
+    """Return cached() if warm, else the finished result of compute, else None.
+
+    A miss starts compute in the pool unless it is already running. Each
+    process has its own pool, so a poll routed to another worker may start
+    a duplicate computation; the shared cache makes later polls hit. A
+    finished result waits up to FINISHED_TTL seconds for the next poll. A
+    failed computation is logged and answered with no recommendations.
+    """
+    operation = key[0]
+    result = _cached(operation, source, cached)
+    if result is not None:
+        return result
+
+    global _executor
+    with _lock:
+        _evict_finished()
+        finished = _finished.pop(key, None)
+        if finished is None:
+            if key in _pending:
+                metrics.increment(operation, 'pending', source)
+                return None
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.RECOMMENDATION_WORKERS, thread_name_prefix='recommendations'
+                )
+            future = _pending[key] = _executor.submit(_run_in_background, operation, source, compute)
+    if finished is None:
+        # Outside the lock, as the callback runs right here if compute has already finished
+        future.add_done_callback(lambda done: _finish(key, done))
+        return None
+
+    _, future = finished
+    error = future.exception()
+    if error is not None:
+        logger.error('%s failed for %s', operation, key[1:], exc_info=error)
+        metrics.increment(operation, 'fallback:empty', source)
+        return []
+    return future.result()
+
+
+def poll_job_recommendations(user, count=6, source=''):
+    """Recommended jobs if available without blocking, else None (computing)"""
+    def compute():
+        from .ml_recommender import get_job_recommendations
+        return get_job_recommendations(user, count=count)
+
+    return _poll(
+        ('job_recommendations', user.id, count), source, lambda: cached_job_recommendations(user, count), compute
+    )
+
+
+def poll_candidate_recommendations(job, count=10, source=''):
+    """Recommended candidates if available without blocking, else None (computing)"""
+    def compute():
+        from .ml_recommender import get_candidate_recommendations
+        return get_candidate_recommendations(job, count=count)
+
+    return _poll(
+        ('candidate_recommendations', job.id, count), source, lambda: cached_candidate_recommendations(job, count), compute
+    )
+
+
+def poll_employer_candidates(employer, count=6, source=''):
+    """Candidates for every active job of an employer without blocking, else None"""
+    def compute():
+        from .ml_recommender import get_candidate_recommendations_for_jobs, seeker_index_version
+        versions = (get_job_set_version(), get_seeker_set_version())
+        jobs = Job.objects.filter(employer=employer, is_active=True)
+        recommended = get_candidate_recommendations_for_jobs(jobs, count=count)
+        if seeker_index_version() == versions[1]:
+            set_cached_employer_candidates(employer.id, count, {
+                job_id: [candidate.id for candidate in candidates]
+                for job_id, candidates in recommended.items()
+            }, versions)
+        return [(job, recommended.get(job.id, [])) for job in jobs]
+
+    return _poll(
+        ('employer_candidates', employer.id, count), source, lambda: cached_employer_candidates(employer, count), compute
+    )
+
+
+def get_similar_jobs(job, count=4):
+    """Active neighbours of a job from the precomputed table, one query.
+
+    The table is refreshed offline by `manage.py build_similar_jobs --changed`.
+    """
+    return [
+        row.similar_job for row in
+        SimilarJob.objects.filter(job=job, similar_job__is_active=True)
+        .select_related('similar_job')[:count]
+    ]
+
+
+def _record_change(store_name, version_key, change):
+    """Patch a feature store if this process has loaded it, else only publish.
+
+    A process that never imported feature_store holds no matrix to patch;
+    bumping the version is enough for the processes that do to catch up.
+    """
+    feature_store = sys.modules.get('jobs.feature_store')
+    if feature_store is None:
+        bump_version(version_key)
+    else:
+        store = getattr(feature_store, store_name)
+        store.record_change(lambda: change(store))
+
+
+def record_job_change(change):
+    """Apply change(job_store) and publish a new job-set version"""
+    _record_change('job_store', JOB_SET_VERSION_KEY, change)
+
+
+def record_candidate_change(change):
+    """Apply change(candidate_store) and publish a new seeker-set version"""
+    _record_change('candidate_store', SEEKER_SET_VERSION_KEY, change)
@@ -0,0 +1,49 @@
+# Width of a salary histogram band
+SALARY_BAND_WIDTH = 10000
+# Midpoints from this band up share it, so one outlier cannot stretch the histogram
+MAX_SALARY_BAND = 30
+
+
+def salary_midpoint(salary_min, salary_max):
+    """Whole-unit midpoint of a salary range: the single bound given, or 0 without a salary"""
+    bounds = [bound for bound in (salary_min, salary_max) if bound]
+    if not bounds:
+        return 0
+    return int(round(sum(bounds) / len(bounds)))
+
+
+def salary_band(midpoint):
+    """Histogram band of a salary midpoint, or None without a salary"""
+    if not midpoint:
+        return None
+    return min(midpoint // SALARY_BAND_WIDTH, MAX_SALARY_BAND)
+
+
+def set_salary_columns(job):
+    """Derive a job's salary_mid and salary_band from its salary range"""
+    job.salary_mid = salary_midpoint(job.salary_min, job.salary_max)
+    job.salary_band = salary_band(job.salary_mid)
+
+
+def update_salary_columns(queryset, batch_size=1000):
+    """Recompute salary_mid and salary_band of every row, batch_size rows at a time.
+
+    For rows written without save(), such as bulk_create. Only rows whose
+    columns change are written. Returns the number of rows updated.
+    """
+    updated, last_id = 0, 0
+    while True:
+        jobs = list(
+            queryset.filter(pk__gt=last_id).order_by('pk')
+            .only('salary_min', 'salary_max', 'salary_mid', 'salary_band')[:batch_size]
+        )
+        if not jobs:
+            return updated
+        changed = []
+        for job in jobs:
+            columns = job.salary_mid, job.salary_band
+            set_salary_columns(job)
+            if (job.salary_mid, job.salary_band) != columns:
+                changed.append(job)
+        updated += queryset.model.objects.bulk_update(changed, ['salary_mid', 'salary_band'])
+        last_id = jobs[-1].pk
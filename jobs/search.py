@@ -0,0 +1,240 @@
+import math
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .caching import (
+    get_cached_salary_histogram, get_cached_search, get_job_set_version, search_cache_key,
+    set_cached_salary_histogram, set_cached_search,
+)
+from .facets import get_facet_counts, salary_histogram
+from .geo import GEOHASH_END, cover_cells, distance_km, resolve_location
+from .models import Job
+from .pagination import KeysetPage, KeysetPaginator
+from .skills import normalize_skill, skill_dictionary
+
+
+# FTS5 index created by migration 0005 on SQLite builds with FTS5
+FTS_TABLE = 'jobs_job_fts'
+# bm25() column weights, in the index's column order: title, company_name,
+# description, requirements, skills_required
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 2.0, 5.0)
+
+PHRASE = re.compile(r'"([^"]*)"')
+WORD = re.compile(r'\w+')
+# Shorter words (the "c" of "c++") are matched whole rather than as a prefix
+MIN_PREFIX_LENGTH = 2
+
+LISTINGS_PER_PAGE = 12
+# Keyset orderings of the listing sorts, each ending in a unique key
+LISTING_ORDERINGS = {
+    'relevance': ('search_rank', '-posted_date', '-id'),
+    '-posted_date': ('-posted_date', '-id'),
+    # Named after the column they once sorted on, which bookmarked URLs still use
+    'salary_max': ('salary_mid', 'id'),
+    '-salary_max': ('-salary_mid', '-id'),
+}
+SEARCH_FIELDS = ('keyword', 'location', 'radius', 'category', 'job_type', 'min_salary', 'skill')
+
+# Whether each database alias has the index, checked once per process
+_fts_available = {}
+
+
+def fts_available(using='default'):
+    """True when the database has the FTS5 job index"""
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[using]
+
+
+def match_expression(keyword):
+    """FTS5 MATCH expression for a search box query.
+
+    Text in double quotes is matched as a phrase and every other word as a
+    prefix, all of them required. Only word characters reach the
+    expression, so user input cannot inject FTS5 syntax.
+    """
+    terms = []
+    for phrase in PHRASE.findall(keyword):
+        words = WORD.findall(phrase)
+        if words:
+            terms.append('"%s"' % ' '.join(words))
+    for word in WORD.findall(PHRASE.sub(' ', keyword)):
+        terms.append(f'"{word}"*' if len(word) >= MIN_PREFIX_LENGTH else f'"{word}"')
+    return ' '.join(terms)
+
+
+def search_jobs(jobs, keyword):
+    """Filter a Job queryset to those matching keyword.
+
+    Returns (jobs, ranked). With the FTS5 index, matches are annotated
+    with search_rank, their BM25 score where lower is better, and ranked
+    is True. Otherwise jobs are filtered with icontains and not ranked.
+    """
+    expression = match_expression(keyword)
+    if expression and fts_available(jobs.db):
+        weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+        # An annotation rather than an extra select, so it can also be filtered on
+        return jobs.annotate(search_rank=RawSQL(f'bm25({FTS_TABLE}, {weights})', ())).extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {Job._meta.db_table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[expression],
+        ), True
+
+    return jobs.filter(
+        Q(title__icontains=keyword) |
+        Q(description__icontains=keyword) |
+        Q(skills_required__icontains=keyword)
+    ), False
+
+
+def filter_location(jobs, location, radius=''):
+    """Filter jobs to those at a location, or within radius km of it.
+
+    A location found in the gazetteer matches every job resolved to the
+    same place, whatever it was called there ("Greater London" for
+    "London"). With a radius, active jobs are first narrowed to the
+    geohash cells covering the circle, then the exact haversine distance
+    is checked on the distinct coordinates found in them, which are few
+    since coordinates come from the gazetteer. Unknown text, and jobs the
+    gazetteer could not place, are matched with icontains.
+    """
+    place = resolve_location(location)
+    if place is None:
+        return jobs.filter(location__icontains=location)
+
+    geohashes = [place.geohash]
+    if radius:
+        radius = float(radius)
+        points = Job.objects.filter(is_active=True).exclude(geohash='')
+        cells = cover_cells(place.latitude, place.longitude, radius)
+        if cells is not None:
+            ranges = Q()
+            for cell in cells:
+                ranges |= Q(geohash__gte=cell, geohash__lt=cell + GEOHASH_END)
+            points = points.filter(ranges)
+        geohashes = [
+            geohash for geohash, latitude, longitude
+            in points.values_list('geohash', 'latitude', 'longitude').distinct().order_by()
+            if distance_km(place.latitude, place.longitude, latitude, longitude) <= radius
+        ]
+    return jobs.filter(Q(geohash__in=geohashes) | Q(geohash='', location__icontains=location))
+
+
+def filter_skill(jobs, skill):
+    """Filter jobs to those requiring a canonical skill name or alias.
+
+    A join on the job skill links, read through their (skill, job) index;
+    no job requires a skill that does not exist.
+    """
+    skill_id = skill_dictionary.lookup({skill}).get(skill)
+    if skill_id is None:
+        return jobs.none()
+    return jobs.filter(skill_links__skill_id=skill_id)
+
+
+def normalize_search(cleaned_data):
+    """Canonical string form of JobSearchForm data, used both to filter and as a cache key.
+
+    Text filters are case-insensitive, so they are lowercased with
+    whitespace collapsed; searches differing only in those share results.
+    """
+    search = dict.fromkeys(SEARCH_FIELDS, '')
+    for field in ('keyword', 'location'):
+        search[field] = ' '.join((cleaned_data.get(field) or '').lower().split())
+    for field in ('category', 'job_type'):
+        search[field] = cleaned_data.get(field) or ''
+    if search['location'] and cleaned_data.get('radius'):
+        search['radius'] = str(cleaned_data['radius'])
+    search['skill'] = normalize_skill(cleaned_data.get('skill') or '')
+    if cleaned_data.get('min_salary') is not None:
+        # Compared with the whole-unit salary_mid column
+        search['min_salary'] = str(math.ceil(cleaned_data['min_salary']))
+    return search
+
+
+def filter_jobs(search):
+    """Active jobs matching normalized search filters, as (jobs, ranked)"""
+    jobs = Job.objects.filter(is_active=True)
+    ranked = False
+    if search['keyword']:
+        jobs, ranked = search_jobs(jobs, search['keyword'])
+    if search['location']:
+        jobs = filter_location(jobs, search['location'], search['radius'])
+    if search['category']:
+        jobs = jobs.filter(category=search['category'])
+    if search['job_type']:
+        jobs = jobs.filter(job_type=search['job_type'])
+    if search['min_salary']:
+        jobs = jobs.filter(salary_mid__gte=search['min_salary'])
+    if search['skill']:
+        jobs = filter_skill(jobs, search['skill'])
+    return jobs, ranked
+
+
+def listing_page(search, sort_by, cursor):
+    """One page of the job listings, as (page, entry).
+
+    entry holds the page's job ids and cursors with the total, facet
+    counts, whether results are ranked and the sort applied. It is cached
+    per normalized search, requested sort and cursor until any job
+    changes, so a repeated search only loads the page's jobs by id.
+    """
+    key = search_cache_key(search, sort_by, cursor)
+    entry = get_cached_search(key)
+    if entry is not None:
+        jobs_by_id = Job.objects.in_bulk(entry['ids'])
+        paginator = KeysetPaginator(
+            Job.objects.none(), LISTINGS_PER_PAGE, LISTING_ORDERINGS[entry['sort_by']], count=entry['total']
+        )
+        page = KeysetPage(
+            paginator, [jobs_by_id[job_id] for job_id in entry['ids'] if job_id in jobs_by_id],
+            entry['number'], entry['previous_cursor'], entry['next_cursor'],
+        )
+        return page, entry
+
+    version = get_job_set_version()
+    jobs, ranked = filter_jobs(search)
+    # Keyword searches are ranked best match first unless another order is asked for
+    if not sort_by:
+        sort_by = 'relevance' if ranked else '-posted_date'
+    if sort_by not in LISTING_ORDERINGS or (sort_by == 'relevance' and not ranked):
+        sort_by = '-posted_date'
+    facets = get_facet_counts(jobs, filtered=any(search.values()))
+    # Every job has a category, so the facet counts also give the total
+    total = sum(count for _, _, count in facets['category'])
+    page = KeysetPaginator(jobs, LISTINGS_PER_PAGE, LISTING_ORDERINGS[sort_by], count=total).page(cursor)
+
+    entry = {
+        'ids': [job.id for job in page],
+        'number': page.number,
+        'previous_cursor': page.previous_cursor,
+        'next_cursor': page.next_cursor,
+        'total': total,
+        'facets': facets,
+        'ranked': ranked,
+        'sort_by': sort_by,
+    }
+    set_cached_search(key, entry, version)
+    return page, entry
+
+
+def salary_histogram_for(search):
+    """Salary histogram of the jobs matching a normalized search, cached until any job changes.
+
+    The minimum salary filter is left out, so the histogram shows the
+    whole range a salary filter could be chosen from.
+    """
+    search = dict(search, min_salary='')
+    histogram = get_cached_salary_histogram(search)
+    if histogram is None:
+        version = get_job_set_version()
+        jobs, _ = filter_jobs(search)
+        histogram = salary_histogram(jobs)
+        set_cached_salary_histogram(search, histogram, version)
+    return histogram
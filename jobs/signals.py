@@ -0,0 +1,123 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import invalidate_candidates, invalidate_employer_candidates, invalidate_recommendations
+from .geo import geocode
+from .models import Application, Job, JobSkill, ProfileSkill, SavedJob, Skill, SkillAlias, UserProfile
+from .recommendations import record_candidate_change, record_job_change
+from .salary import set_salary_columns
+from .skills import skill_dictionary, sync_skill_links
+from .typeahead import typeahead_index
+
+
+# Profile fields that feed JobRecommender.prepare_user_preference_matrix
+PREFERENCE_FIELDS = ('location', 'experience_years')
+# Further profile fields that feed CandidateFeatureStore and the skill matcher
+SEEKER_FIELDS = ('user_type', 'skills', 'resume', 'education')
+TRACKED_FIELDS = PREFERENCE_FIELDS + SEEKER_FIELDS
+
+
+@receiver(pre_save, sender=Job)
+@receiver(pre_save, sender=UserProfile)
+def geocode_location(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'location' in update_fields:
+        instance.latitude, instance.longitude, instance.geohash = geocode(instance.location)
+
+
+@receiver(pre_save, sender=Job)
+def derive_salary_columns(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'salary_min', 'salary_max'} & set(update_fields):
+        set_salary_columns(instance)
+
+
+@receiver(post_save, sender=Job)
+def update_job_skills(sender, instance, update_fields=None, **kwargs):
+    # In the saving transaction, so the links commit or roll back with the job
+    if update_fields is None or 'skills_required' in update_fields:
+        sync_skill_links(JobSkill, 'job', [(instance.id, instance.skills_required)], skill_dictionary)
+
+
+@receiver(post_save, sender=Job)
+def update_job_features(sender, instance, **kwargs):
+    job_id = instance.id
+    transaction.on_commit(lambda: record_job_change(lambda store: store.apply(instance)))
+    transaction.on_commit(lambda: invalidate_candidates(job_id))
+
+
+@receiver(post_delete, sender=Job)
+def remove_job_features(sender, instance, **kwargs):
+    job_id = instance.id
+    transaction.on_commit(lambda: record_job_change(lambda store: store.remove(job_id)))
+
+
+@receiver(post_save, sender=Job)
+def update_typeahead(sender, instance, **kwargs):
+    # Registered after the feature store handlers, whose version bump it follows
+    transaction.on_commit(lambda: typeahead_index.record_change(lambda: typeahead_index.apply(instance)))
+
+
+@receiver(post_delete, sender=Job)
+def remove_typeahead(sender, instance, **kwargs):
+    job_id = instance.id
+    transaction.on_commit(lambda: typeahead_index.record_change(lambda: typeahead_index.remove(job_id)))
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def application_changed(sender, instance, **kwargs):
+    user_id, job_id = instance.applicant_id, instance.job_id
+    transaction.on_commit(lambda: invalidate_recommendations(user_id))
+    # Applicants are excluded from the job's candidate lists
+    transaction.on_commit(lambda: invalidate_candidates(job_id))
+    transaction.on_commit(lambda: invalidate_job_employer_candidates(job_id))
+
+
+def invalidate_job_employer_candidates(job_id):
+    # A job deleted with its applications has already bumped the job set
+    # version, which invalidates its employer's lists
+    employer_id = Job.objects.filter(id=job_id).values_list('employer_id', flat=True).first()
+    if employer_id is not None:
+        invalidate_employer_candidates(employer_id)
+
+
+@receiver(post_save, sender=SavedJob)
+@receiver(post_delete, sender=SavedJob)
+def saved_job_changed(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_recommendations(user_id))
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_tracked_fields(sender, instance, **kwargs):
+    instance._tracked_values = {f: instance.__dict__.get(f) for f in TRACKED_FIELDS}
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_changed(sender, instance, created, **kwargs):
+    previous = instance._tracked_values
+    instance._tracked_values = {f: getattr(instance, f) for f in TRACKED_FIELDS}
+    changed = {f for f in TRACKED_FIELDS if created or previous[f] != instance._tracked_values[f]}
+    user_id = instance.user_id
+    if 'skills' in changed:
+        sync_skill_links(ProfileSkill, 'profile', [(instance.id, instance.skills)], skill_dictionary)
+    if changed & set(PREFERENCE_FIELDS):
+        transaction.on_commit(lambda: invalidate_recommendations(user_id))
+    if changed:
+        transaction.on_commit(lambda: record_candidate_change(lambda store: store.apply(instance)))
+
+
+@receiver(post_delete, sender=UserProfile)
+def profile_deleted(sender, instance, **kwargs):
+    if instance.user_type == 'seeker':
+        user_id = instance.user_id
+        transaction.on_commit(lambda: record_candidate_change(lambda store: store.remove(user_id)))
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=SkillAlias)
+@receiver(post_delete, sender=SkillAlias)
+def skills_changed(sender, **kwargs):
+    # Renamed, merged or deleted skills must not be served from the cache
+    transaction.on_commit(skill_dictionary.clear)
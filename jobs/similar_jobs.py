@@ -0,0 +1,180 @@
+import os
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from scipy import sparse
+
+from .ann_index import squared_distances
+from .feature_store import job_store
+from .models import Job, SimilarJob
+from .skill_matcher import skill_matcher
+
+
+SIMILAR_JOBS_PER_JOB = 8
+# Share of the score that comes from skill overlap vs the job features
+SKILL_WEIGHT = 0.5
+# Jobs scored against every other job per step, bounds peak memory
+BLOCK_SIZE = 256
+
+
+class SimilarityModel:
+    """Scaled job features and aligned skill vectors of every active job.
+
+    Similarity between two jobs blends 1 / (1 + feature distance) with
+    the cosine of their TF-IDF skill vectors.
+    """
+
+    def __init__(self):
+        job_store.ensure_current()
+        skill_matcher.ensure_current()
+        index = job_store.get_index()
+        if index is None:
+            self.ids = np.empty(0, dtype=np.int64)
+            self.row_of = {}
+            return
+        scaler, _, self.ids = index
+        self.ids = np.asarray(self.ids)
+        self.scaled = scaler.transform(job_store.features)
+        self.skills = self._aligned_skills()
+        self.row_of = {job_id: row for row, job_id in enumerate(self.ids.tolist())}
+
+    def _aligned_skills(self):
+        """Skill matrix rows in the same order as self.ids (zero if unknown)"""
+        skill_ids, job_skills = skill_matcher.job_matrix()
+        order = np.argsort(skill_ids)
+        positions = np.searchsorted(skill_ids, self.ids, sorter=order).clip(max=max(len(skill_ids) - 1, 0))
+        found = np.zeros(len(self.ids), dtype=bool)
+        if len(skill_ids):
+            positions = order[positions]
+            found = skill_ids[positions] == self.ids
+        selection = sparse.csr_matrix(
+            (np.ones(found.sum()), (np.flatnonzero(found), positions[found])),
+            shape=(len(self.ids), job_skills.shape[0]),
+        )
+        return (selection @ job_skills).tocsr()
+
+    def scores(self, rows):
+        """Similarity of the given rows against every job, shape (len(rows), n)"""
+        distances = np.sqrt(np.maximum(squared_distances(self.scaled[rows], self.scaled), 0))
+        skill_scores = (self.skills[rows] @ self.skills.T).toarray()
+        return (1 - SKILL_WEIGHT) / (1 + distances) + SKILL_WEIGHT * skill_scores
+
+    def neighbours(self, rows, k=SIMILAR_JOBS_PER_JOB):
+        """Top k (job_id, score) lists for the given rows, excluding themselves"""
+        rows = np.asarray(rows, dtype=np.int64)
+        scores = self.scores(rows)
+        scores[np.arange(len(rows)), rows] = -np.inf
+        k = min(k, len(self.ids) - 1)
+        if k <= 0:
+            return [[] for _ in rows]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            list(zip(self.ids[row_top].tolist(), row_scores.tolist()))
+            for row_top, row_scores in zip(top, top_scores)
+        ]
+
+
+def store_neighbours(job_ids, neighbours):
+    """Replace the SimilarJob rows of the given jobs"""
+    with transaction.atomic():
+        SimilarJob.objects.filter(job_id__in=list(job_ids)).delete()
+        SimilarJob.objects.bulk_create([
+            SimilarJob(job_id=job_id, similar_job_id=similar_id, rank=rank, score=score)
+            for job_id, job_neighbours in zip(job_ids, neighbours)
+            for rank, (similar_id, score) in enumerate(job_neighbours, start=1)
+        ], batch_size=1000)
+
+
+def rebuild_similar_jobs(block_size=BLOCK_SIZE):
+    """Recompute the neighbour table for every active job, block by block"""
+    model = SimilarityModel()
+    SimilarJob.objects.exclude(job__is_active=True).delete()
+    for start in range(0, len(model.ids), block_size):
+        rows = np.arange(start, min(start + block_size, len(model.ids)))
+        store_neighbours(model.ids[rows].tolist(), model.neighbours(rows))
+    return len(model.ids)
+
+
+def entering_rows(model, rows, k=SIMILAR_JOBS_PER_JOB, block_size=BLOCK_SIZE):
+    """Rows whose top k the jobs at rows now enter, by outscoring their stored k-th neighbour.
+
+    Similarity is symmetric, so each changed job's row of scores is also
+    every job's score against it. Jobs listing fewer than k neighbours
+    take any job.
+    """
+    thresholds = np.full(len(model.ids), -np.inf)
+    for job_id, score in SimilarJob.objects.filter(rank=k).values_list('job_id', 'score').iterator():
+        row = model.row_of.get(job_id)
+        if row is not None:
+            thresholds[row] = score
+    entered = np.zeros(len(model.ids), dtype=bool)
+    for start in range(0, len(rows), block_size):
+        block = np.asarray(rows[start:start + block_size], dtype=np.int64)
+        scores = model.scores(block)
+        scores[np.arange(len(block)), block] = -np.inf
+        entered |= (scores > thresholds).any(axis=0)
+    return np.flatnonzero(entered).tolist()
+
+
+def short_listed_job_ids(k=SIMILAR_JOBS_PER_JOB):
+    """Active jobs listing fewer neighbours than there are, as after a neighbour was deleted"""
+    k = min(k, Job.objects.filter(is_active=True).count() - 1)
+    return set(
+        SimilarJob.objects.filter(job__is_active=True).values('job_id').annotate(n=Count('id'))
+        .filter(n__lt=k).values_list('job_id', flat=True)
+    )
+
+
+def refresh_similar_jobs(job_ids, block_size=BLOCK_SIZE):
+    """Update the neighbour table after the given jobs were posted, edited or removed.
+
+    Recomputes the neighbours of the changed jobs that are still active,
+    of every job that listed one of them, of every job one of them now
+    enters the top k of, and of every job left short of neighbours by a
+    deletion. Returns the number of jobs recomputed.
+    """
+    model = SimilarityModel()
+    job_ids = set(job_ids)
+    SimilarJob.objects.filter(job_id__in=[job_id for job_id in job_ids if job_id not in model.row_of]).delete()
+
+    changed = sorted(model.row_of[job_id] for job_id in job_ids if job_id in model.row_of)
+    affected = set(SimilarJob.objects.filter(similar_job_id__in=job_ids).values_list('job_id', flat=True))
+    affected |= short_listed_job_ids()
+    rows = set(changed) | set(entering_rows(model, changed, block_size=block_size))
+    rows |= {model.row_of[job_id] for job_id in affected if job_id in model.row_of}
+
+    rows = np.array(sorted(rows), dtype=np.int64)
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        store_neighbours(model.ids[block].tolist(), model.neighbours(block))
+    return len(rows)
+
+
+# =========================
+# Offline refresh bookkeeping
+# =========================
+
+def synced_at_path():
+    return os.path.join(settings.RECOMMENDER_DATA_DIR, 'similar_jobs_synced_at')
+
+
+def read_synced_at():
+    """When the last rebuild or refresh started, or None if there was none"""
+    try:
+        with open(synced_at_path()) as f:
+            return datetime.fromisoformat(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_synced_at(when):
+    os.makedirs(settings.RECOMMENDER_DATA_DIR, exist_ok=True)
+    with open(synced_at_path(), 'w') as f:
+        f.write(when.isoformat())
@@ -0,0 +1,343 @@
+import threading
+import time
+
+import numpy as np
+from django.utils import timezone
+from scipy import sparse
+
+from .caching import get_job_set_version, get_seeker_set_version
+from .feature_store import CATCH_UP_MARGIN
+from .models import Job, JobSkill, ProfileSkill, Skill, SkillAlias, UserProfile
+from .skills import tokenize_skills
+
+
+# Minimum seconds between catch-ups with profile or job changes
+MIN_REBUILD_INTERVAL = 60
+# Changed or removed rows held outside an inverted index before they are folded in
+COMPACT_AFTER = 1024
+# Share of rows changed since the last full build after which IDF is refitted
+REFIT_AFTER = 0.2
+
+
+def normalize_rows(matrix):
+    """Scale each row of a CSR matrix to unit L2 norm"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+class SkillPostings:
+    """TF-IDF rows of one side, as a CSC inverted index plus an overlay of changed rows.
+
+    A changed or removed owner's row is masked out of the index, and its
+    new row kept in a small CSR overlay scored by a direct product. The
+    overlay is folded into the index once it holds COMPACT_AFTER rows,
+    so catching up costs the changed rows rather than a rebuild.
+    """
+
+    def __init__(self, ids, matrix):
+        self.ids = ids
+        self.index = matrix.tocsc()
+        self.live = np.ones(len(ids), dtype=bool)
+        self.n_stale = 0
+        self.pending = {}
+        self._row_of = None
+        self._overlay = None
+
+    def __len__(self):
+        return len(self.ids) - self.n_stale + len(self.pending)
+
+    def _rows(self):
+        if self._row_of is None:
+            self._row_of = {obj_id: row for row, obj_id in enumerate(self.ids.tolist())}
+        return self._row_of
+
+    def update(self, rows, n_columns):
+        """Replace owners' rows, {id: (columns, weights) or None to remove}"""
+        for obj_id, row in rows.items():
+            base_row = self._rows().get(obj_id)
+            if base_row is not None and self.live[base_row]:
+                self.live[base_row] = False
+                self.n_stale += 1
+            if row is None:
+                self.pending.pop(obj_id, None)
+            else:
+                self.pending[obj_id] = row
+        self._overlay = None
+        if self.n_stale + len(self.pending) >= COMPACT_AFTER:
+            self.compact(n_columns)
+
+    def missing(self, live_ids):
+        """Ids with a row that are not in the live_ids queryset"""
+        live = np.fromiter(live_ids.order_by().iterator(), dtype=np.int64)
+        ids = np.concatenate([self.ids[self.live], np.fromiter(self.pending, dtype=np.int64)])
+        return ids[~np.isin(ids, live)].tolist()
+
+    def overlay(self, n_columns):
+        """(ids, CSR matrix) of the pending rows"""
+        if self._overlay is None or self._overlay[1].shape[1] != n_columns:
+            ids = np.fromiter(self.pending, dtype=np.int64, count=len(self.pending))
+            rows = list(self.pending.values())
+            indptr = np.concatenate([[0], np.cumsum([len(columns) for columns, _ in rows])]).astype(np.int64)
+            columns = np.concatenate([columns for columns, _ in rows]) if rows else np.empty(0, dtype=np.int64)
+            weights = np.concatenate([weights for _, weights in rows]) if rows else np.empty(0)
+            self._overlay = ids, sparse.csr_matrix((weights, columns, indptr), shape=(len(rows), n_columns))
+        return self._overlay
+
+    def compact(self, n_columns):
+        """Fold the overlay into the index, widened to n_columns"""
+        if not self.pending and not self.n_stale:
+            self.index.resize(len(self.ids), n_columns)
+            return
+        keep = np.flatnonzero(self.live)
+        base = self.index[keep].tocsr()
+        base.resize(len(keep), n_columns)
+        ids, overlay = self.overlay(n_columns)
+        self.ids = np.concatenate([self.ids[keep], ids])
+        self.index = sparse.vstack([base, overlay]).tocsc()
+        self.live = np.ones(len(self.ids), dtype=bool)
+        self.n_stale = 0
+        self.pending = {}
+        self._row_of = None
+        self._overlay = None
+
+    def scores(self, columns, weights, n_columns):
+        """(ids, cosine scores) of every row sharing a column with the query"""
+        # Walk only the posting lists of the query's skills
+        indexed = columns < self.index.shape[1]
+        starts = self.index.indptr[columns[indexed]]
+        ends = self.index.indptr[columns[indexed] + 1]
+        lengths = ends - starts
+        ids, scores = np.empty(0, dtype=np.int64), np.empty(0)
+        if lengths.sum():
+            postings = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+            rows = self.index.indices[postings]
+            values = self.index.data[postings] * np.repeat(weights[indexed], lengths)
+            candidate_rows, inverse = np.unique(rows, return_inverse=True)
+            scores = np.bincount(inverse.reshape(-1), weights=values)
+            live = self.live[candidate_rows]
+            ids, scores = self.ids[candidate_rows[live]], scores[live]
+
+        if self.pending:
+            pending_ids, overlay = self.overlay(n_columns)
+            query = np.zeros(n_columns)
+            query[columns] = weights
+            pending_scores = overlay @ query
+            matched = pending_scores > 0
+            ids = np.concatenate([ids, pending_ids[matched]])
+            scores = np.concatenate([scores, pending_scores[matched]])
+        return ids, scores
+
+
+class SkillMatcher:
+    """TF-IDF skill matching between active jobs and job seekers.
+
+    Jobs and seekers share one vocabulary, a column per Skill linked from
+    either side, reached from query text through skill names and aliases.
+    Each side is kept as SkillPostings, an inverted index of L2-normalised
+    rows, so a query only touches rows sharing at least one skill.
+
+    The first use builds both sides from the skill links. Later changes
+    are caught up row by row: only jobs and profiles updated since the
+    last sync are read, skills seen for the first time get a new column,
+    and IDF weights stay as fitted until REFIT_AFTER of the rows have
+    changed, when both sides are rebuilt.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.vocabulary = {}
+        self.column_of = {}
+        self.idf = np.empty(0)
+        self.n_documents = 0
+        self.jobs = SkillPostings(np.empty(0, dtype=np.int64), sparse.csr_matrix((0, 0)))
+        self.seekers = SkillPostings(np.empty(0, dtype=np.int64), sparse.csr_matrix((0, 0)))
+        self.changed = 0
+        self.versions = None
+        self.synced_at = None
+        self.built_at = 0
+
+    @staticmethod
+    def _link_matrix(owner_ids, links, columns, n_skills):
+        """CSR matrix with a 1 per (owner, skill) link, one row per sorted owner id.
+
+        Links whose owner is not in owner_ids, such as one saved between
+        the two queries, are dropped.
+        """
+        rows = np.searchsorted(owner_ids, links[:, 0]).clip(max=max(len(owner_ids) - 1, 0))
+        known = owner_ids[rows] == links[:, 0] if len(owner_ids) else np.zeros(len(links), dtype=bool)
+        return sparse.csr_matrix(
+            (np.ones(known.sum()), (rows[known], columns[known])), shape=(len(owner_ids), n_skills)
+        )
+
+    @staticmethod
+    def _fetch(jobs, profiles):
+        """(job ids, job links, [profile id, user id] rows, seeker links) of the given rows"""
+        job_ids = np.fromiter(
+            jobs.filter(is_active=True).values_list('id', flat=True).order_by('id').iterator(), dtype=np.int64
+        )
+        job_links = np.array(
+            JobSkill.objects.filter(job__in=jobs.filter(is_active=True)).values_list('job_id', 'skill_id'),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        seekers = np.array(
+            profiles.filter(user_type='seeker').values_list('id', 'user_id').order_by('id'), dtype=np.int64,
+        ).reshape(-1, 2)
+        seeker_links = np.array(
+            ProfileSkill.objects.filter(profile__in=profiles.filter(user_type='seeker'))
+            .values_list('profile_id', 'skill_id'),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        return job_ids, job_links, seekers, seeker_links
+
+    def _update_vocabulary(self):
+        names = [*Skill.objects.values_list('name', 'id'), *SkillAlias.objects.values_list('name', 'skill_id')]
+        self.vocabulary = {name: self.column_of[skill_id] for name, skill_id in names if skill_id in self.column_of}
+
+    def build(self):
+        """Rebuild both sides from the job and profile skill links"""
+        with self.lock:
+            versions, synced_at = (get_job_set_version(), get_seeker_set_version()), timezone.now()
+            job_ids, job_links, seekers, seeker_links = self._fetch(Job.objects.all(), UserProfile.objects.all())
+
+            # Columns are the skills linked at least once, in Skill id order
+            skill_ids, columns = np.unique(
+                np.concatenate([job_links[:, 1], seeker_links[:, 1]]), return_inverse=True
+            )
+            columns = columns.reshape(-1)
+            n_skills = len(skill_ids)
+            self.column_of = dict(zip(skill_ids.tolist(), range(n_skills)))
+            self._update_vocabulary()
+
+            jobs = self._link_matrix(job_ids, job_links, columns[:len(job_links)], n_skills)
+            seeker_matrix = self._link_matrix(seekers[:, 0], seeker_links, columns[len(job_links):], n_skills)
+
+            # Smoothed IDF over both corpora, as in sklearn's TfidfTransformer
+            self.n_documents = jobs.shape[0] + seeker_matrix.shape[0]
+            document_frequency = np.asarray(jobs.sum(axis=0) + seeker_matrix.sum(axis=0)).ravel()
+            self.idf = np.log((1 + self.n_documents) / (1 + document_frequency)) + 1
+            weights = sparse.diags(self.idf)
+
+            self.jobs = SkillPostings(job_ids, normalize_rows(jobs @ weights))
+            self.seekers = SkillPostings(seekers[:, 1].copy(), normalize_rows(seeker_matrix @ weights))
+            self.changed = 0
+            self.versions = versions
+            self.synced_at = synced_at
+            self.built_at = time.monotonic()
+
+    def _weighted_rows(self, owner_ids, links):
+        """{owner id: (columns, normalised weights)} of each owner's links"""
+        grouped = {owner_id: [] for owner_id in owner_ids.tolist()}
+        for owner_id, skill_id in links.tolist():
+            if owner_id in grouped:
+                grouped[owner_id].append(self.column_of[skill_id])
+        rows = {}
+        for owner_id, owner_columns in grouped.items():
+            owner_columns = np.unique(np.array(owner_columns, dtype=np.int64))
+            weights = self.idf[owner_columns]
+            norm = np.sqrt((weights ** 2).sum())
+            rows[owner_id] = owner_columns, weights / norm if norm else weights
+        return rows
+
+    def catch_up(self, since):
+        """Re-read the jobs and profiles updated since a time, and drop deleted ones"""
+        with self.lock:
+            versions, synced_at = (get_job_set_version(), get_seeker_set_version()), timezone.now()
+            since = since - CATCH_UP_MARGIN
+            changed_jobs = Job.objects.filter(updated_at__gte=since)
+            changed_profiles = UserProfile.objects.filter(updated_at__gte=since)
+            job_ids, job_links, seekers, seeker_links = self._fetch(changed_jobs, changed_profiles)
+
+            self.changed += len(job_ids) + len(seekers)
+            if self.changed > REFIT_AFTER * max(len(self.jobs) + len(self.seekers), 1):
+                self.build()
+                return
+
+            # Skills linked for the first time get a column, weighted by this batch's links
+            skill_ids = np.concatenate([job_links[:, 1], seeker_links[:, 1]])
+            known = np.fromiter(self.column_of, dtype=np.int64, count=len(self.column_of))
+            new_skills, counts = np.unique(skill_ids[~np.isin(skill_ids, known)], return_counts=True)
+            if len(new_skills):
+                self.column_of.update(zip(new_skills.tolist(), range(len(self.idf), len(self.idf) + len(new_skills))))
+                self.idf = np.concatenate([self.idf, np.log((1 + self.n_documents) / (1 + counts)) + 1])
+            self._update_vocabulary()
+
+            # Rows of inactive, deleted or no longer seeking owners are removed
+            job_rows = dict.fromkeys(self.jobs.missing(
+                Job.objects.filter(is_active=True).values_list('id', flat=True)
+            ))
+            seeker_rows = dict.fromkeys(self.seekers.missing(
+                UserProfile.objects.filter(user_type='seeker').values_list('user_id', flat=True)
+            ))
+            job_rows.update(self._weighted_rows(job_ids, job_links))
+            profile_rows = self._weighted_rows(seekers[:, 0], seeker_links)
+            seeker_rows.update((user_id, profile_rows[profile_id]) for profile_id, user_id in seekers.tolist())
+
+            self.jobs.update(job_rows, len(self.idf))
+            self.seekers.update(seeker_rows, len(self.idf))
+            self.versions = versions
+            self.synced_at = synced_at
+            self.built_at = time.monotonic()
+
+    def ensure_current(self):
+        """Catch up when jobs or seekers changed, at most once per interval"""
+        with self.lock:
+            if self.versions is None:
+                self.build()
+            elif time.monotonic() - self.built_at >= MIN_REBUILD_INTERVAL:
+                if self.versions != (get_job_set_version(), get_seeker_set_version()):
+                    self.catch_up(self.synced_at)
+        return self
+
+    def vectorize(self, text):
+        """Return (columns, weights) of the normalised TF-IDF query vector"""
+        # Aliases share their skill's column, so it is counted once
+        columns = np.unique(np.array(
+            [self.vocabulary[skill] for skill in tokenize_skills(text) if skill in self.vocabulary],
+            dtype=np.int64,
+        ))
+        weights = self.idf[columns]
+        norm = np.sqrt((weights ** 2).sum())
+        return columns, weights / norm if norm else weights
+
+    def posting_scores(self, postings, text):
+        """(ids, cosine scores) of every row sharing a skill with text"""
+        columns, weights = self.vectorize(text)
+        if len(columns) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return postings.scores(columns, weights, len(self.idf))
+
+    def score(self, postings, text, n, exclude_ids=()):
+        """Top n (id, cosine score) pairs from an inverted index"""
+        candidate_ids, scores = self.posting_scores(postings, text)
+        if len(scores) == 0:
+            return []
+        if exclude_ids:
+            keep = ~np.isin(candidate_ids, list(exclude_ids))
+            candidate_ids, scores = candidate_ids[keep], scores[keep]
+
+        if len(scores) > n:
+            top = np.argpartition(-scores, n - 1)[:n]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return list(zip(candidate_ids[top].tolist(), scores[top].tolist()))
+
+    def seeker_scores(self, skills_text):
+        """(user ids, cosine scores) of every seeker sharing a skill"""
+        with self.lock:
+            return self.posting_scores(self.seekers, skills_text)
+
+    def match_jobs(self, skills_text, n=10, exclude_ids=()):
+        """Active job ids whose required skills best match the given skills"""
+        with self.lock:
+            return self.score(self.jobs, skills_text, n, exclude_ids)
+
+    def job_matrix(self):
+        """(job ids, CSR matrix of their skill rows), with every change folded in"""
+        with self.lock:
+            self.jobs.compact(len(self.idf))
+            return self.jobs.ids, self.jobs.index.tocsr()
+
+
+skill_matcher = SkillMatcher()
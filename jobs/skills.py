@@ -0,0 +1,153 @@
+import re
+import threading
+
+from django.db import transaction
+
+from .models import Skill, SkillAlias
+
+
+# Common spellings folded onto one canonical skill name
+SKILL_ALIASES = {
+    'js': 'javascript',
+    'ts': 'typescript',
+    'reactjs': 'react',
+    'react.js': 'react',
+    'node': 'node.js',
+    'nodejs': 'node.js',
+    'vuejs': 'vue',
+    'vue.js': 'vue',
+    'postgres': 'postgresql',
+    'psql': 'postgresql',
+    'golang': 'go',
+    'ml': 'machine learning',
+    'ai': 'artificial intelligence',
+    'k8s': 'kubernetes',
+    'ms excel': 'excel',
+    'microsoft excel': 'excel',
+    'c sharp': 'c#',
+    'cpp': 'c++',
+}
+
+SKILL_SEPARATORS = re.compile(r'[,;\n]')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_skill(skill):
+    """Canonical form of a single skill name"""
+    skill = WHITESPACE.sub(' ', skill.strip().lower())
+    return SKILL_ALIASES.get(skill, skill)
+
+
+def tokenize_skills(text):
+    """Split comma separated skill text into unique canonical skills"""
+    if not text:
+        return []
+    skills = (normalize_skill(skill) for skill in SKILL_SEPARATORS.split(text))
+    return list(dict.fromkeys(skill for skill in skills if skill))
+
+
+# =========================
+# Skill table
+# =========================
+
+# Longest name a Skill row holds; longer text is not taken for a skill
+MAX_SKILL_LENGTH = 100
+
+
+class SkillDictionary:
+    """Canonical skill name or alias -> Skill id, cached per process.
+
+    Names the process has not seen are looked up with one query for
+    aliases and one for skill names, aliases first so an alias added for
+    an existing skill name folds it onto its target. Ids are only cached
+    once the transaction that read them commits, so a rolled back insert
+    is never remembered. Takes the model classes so data migrations can
+    pass their historical models.
+    """
+
+    def __init__(self, skill_model, alias_model):
+        self.skill_model = skill_model
+        self.alias_model = alias_model
+        self.lock = threading.Lock()
+        self.ids = {}
+
+    def clear(self):
+        with self.lock:
+            self.ids = {}
+
+    def _remember(self, found):
+        with self.lock:
+            self.ids.update(found)
+
+    def _fetch(self, names):
+        found = dict(self.alias_model.objects.filter(name__in=names).values_list('name', 'skill_id'))
+        found.update(self.skill_model.objects.filter(name__in=names - found.keys()).values_list('name', 'id'))
+        transaction.on_commit(lambda: self._remember(found))
+        return found
+
+    def lookup(self, names, create=False):
+        """{name: Skill id} of the canonical names that are known, creating the others when create is set"""
+        with self.lock:
+            found = {name: self.ids[name] for name in names if name in self.ids}
+        missing = set(names) - found.keys()
+        if missing:
+            found.update(self._fetch(missing))
+            missing -= found.keys()
+        if missing and create:
+            self.skill_model.objects.bulk_create(
+                [self.skill_model(name=name) for name in sorted(missing)], ignore_conflicts=True
+            )
+            found.update(self._fetch(missing))
+        return found
+
+
+def sync_skill_links(link_model, owner_field, rows, dictionary):
+    """Make the skill links of each (owner id, skill text) row match its text.
+
+    Only the difference to the stored links is written: one query reads
+    the current links of every owner, then one deletes the stale ones and
+    one bulk inserts the new. Returns the number of links added and removed.
+    """
+    names = {
+        owner_id: [name for name in tokenize_skills(text) if len(name) <= MAX_SKILL_LENGTH]
+        for owner_id, text in rows
+    }
+    ids = dictionary.lookup({name for owner_names in names.values() for name in owner_names}, create=True)
+    wanted = {owner_id: {ids[name] for name in owner_names} for owner_id, owner_names in names.items()}
+
+    owner_column = f'{owner_field}_id'
+    stale = []
+    links = link_model.objects.filter(**{f'{owner_column}__in': list(wanted)})
+    for link_id, owner_id, skill_id in links.values_list('id', owner_column, 'skill_id').iterator():
+        if skill_id in wanted[owner_id]:
+            wanted[owner_id].discard(skill_id)
+        else:
+            stale.append(link_id)
+    if stale:
+        link_model.objects.filter(id__in=stale).delete()
+    new = [
+        link_model(**{owner_column: owner_id, 'skill_id': skill_id})
+        for owner_id, skill_ids in wanted.items() for skill_id in skill_ids
+    ]
+    link_model.objects.bulk_create(new, ignore_conflicts=True)
+    return len(stale) + len(new)
+
+
+def backfill_skill_links(queryset, text_field, link_model, owner_field, dictionary, batch_size=1000):
+    """Sync the skill links of every row of queryset, batch_size rows at a time.
+
+    Rows are walked in primary key order and each batch commits on its
+    own, so an interrupted run can simply be repeated; rows already in
+    sync cost one read. Returns the number of links added and removed.
+    """
+    changed, last_id = 0, 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', text_field)[:batch_size])
+        if not rows:
+            return changed
+        with transaction.atomic():
+            changed += sync_skill_links(link_model, owner_field, rows, dictionary)
+        last_id = rows[-1][0]
+
+
+skill_dictionary = SkillDictionary(Skill, SkillAlias)
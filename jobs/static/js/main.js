@@ -31,5 +31,75 @@ document.addEventListener("DOMContentLoaded", function () {
     };
   });
 
+  // 4. Load recommendations after the page has rendered
+  document.querySelectorAll("[data-recommendations-url]").forEach((slot) => {
+    loadRecommendations(slot, 0);
+  });
+
+  // 5. Suggest titles, skills, companies and locations in the search boxes
+  document.querySelectorAll("form[data-typeahead-url]").forEach((form) => {
+    form.querySelectorAll("input[data-typeahead]").forEach((input) => {
+      attachTypeahead(input, form.dataset.typeaheadUrl);
+    });
+  });
+
   console.log("✅ CareerConnect loaded");
 });
+
+// Recommendations are computed in the background on the server; while they
+// are not ready the endpoint answers 202 and says when to ask again.
+function loadRecommendations(slot, attempt) {
+  fetch(slot.dataset.recommendationsUrl, { credentials: "same-origin" })
+    .then((response) => response.json())
+    .then((data) => {
+      if (data.status === "pending") {
+        if (attempt < 20) {
+          setTimeout(() => loadRecommendations(slot, attempt + 1), data.retry_after);
+        }
+        return;
+      }
+      if (data.html) {
+        slot.innerHTML = data.html;
+      }
+    })
+    .catch(() => {});
+}
+
+// Suggestions come from an in-memory index on the server, so each keystroke
+// is one small request; answers to earlier keystrokes are ignored.
+function attachTypeahead(input, url) {
+  const list = document.createElement("datalist");
+  list.id = "typeahead-" + input.name;
+  input.setAttribute("list", list.id);
+  input.after(list);
+
+  let timer = null;
+  let latest = "";
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(() => {
+      const query = input.value.trim();
+      latest = query;
+      if (!query) {
+        list.innerHTML = "";
+        return;
+      }
+      const params = new URLSearchParams({ q: query, field: input.dataset.typeahead });
+      fetch(url + "?" + params, { credentials: "same-origin" })
+        .then((response) => response.json())
+        .then((data) => {
+          if (data.query !== latest) {
+            return;
+          }
+          list.innerHTML = "";
+          data.suggestions.forEach((suggestion) => {
+            const option = document.createElement("option");
+            option.value = suggestion.text;
+            option.label = suggestion.count + (suggestion.count === 1 ? " job" : " jobs");
+            list.appendChild(option);
+          });
+        })
+        .catch(() => {});
+    }, 80);
+  });
+}
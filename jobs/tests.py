@@ -1,3 +1,1076 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from sklearn.neighbors import NearestNeighbors
+
+from . import recommendations
+from .ann_index import IVFIndex
+from .artifacts import bundles_dir, current_bundle, publish_bundle
+from .benchmark import candidate_scenario
+from .caching import (
+    get_cached_candidates,
+    get_cached_employer_candidates,
+    get_cached_recommendations,
+    get_job_set_version,
+    get_seeker_set_version,
+    set_cached_candidates,
+    set_cached_employer_candidates,
+    set_cached_recommendations,
+)
+from .candidate_pipeline import CandidatePipeline, SeekerFilterIndex
+from .collaborative import CollaborativeModel, current_model, model_path
+from .facets import facet_counts, salary_histogram
+from .feature_store import CandidateFeatureStore, JobFeatureStore, job_store
+from .ml_recommender import (
+    CandidateRecommender,
+    JobRecommender,
+    get_candidate_recommendations_for_jobs,
+    precompute_job_recommendations,
+)
+from .models import Application, Contact, Job, JobRecommendation, SavedJob, Skill, SkillAlias, UserProfile
+from .geo import GEOHASH_END, cover_cells, resolve_location
+from .pagination import KeysetPaginator
+from .profiling import Histogram, MetricsRegistry, count_event, instrument, record_size, stage
+from .search import filter_jobs, fts_available, normalize_search, search_jobs
+from .skill_matcher import SkillMatcher, skill_matcher
+from .skills import skill_dictionary
+from .typeahead import FIELD_KINDS, TypeaheadIndex, typeahead_index
+
+
+# A plan line that reads a whole table, e.g. "SCAN jobs_job", as opposed to
+# "SCAN jobs_job USING INDEX ..." or a SEARCH
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+def create_job(employer, title, **fields):
+    """An active job with every required field filled in"""
+    fields = {
+        'company_name': 'Acme', 'description': 'Build things', 'responsibilities': 'Code',
+        'requirements': 'Python', 'category': 'it', 'job_type': 'full-time', 'location': 'London',
+        'skills_required': 'python', **fields,
+    }
+    return Job.objects.create(employer=employer, title=title, **fields)
+
+
+def create_seeker(username, **fields):
+    """A job seeker's user and profile"""
+    user = User.objects.create(username=username)
+    UserProfile.objects.create(user=user, user_type='seeker', **fields)
+    return user
+
+
+def use_temporary_data_dir(test):
+    """Point RECOMMENDER_DATA_DIR at an empty directory for the rest of a test"""
+    data_dir = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, data_dir)
+    settings_override = override_settings(RECOMMENDER_DATA_DIR=data_dir)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class QueryPlanTests(TestCase):
+    """The hot queries of the listing, dashboard and admin views must use an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        cls.seeker = User.objects.create_user('seeker', password='pw')
+        UserProfile.objects.create(user=cls.seeker, user_type='seeker')
+        cls.job = Job.objects.create(
+            employer=cls.employer, title='Python Developer', company_name='Acme',
+            description='Build things', responsibilities='Code', requirements='Python',
+            category='it', job_type='full-time', location='London', skills_required='python',
+        )
+        Application.objects.create(
+            job=cls.job, applicant=cls.seeker, cover_letter='Hello',
+            contact_email='seeker@example.com', contact_phone='123',
+        )
+
+    def assertUsesIndexes(self, queryset):
+        plan = queryset.explain()
+        scans = [line for line in plan.splitlines() if FULL_SCAN.search(line.strip())]
+        self.assertFalse(scans, f'Full table scan in:\n{plan}\nfor:\n{queryset.query}')
+
+    def assertNoJobScans(self, run):
+        """Run the callable and check no query it makes reads the whole jobs table"""
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        plans = []
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            scans = [line for line in plan if (match := FULL_SCAN.search(line)) and match[1] == Job._meta.db_table]
+            plan_text = '\n'.join(plan)
+            self.assertFalse(scans, f"Full scan of jobs in:\n{plan_text}\nfor:\n{query['sql']}")
+            plans.append(plan)
+        return plans
+
+    def keyset_page(self, queryset, ordering, after):
+        """The queryset of the page following the given row, as KeysetPaginator runs it"""
+        paginator = KeysetPaginator(queryset, 20, ordering)
+        values = [getattr(after, field.lstrip('-')) for field in ordering]
+        return queryset.filter(paginator.seek(values, reverse=False)).order_by(*ordering)[:21]
+
+    def test_home_recent_jobs(self):
+        self.assertUsesIndexes(Job.objects.filter(is_active=True).order_by('-posted_date')[:6])
+
+    def test_job_listings(self):
+        active = Job.objects.filter(is_active=True)
+        ordering = ('-posted_date', '-id')
+        self.assertUsesIndexes(active.order_by(*ordering)[:13])
+        self.assertUsesIndexes(self.keyset_page(active, ordering, self.job))
+        for filtered in (active.filter(category='it'), active.filter(job_type='full-time')):
+            self.assertUsesIndexes(filtered.order_by(*ordering)[:13])
+            self.assertUsesIndexes(self.keyset_page(filtered, ordering, self.job))
+
+    def test_salary_sort_and_filter(self):
+        active = Job.objects.filter(is_active=True)
+        for ordering in (('salary_mid', 'id'), ('-salary_mid', '-id')):
+            self.assertUsesIndexes(active.order_by(*ordering)[:13])
+            self.assertUsesIndexes(self.keyset_page(active, ordering, self.job))
+        self.assertUsesIndexes(active.filter(salary_mid__gte=50000))
+
+    def test_radius_search(self):
+        london = resolve_location('London')
+        cell = cover_cells(london.latitude, london.longitude, 50)[0]
+        self.assertUsesIndexes(Job.objects.filter(is_active=True, geohash__gte=cell, geohash__lt=cell + GEOHASH_END))
+
+    def test_skill_filter(self):
+        skill = Skill.objects.get(name='python')
+        self.assertUsesIndexes(Job.objects.filter(is_active=True, skill_links__skill=skill))
+
+    @skipUnless(fts_available(), 'SQLite was built without FTS5')
+    def test_keyword_search(self):
+        active = Job.objects.filter(is_active=True)
+        matches, ranked = search_jobs(active, 'python developer')
+        self.assertTrue(ranked)
+        ordered = matches.order_by('search_rank', '-posted_date', '-id')
+        # BM25 ordering reads the matches from the index, then each job by id
+        plan = self.assertNoJobScans(lambda: list(ordered[:13]))[-1]
+        self.assertIn('SEARCH jobs_job USING INTEGER PRIMARY KEY (rowid=?)', plan)
+        self.assertNoJobScans(lambda: (facet_counts(matches), salary_histogram(matches)))
+
+    def test_facet_counts_and_salary_histogram(self):
+        active = Job.objects.filter(is_active=True)
+        plans = self.assertNoJobScans(lambda: facet_counts(active))
+        self.assertIn('job_active_', plans[0][0])
+        plans = self.assertNoJobScans(lambda: salary_histogram(active))
+        self.assertIn('job_active_band_idx', plans[0][0])
+        for filtered in (active.filter(category='it'), active.filter(job_type='full-time')):
+            self.assertNoJobScans(lambda: (facet_counts(filtered), salary_histogram(filtered)))
+
+    def test_job_detail_and_dashboards(self):
+        self.assertUsesIndexes(Application.objects.filter(applicant=self.seeker, job=self.job))
+        self.assertUsesIndexes(SavedJob.objects.filter(user=self.seeker, job=self.job))
+        self.assertUsesIndexes(Application.objects.filter(applicant=self.seeker))
+        self.assertUsesIndexes(Job.objects.filter(employer=self.employer, is_active=True))
+        self.assertUsesIndexes(Application.objects.filter(job__employer=self.employer))
+        self.assertUsesIndexes(Application.objects.filter(job=self.job))
+
+    def test_admin_tables(self):
+        jobs = Job.objects.select_related('employer')
+        self.assertUsesIndexes(self.keyset_page(jobs, ('-posted_date', '-id'), self.job))
+        self.assertUsesIndexes(self.keyset_page(jobs.filter(is_active=True), ('-posted_date', '-id'), self.job))
+
+        applications = Application.objects.select_related('job', 'applicant')
+        application = Application.objects.get()
+        ordering = ('-applied_date', '-id')
+        self.assertUsesIndexes(self.keyset_page(applications, ordering, application))
+        self.assertUsesIndexes(self.keyset_page(applications.filter(status='pending'), ordering, application))
+
+        users = User.objects.select_related('profile')
+        self.assertUsesIndexes(self.keyset_page(users, ('-date_joined', '-id'), self.seeker))
+
+        contact = Contact.objects.create(name='A', email='a@example.com', subject='Hi', message='Hello')
+        self.assertUsesIndexes(self.keyset_page(Contact.objects.all(), ('-created_at', '-id'), contact))
+        self.assertUsesIndexes(
+            self.keyset_page(Contact.objects.filter(is_resolved=False), ('-created_at', '-id'), contact)
+        )
+
+    def test_admin_dashboard_counts(self):
+        week_ago = timezone.now() - timedelta(days=7)
+        self.assertUsesIndexes(UserProfile.objects.filter(user_type='seeker'))
+        self.assertUsesIndexes(Job.objects.filter(posted_date__gte=week_ago))
+        self.assertUsesIndexes(Application.objects.filter(status='pending'))
+        self.assertUsesIndexes(Application.objects.filter(applied_date__gte=week_ago))
+        self.assertUsesIndexes(User.objects.filter(date_joined__gte=week_ago))
+        self.assertUsesIndexes(Contact.objects.filter(is_resolved=False))
+
+
+class KeysetPaginationTests(TestCase):
+    """First, Next, Last and Prev agree on page numbers and contents"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Contact.objects.bulk_create([
+            Contact(name=f'C{i}', email='c@example.com', subject='Hi', message='Hello') for i in range(25)
+        ])
+
+    def setUp(self):
+        self.paginator = KeysetPaginator(Contact.objects.all(), 12, ('-created_at', '-id'))
+
+    def ids(self, page):
+        return [contact.id for contact in page]
+
+    def test_forward_and_back_from_last(self):
+        forward = [self.paginator.page()]
+        while forward[-1].has_next():
+            forward.append(self.paginator.page(forward[-1].next_cursor))
+        self.assertEqual([(page.number, len(page)) for page in forward], [(1, 12), (2, 12), (3, 1)])
+
+        backward = [self.paginator.page(self.paginator.last_cursor)]
+        while backward[-1].has_previous():
+            backward.append(self.paginator.page(backward[-1].previous_cursor))
+        backward.reverse()
+        self.assertEqual([page.number for page in backward], [1, 2, 3])
+        self.assertEqual([self.ids(page) for page in backward], [self.ids(page) for page in forward])
+        self.assertFalse(backward[-1].has_next())
+        self.assertTrue(backward[-1].has_previous())
+
+    def test_next_from_a_page_reached_backwards(self):
+        last = self.paginator.page(self.paginator.last_cursor)
+        second = self.paginator.page(last.previous_cursor)
+        self.assertEqual(self.ids(self.paginator.page(second.next_cursor)), self.ids(last))
+
+
+class TypeaheadTests(TestCase):
+    """Suggestions follow active jobs as they are saved and deleted"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        for title, skills, location in (
+            ('Python Developer', 'Python, Django', 'London'),
+            ('Senior Python Developer', 'python, AWS', 'London'),
+            ('Data Analyst', 'SQL, python', 'Leeds'),
+        ):
+            Job.objects.create(
+                employer=cls.employer, title=title, company_name='Acme', description='Build things',
+                responsibilities='Code', requirements='Python', category='it', job_type='full-time',
+                location=location, skills_required=skills,
+            )
+
+    def test_suggestions_ranked_by_active_jobs(self):
+        index = TypeaheadIndex()
+        index.build()
+        self.assertEqual(
+            [(s['text'], s['count']) for s in index.suggest('py')],
+            # Later words of a term match too, after terms starting with the prefix
+            [('python', 3), ('Python Developer', 1), ('Senior Python Developer', 1)],
+        )
+        self.assertEqual(
+            [(s['text'], s['count']) for s in index.suggest('l', FIELD_KINDS['location'])],
+            [('London', 2), ('Leeds', 1)],
+        )
+
+    def test_job_changes_patch_the_index(self):
+        typeahead_index.build()
+        job = Job.objects.get(title='Data Analyst')
+        with self.captureOnCommitCallbacks(execute=True):
+            job.title = 'Data Scientist'
+            job.save()
+        self.assertEqual([s['text'] for s in typeahead_index.suggest('data')], ['Data Scientist'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.is_active = False
+            job.save()
+        self.assertEqual(typeahead_index.suggest('data'), [])
+        self.assertEqual(typeahead_index.suggest('leeds', FIELD_KINDS['location']), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.get(title='Python Developer').delete()
+        self.assertEqual(typeahead_index.suggest('py')[0]['count'], 1)
+        self.assertEqual(typeahead_index.version, typeahead_index.ensure_current().version)
+
+
+class KeywordSearchTests(TestCase):
+    """Jobs saved after migrating reach the keyword search, through the FTS5 triggers where available"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+
+    def titles(self, keyword):
+        jobs, ranked = search_jobs(Job.objects.filter(is_active=True), keyword)
+        self.assertEqual(ranked, fts_available())
+        return list(jobs.values_list('title', flat=True))
+
+    def test_created_edited_and_deleted_jobs(self):
+        job = Job.objects.create(
+            employer=self.employer, title='Zebra Keeper', company_name='Acme', description='Feed animals',
+            responsibilities='Feed', requirements='Patience', category='other', job_type='full-time',
+            location='London', skills_required='husbandry',
+        )
+        self.assertEqual(self.titles('zebra'), ['Zebra Keeper'])
+
+        job.title = 'Giraffe Keeper'
+        job.save()
+        self.assertEqual(self.titles('giraffe'), ['Giraffe Keeper'])
+        self.assertEqual(self.titles('zebra'), [])
+        self.assertEqual(self.titles('keep'), ['Giraffe Keeper'])
+
+        job.delete()
+        self.assertEqual(self.titles('giraffe'), [])
+
+
+class LocationSearchTests(TestCase):
+    """Listing location filters go through the gazetteer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        employer = User.objects.create_user('employer', password='pw')
+        for title, location in (
+            ('Central', 'London'),
+            ('Outer', 'Greater London'),
+            ('University', 'Cambridge, UK'),
+            ('Overseas', 'London, Ontario'),
+            ('Anywhere', 'Remote'),
+        ):
+            Job.objects.create(
+                employer=employer, title=title, company_name='Acme', description='Build things',
+                responsibilities='Code', requirements='Python', category='it', job_type='full-time',
+                location=location, skills_required='python',
+            )
+
+    def titles(self, location, radius=None):
+        jobs, _ = filter_jobs(normalize_search({'location': location, 'radius': radius}))
+        return sorted(jobs.values_list('title', flat=True))
+
+    def test_saved_jobs_are_geocoded(self):
+        job = Job.objects.get(title='Outer')
+        self.assertEqual(job.geohash, resolve_location('London').geohash)
+        self.assertEqual(Job.objects.get(title='Anywhere').geohash, '')
+
+    def test_aliases_match_the_same_place(self):
+        self.assertEqual(self.titles('London'), ['Central', 'Outer'])
+        self.assertEqual(self.titles('greater  london'), ['Central', 'Outer'])
+        self.assertEqual(self.titles('London, ON'), ['Overseas'])
+
+    def test_radius(self):
+        # Cambridge is about 80 km from London
+        self.assertEqual(self.titles('London', 50), ['Central', 'Outer'])
+        self.assertEqual(self.titles('London', 100), ['Central', 'Outer', 'University'])
+
+    def test_unknown_text_falls_back_to_contains(self):
+        self.assertEqual(self.titles('remo'), ['Anywhere'])
+
+
+class SkillLinkTests(TestCase):
+    """Skill text is parsed into links to canonical skills on save"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        for title, skills in (
+            ('Frontend Developer', 'JS, React.js'),
+            ('Full Stack Developer', 'javascript, Python; postgres'),
+            ('Data Analyst', 'SQL, python'),
+        ):
+            Job.objects.create(
+                employer=cls.employer, title=title, company_name='Acme', description='Build things',
+                responsibilities='Code', requirements='Python', category='it', job_type='full-time',
+                location='London', skills_required=skills,
+            )
+
+    def skills(self, owner):
+        return sorted(owner.skill_set.values_list('name', flat=True))
+
+    def titles(self, skill):
+        jobs, _ = filter_jobs(normalize_search({'skill': skill}))
+        return sorted(jobs.values_list('title', flat=True))
+
+    def test_aliases_link_to_one_skill(self):
+        self.assertEqual(self.skills(Job.objects.get(title='Frontend Developer')), ['javascript', 'react'])
+        self.assertEqual(self.titles('js'), ['Frontend Developer', 'Full Stack Developer'])
+        self.assertEqual(self.titles('Postgres'), ['Full Stack Developer'])
+        self.assertEqual(self.titles('cobol'), [])
+
+    def test_saving_text_updates_links(self):
+        job = Job.objects.get(title='Data Analyst')
+        job.skills_required = 'SQL, Excel'
+        job.save()
+        self.assertEqual(self.skills(job), ['excel', 'sql'])
+
+        seeker = User.objects.create_user('seeker', password='pw')
+        profile = UserProfile.objects.create(user=seeker, user_type='seeker', skills='golang, k8s')
+        self.assertEqual(self.skills(profile), ['go', 'kubernetes'])
+
+    def test_stored_aliases(self):
+        SkillAlias.objects.create(name='py', skill=Skill.objects.get(name='python'))
+        job = Job.objects.get(title='Frontend Developer')
+        job.skills_required = 'py'
+        job.save()
+        self.assertEqual(self.skills(job), ['python'])
+
+    def test_candidate_features_count_links(self):
+        seeker = create_seeker('seeker', skills='JS, javascript, Python', location='London')
+        store = CandidateFeatureStore()
+        # The row written on save matches the row a reload reads back
+        _, features = store.build_features(store.annotate(UserProfile.objects.filter(user=seeker)))
+        self.assertEqual(store.vectorize(seeker.profile), features[0].tolist())
+        self.assertEqual(features[0][4], 2)
+
+    def test_skill_facet(self):
+        jobs, _ = filter_jobs(normalize_search({'skill': 'python'}))
+        self.assertEqual(
+            facet_counts(jobs)['skill'],
+            [
+                ('python', 'python', 2), ('javascript', 'javascript', 1),
+                ('postgresql', 'postgresql', 1), ('sql', 'sql', 1),
+            ],
+        )
+
+
+class SalaryTests(TestCase):
+    """Salary filters, sorts and the histogram read the derived salary columns"""
+
+    @classmethod
+    def setUpTestData(cls):
+        employer = User.objects.create_user('employer', password='pw')
+        for title, salary_min, salary_max in (
+            ('Junior', 30000, 40000),
+            ('Senior', 70000, 90000),
+            ('Floor only', 55000, None),
+            ('Unpaid', None, None),
+        ):
+            Job.objects.create(
+                employer=employer, title=title, company_name='Acme', description='Build things',
+                responsibilities='Code', requirements='Python', category='it', job_type='full-time',
+                location='London', skills_required='python', salary_min=salary_min, salary_max=salary_max,
+            )
+
+    def test_columns_follow_the_range(self):
+        self.assertEqual(
+            sorted(Job.objects.values_list('title', 'salary_mid', 'salary_band')),
+            [('Floor only', 55000, 5), ('Junior', 35000, 3), ('Senior', 80000, 8), ('Unpaid', 0, None)],
+        )
+        job = Job.objects.get(title='Junior')
+        job.salary_max = 50000
+        job.save()
+        job.refresh_from_db()
+        self.assertEqual((job.salary_mid, job.salary_band), (40000, 4))
+
+    def test_minimum_salary_filter(self):
+        jobs, _ = filter_jobs(normalize_search({'min_salary': Decimal('50000')}))
+        self.assertEqual(sorted(jobs.values_list('title', flat=True)), ['Floor only', 'Senior'])
+
+    def test_histogram(self):
+        histogram = salary_histogram(Job.objects.filter(is_active=True))
+        self.assertEqual(histogram['no_salary'], 1)
+        self.assertEqual(
+            [(b['min'], b['count']) for b in histogram['bins']],
+            [(30000, 1), (40000, 0), (50000, 1), (60000, 0), (70000, 0), (80000, 1)],
+        )
+
+
+class CandidateIndexTests(TestCase):
+    """The IVF index agrees with exact search and follows profile changes"""
+
+    def test_recall_against_exact_search(self):
+        rng = np.random.default_rng(0)
+        features = rng.normal(size=(2000, 7))
+        ids = np.arange(1, 2001)
+        index = IVFIndex.train(features, n_lists=16, n_probe=4)
+        index.build(ids, features)
+        queries = rng.normal(size=(50, 7))
+        exact = NearestNeighbors().fit(index.transform(features)).kneighbors(
+            index.transform(queries), 10, return_distance=False
+        )
+
+        _, found = index.search(queries, 10)
+        recall = np.mean([
+            len(set(ids[rows].tolist()) & set(row_ids.tolist())) / 10 for rows, row_ids in zip(exact, found)
+        ])
+        self.assertGreater(recall, 0.9)
+        # Probing every bucket is an exact search
+        _, found = index.search(queries, 10, n_probe=index.n_lists)
+        self.assertEqual(
+            [sorted(row_ids.tolist()) for row_ids in found], [sorted(ids[rows].tolist()) for rows in exact]
+        )
+
+    def test_profile_changes_fold_into_the_buckets(self):
+        seekers = [create_seeker(f'seeker{i}', experience_years=i, location='London') for i in range(40)]
+        store = CandidateFeatureStore()
+        store.load()
+        store.ann = IVFIndex.train(store.features, n_lists=4, n_probe=4)
+        store.ann.build(store.ids, store.features)
+
+        profile = seekers[0].profile
+        profile.experience_years = 50
+        store.apply(profile)
+        vector = store.vectorize(profile)
+        self.assertEqual(store.search([vector], 1)[1][0].tolist(), [seekers[0].id])
+
+        profile = seekers[1].profile
+        profile.user_type = 'employer'
+        store.apply(profile)
+        self.assertEqual(len(store), 39)
+        self.assertNotIn(seekers[1].id, store)
+        self.assertNotIn(seekers[1].id, store.search([store.vectorize(profile)], 39)[1][0].tolist())
+
+        # The overlay is folded into the buckets once it holds COMPACT_AFTER rows
+        with mock.patch('jobs.ann_index.COMPACT_AFTER', 3):
+            profile = seekers[2].profile
+            profile.experience_years = 20
+            store.apply(profile)
+        self.assertEqual((store.ann.pending, store.ann.stale_ids), ({}, set()))
+        self.assertEqual(sorted(store.ann.ids.tolist()), sorted(store.ids.tolist()))
+        self.assertEqual(store.search([vector], 1)[1][0].tolist(), [seekers[0].id])
+
+
+class SkillMatcherTests(TestCase):
+    """Skill matching catches up with job and profile changes and feeds job recommendations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        cls.django = create_job(cls.employer, 'Django Developer', skills_required='python, django')
+        cls.react = create_job(cls.employer, 'Frontend Developer', skills_required='javascript, react')
+        cls.seeker = create_seeker('seeker', skills='Python, Django, SQL', location='London')
+
+    def job_ids(self, matcher, text):
+        return [job_id for job_id, _ in matcher.match_jobs(text, 10)]
+
+    def seeker_ids(self, matcher, text):
+        return sorted(matcher.seeker_scores(text)[0].tolist())
+
+    def test_catch_up_follows_changes(self):
+        matcher = SkillMatcher()
+        matcher.build()
+        self.assertEqual(self.job_ids(matcher, 'Django'), [self.django.id])
+        self.assertEqual(self.seeker_ids(matcher, 'sql'), [self.seeker.id])
+
+        since = timezone.now()
+        self.react.skills_required = 'react, django'
+        self.react.save()
+        self.django.is_active = False
+        self.django.save()
+        elm = create_job(self.employer, 'Elm Developer', skills_required='elm')
+        elm_seeker = create_seeker('elm', skills='elm, python')
+        profile = self.seeker.profile
+        profile.user_type = 'employer'
+        profile.save()
+
+        matcher.catch_up(since)
+        for _ in range(2):
+            self.assertEqual(self.job_ids(matcher, 'django'), [self.react.id])
+            self.assertEqual(self.job_ids(matcher, 'elm'), [elm.id])
+            self.assertEqual(self.seeker_ids(matcher, 'python'), [elm_seeker.id])
+            self.assertEqual(self.seeker_ids(matcher, 'sql'), [])
+            # The same answers once the changes are folded into the indexes
+            matcher.seekers.compact(len(matcher.idf))
+            job_ids, _ = matcher.job_matrix()
+            self.assertEqual(sorted(job_ids.tolist()), [self.react.id, elm.id])
+
+    @override_settings(COLLABORATIVE_WEIGHT=0)
+    def test_skills_rank_job_recommendations(self):
+        skill_matcher.build()
+        # Both jobs have the same features, so only the skills tell them apart
+        recommended = JobRecommender(store=JobFeatureStore()).recommend_for_users([self.seeker.id])[self.seeker.id]
+        self.assertEqual([job_id for job_id, _ in recommended], [self.django.id, self.react.id])
+        self.assertGreater(recommended[0][1], recommended[1][1])
+
+        with override_settings(SKILL_MATCH_WEIGHT=0):
+            recommended = JobRecommender(store=JobFeatureStore()).recommend_for_users([self.seeker.id])[self.seeker.id]
+        self.assertEqual(recommended[0][1], recommended[1][1])
+
+
+class CandidatePipelineTests(TestCase):
+    """Retrieval unions skill matches with nearby seekers, and the rerank orders the shortlist"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        cls.job = create_job(cls.employer, 'Django Developer', skills_required='python, django', experience_required=3)
+        cls.skilled = create_seeker('skilled', skills='Python, Django', location='Tokyo', experience_years=3)
+        cls.partly_skilled = create_seeker('partly', skills='Python', location='Tokyo', experience_years=3)
+        cls.nearby = create_seeker('nearby', location='London', experience_years=3, resume='resumes/cv.pdf')
+        cls.unrelated = create_seeker('unrelated', location='Tokyo', experience_years=20)
+
+    def pipeline(self, **limits):
+        return CandidatePipeline(filters=SeekerFilterIndex(), matcher=SkillMatcher(), **limits)
+
+    def test_retrieve_then_rerank(self):
+        pipeline = self.pipeline()
+        ranked = pipeline.recommend(self.job, 10)
+        # Skills outweigh location, and the unrelated seeker is never retrieved
+        self.assertEqual(
+            [user_id for user_id, _ in ranked], [self.skilled.id, self.partly_skilled.id, self.nearby.id]
+        )
+        self.assertTrue(all(0 <= score <= 1 for _, score in ranked))
+
+        user_ids, scores = pipeline.retrieve(self.job, exclude_ids={self.nearby.id})
+        self.assertEqual(user_ids.tolist(), sorted([self.skilled.id, self.partly_skilled.id]))
+        self.assertAlmostEqual(scores[user_ids.tolist().index(self.skilled.id)], 1)
+
+    def test_limits_cap_each_source(self):
+        pipeline = self.pipeline(skill_limit=1, filter_limit=1)
+        pipeline.recommend(self.job)
+        user_ids, _ = pipeline.retrieve(self.job)
+        self.assertEqual(user_ids.tolist(), sorted([self.skilled.id, self.nearby.id]))
+
+    def test_cold_benchmark_builds_its_own_indexes(self):
+        scenario = candidate_scenario(1, 5, cold=True, seed=0)
+        store, pipeline = scenario.indexes()
+        self.assertIsNot(pipeline.matcher, skill_matcher)
+        self.assertIsNot(scenario.indexes()[1].filters, pipeline.filters)
+
+        scenario.call((store, pipeline), scenario.subjects[0])
+        self.assertIsNotNone(pipeline.matcher.versions)
+        self.assertIsNotNone(pipeline.filters.versions)
+
+
+class RecommendationPollTests(TestCase):
+    """Poll endpoints answer pending while the pool computes, and unclaimed results expire"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        cls.job = create_job(cls.employer, 'Django Developer')
+        cls.seeker = create_seeker('seeker', skills='Python')
+
+    def setUp(self):
+        cache.clear()
+        for name, value in (('_pending', {}), ('_finished', OrderedDict())):
+            patcher = mock.patch.object(recommendations, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def wait_until_finished(self):
+        deadline = time.monotonic() + 5
+        while recommendations._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(recommendations._pending)
+
+    def poll(self, key, compute):
+        return recommendations._poll(key, '', lambda: None, compute)
+
+    def test_pending_then_ready(self):
+        self.client.force_login(self.seeker)
+        url = reverse('jobs:recommended_jobs_api')
+        released = threading.Event()
+
+        def recommend(user, count):
+            released.wait(5)
+            return [self.job]
+
+        with mock.patch('jobs.ml_recommender.get_job_recommendations', recommend):
+            self.assertEqual(self.client.get(url).json()['status'], 'pending')
+            # A second poll while computing does not start another computation
+            self.assertEqual(self.client.get(url).status_code, 202)
+            self.assertEqual(len(recommendations._pending), 1)
+            released.set()
+            self.wait_until_finished()
+
+            response = self.client.get(url).json()
+        self.assertEqual((response['status'], response['ids']), ('ready', [self.job.id]))
+        self.assertFalse(recommendations._finished)
+
+    def test_failures_answer_no_recommendations(self):
+        def fail():
+            raise ValueError('no model')
+
+        self.assertIsNone(self.poll(('fail', 1), fail))
+        self.wait_until_finished()
+        with self.assertLogs('jobs.recommendations', 'ERROR'):
+            self.assertEqual(self.poll(('fail', 1), fail), [])
+
+    def test_unclaimed_results_are_evicted(self):
+        for i in range(3):
+            self.poll(('op', i), lambda: ['done'])
+            self.wait_until_finished()
+        self.assertEqual(list(recommendations._finished), [('op', 0), ('op', 1), ('op', 2)])
+
+        with mock.patch.object(recommendations, 'MAX_FINISHED', 2):
+            self.poll(('op', 3), lambda: ['done'])
+            self.wait_until_finished()
+        self.assertEqual(list(recommendations._finished), [('op', 2), ('op', 3)])
+
+        with mock.patch.object(recommendations, 'FINISHED_TTL', 0):
+            # The expired result is gone, so polling it computes again
+            self.assertIsNone(self.poll(('op', 2), lambda: ['again']))
+        self.assertFalse(recommendations._finished)
+        self.wait_until_finished()
+        self.assertEqual(self.poll(('op', 2), lambda: ['unused']), ['again'])
+
+
+class JobFeatureStoreTests(TestCase):
+    """The job matrix follows saves and deletes, in this process and by catching up"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        cls.jobs = [create_job(cls.employer, f'Developer {i}', experience_required=i) for i in range(3)]
+
+    def setUp(self):
+        # Running on-commit callbacks inside the test transaction caches skill ids that are rolled back
+        self.addCleanup(skill_dictionary.clear)
+
+    def assertMatchesDatabase(self, store):
+        ids, features = JobFeatureStore().fetch()
+        self.assertEqual(sorted(store.ids.tolist()), sorted(ids.tolist()))
+        rows = {obj_id: row for row, obj_id in enumerate(store.ids.tolist())}
+        for obj_id, vector in zip(ids.tolist(), features):
+            self.assertEqual(store.features[rows[obj_id]].tolist(), vector.tolist())
+
+    def test_saves_and_deletes_patch_the_loaded_store(self):
+        job_store.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            created = create_job(self.employer, 'Data Engineer', location='Manchester', salary_min=40000)
+        self.assertIn(created.id, job_store)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jobs[0].experience_required = 10
+            self.jobs[0].save()
+            self.jobs[1].is_active = False
+            self.jobs[1].save()
+            self.jobs[2].delete()
+        self.assertEqual(sorted(job_store.ids.tolist()), sorted([self.jobs[0].id, created.id]))
+        self.assertMatchesDatabase(job_store)
+
+    def test_catch_up(self):
+        store = JobFeatureStore()
+        store.load()
+        since = timezone.now()
+        created = create_job(self.employer, 'Data Engineer', location='Manchester')
+        self.jobs[0].experience_required = 10
+        self.jobs[0].save()
+        self.jobs[1].is_active = False
+        self.jobs[1].save()
+        self.jobs[2].delete()
+
+        store.catch_up(since)
+        self.assertEqual(sorted(store.ids.tolist()), sorted([self.jobs[0].id, created.id]))
+        self.assertMatchesDatabase(store)
+
+
+class CacheInvalidationTests(TestCase):
+    """Cached recommendations are dropped when the jobs, profiles or applications they rank change"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        cls.job = create_job(cls.employer, 'Django Developer')
+        cls.seeker = create_seeker('seeker', skills='Python', location='London')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(skill_dictionary.clear)
+        set_cached_recommendations(self.seeker.id, [self.job.id], get_job_set_version())
+        set_cached_candidates(self.job.id, [self.seeker.id], get_seeker_set_version())
+
+    def test_job_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_job(self.employer, 'Frontend Developer')
+        # A new job can outrank every cached list, so the job set version moves on
+        self.assertIsNone(get_cached_recommendations(self.seeker.id))
+        self.assertEqual(get_cached_candidates(self.job.id), [self.seeker.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.experience_required = 5
+            self.job.save()
+        self.assertIsNone(get_cached_candidates(self.job.id))
+
+    def test_profile_changes(self):
+        profile = self.seeker.profile
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.bio = 'Hello'
+            profile.save()
+        self.assertEqual(get_cached_recommendations(self.seeker.id), [self.job.id])
+        self.assertEqual(get_cached_candidates(self.job.id), [self.seeker.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.location = 'Manchester'
+            profile.save()
+        self.assertIsNone(get_cached_recommendations(self.seeker.id))
+        self.assertIsNone(get_cached_candidates(self.job.id))
+
+    def test_applications(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Application.objects.create(
+                job=self.job, applicant=self.seeker, cover_letter='Hello',
+                contact_email='seeker@example.com', contact_phone='123',
+            )
+        self.assertIsNone(get_cached_recommendations(self.seeker.id))
+        self.assertIsNone(get_cached_candidates(self.job.id))
+
+
+@override_settings(COLLABORATIVE_WEIGHT=0)
+class BatchRecommendationTests(TestCase):
+    """The batch API ranks each user as the single-user path does and stores those rankings"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        cls.jobs = [
+            create_job(
+                cls.employer, f'Developer {i}', experience_required=i,
+                location=('London', 'Manchester', 'Tokyo')[i % 3], skills_required=('python', 'django', 'react')[i % 3],
+            )
+            for i in range(8)
+        ]
+        cls.seekers = [
+            create_seeker(f'seeker{i}', experience_years=2 * i, location=('London', 'Tokyo')[i % 2], skills='Python')
+            for i in range(3)
+        ]
+        Application.objects.create(
+            job=cls.jobs[0], applicant=cls.seekers[0], cover_letter='Hello',
+            contact_email='seeker@example.com', contact_phone='123',
+        )
+        SavedJob.objects.create(user=cls.seekers[0], job=cls.jobs[3])
+        cls.no_profile = User.objects.create(username='no_profile')
+        cls.user_ids = [seeker.id for seeker in cls.seekers] + [cls.no_profile.id]
+
+    def setUp(self):
+        job_store.load()
+        skill_matcher.build()
+
+    def test_batch_matches_single_user_path(self):
+        recommender = JobRecommender(store=job_store)
+        batch = recommender.recommend_for_users(self.user_ids, 4)
+        for seeker in self.seekers:
+            single = [job.id for job in recommender.get_recommendations(seeker, 4)]
+            self.assertEqual([job_id for job_id, _ in batch[seeker.id]], single)
+            self.assertEqual(len(single), 4)
+        # Applied and saved jobs are left out, and users without a profile get nothing
+        self.assertFalse({self.jobs[0].id, self.jobs[3].id} & {job_id for job_id, _ in batch[self.seekers[0].id]})
+        self.assertEqual(batch[self.no_profile.id], [])
+
+    def test_precompute_stores_the_rankings(self):
+        expected = JobRecommender(store=job_store).recommend_for_users(self.user_ids, 3)
+        self.assertEqual(precompute_job_recommendations(self.user_ids, count=3), 9)
+        for user_id, recommended in expected.items():
+            stored = JobRecommendation.objects.filter(user_id=user_id).order_by('rank')
+            self.assertEqual(list(stored.values_list('job_id', flat=True)), [job_id for job_id, _ in recommended])
+
+
+class BundleTests(TestCase):
+    """Stores map the bundle CURRENT points to, replay newer changes and follow a republish"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        cls.jobs = [create_job(cls.employer, f'Developer {i}', experience_required=i) for i in range(3)]
+        # Older than the bundles, so loading one has nothing to replay
+        Job.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def setUp(self):
+        use_temporary_data_dir(self)
+
+    def publish(self, created_at, keep=3):
+        store = JobFeatureStore()
+        store.load()
+        return publish_bundle(*store.export(), created_at=created_at, keep=keep)
+
+    def test_stores_map_the_current_bundle(self):
+        self.assertIsNone(current_bundle())
+        version = self.publish(timezone.now())
+        self.assertEqual(current_bundle().version, version)
+
+        store = JobFeatureStore().ensure_current()
+        self.assertEqual(store.bundle_version, version)
+        self.assertFalse(store.features.flags.writeable)
+        self.assertEqual(sorted(store.ids.tolist()), sorted(job.id for job in self.jobs))
+
+        # Jobs changed after the bundle was built are replayed on load
+        created = create_job(self.employer, 'Data Engineer')
+        self.assertIn(created.id, JobFeatureStore().ensure_current())
+
+    def test_republish_swaps_the_pointer(self):
+        self.publish(timezone.now() - timedelta(minutes=2))
+        store = JobFeatureStore().ensure_current()
+        self.jobs[0].delete()
+        second = self.publish(timezone.now() - timedelta(minutes=1))
+        self.assertEqual(current_bundle().version, second)
+
+        store.ensure_current()
+        self.assertEqual(store.bundle_version, second)
+        self.assertNotIn(self.jobs[0].id, store)
+
+        third = self.publish(timezone.now(), keep=2)
+        # Only the newest `keep` versions stay on disk
+        self.assertEqual(sorted(os.listdir(bundles_dir())), sorted(['CURRENT', second, third]))
+
+
+@override_settings(SKILL_MATCH_WEIGHT=0)
+class CollaborativeFilterTests(TestCase):
+    """Jobs liked by similar seekers are blended into job recommendations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        nearby = [create_job(cls.employer, f'Developer {i}', experience_required=2 + i) for i in range(4)]
+        cls.far = create_job(cls.employer, 'Senior Engineer', location='Tokyo', experience_required=15)
+        cls.seeker = create_seeker('seeker', location='London', experience_years=2)
+        cls.cold_start = create_seeker('cold', location='London', experience_years=2)
+        # Two peers applied to the same nearby jobs as the seeker, and to the far one
+        peers = [(create_seeker(f'peer{i}'), nearby[:2] + [cls.far]) for i in range(2)]
+        for user, jobs in [(cls.seeker, nearby[:2])] + peers:
+            for job in jobs:
+                Application.objects.create(
+                    job=job, applicant=user, cover_letter='Hello',
+                    contact_email='seeker@example.com', contact_phone='123',
+                )
+
+    def setUp(self):
+        use_temporary_data_dir(self)
+
+    def recommend(self, weight):
+        with override_settings(COLLABORATIVE_WEIGHT=weight):
+            recommended = JobRecommender(store=JobFeatureStore()).recommend_for_users(
+                [self.seeker.id, self.cold_start.id], 2
+            )
+        return {user_id: [job_id for job_id, _ in jobs] for user_id, jobs in recommended.items()}
+
+    def test_blending(self):
+        self.assertIsNone(current_model())
+        content = self.recommend(0.9)
+        self.assertNotIn(self.far.id, content[self.seeker.id])
+
+        # One factor cannot reproduce the seeker skipping the job both peers applied to
+        CollaborativeModel.train(n_factors=1).save(model_path())
+        self.assertEqual(current_model().user_rows([self.seeker.id, self.cold_start.id]).tolist(), [0, -1])
+        blended = self.recommend(0.9)
+        self.assertEqual(blended[self.seeker.id][0], self.far.id)
+        # Seekers without interactions are ranked on content alone
+        self.assertEqual(blended[self.cold_start.id], content[self.cold_start.id])
+        self.assertEqual(self.recommend(0), content)
+
+    def test_too_few_interactions(self):
+        Application.objects.exclude(applicant=self.seeker).delete()
+        self.assertIsNone(CollaborativeModel.train())
+
+
+class EmployerCandidatesTests(TestCase):
+    """Candidates for all of an employer's jobs come from one search and are not repeated across jobs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user('employer', password='pw')
+        UserProfile.objects.create(user=cls.employer, user_type='employer')
+        cls.backend = create_job(cls.employer, 'Backend Developer', experience_required=3)
+        cls.platform = create_job(cls.employer, 'Platform Developer', experience_required=3)
+        cls.tokyo = create_job(cls.employer, 'Tokyo Developer', location='Tokyo', experience_required=10)
+        cls.london_seekers = [
+            create_seeker(f'london{i}', location='London', experience_years=3, skills='python') for i in range(7)
+        ]
+        cls.tokyo_seekers = [
+            create_seeker(f'tokyo{i}', location='Tokyo', experience_years=10, skills='python') for i in range(2)
+        ]
+        cls.applicant = cls.london_seekers[0]
+        Application.objects.create(
+            job=cls.backend, applicant=cls.applicant, cover_letter='Hello',
+            contact_email='seeker@example.com', contact_phone='123',
+        )
+        cls.jobs = Job.objects.filter(employer=cls.employer, is_active=True)
+
+    def setUp(self):
+        use_temporary_data_dir(self)
+
+    def test_each_candidate_is_recommended_once(self):
+        results = CandidateRecommender(store=CandidateFeatureStore()).recommend_for_jobs(self.jobs, 2)
+        recommended = {job_id: [user_id for user_id, _ in pairs] for job_id, pairs in results.items()}
+        # The two identical London jobs share out the London seekers, except the one who applied
+        london = recommended[self.backend.id] + recommended[self.platform.id]
+        self.assertEqual(len(london), 4)
+        self.assertEqual(len(set(london)), 4)
+        self.assertLessEqual(set(london), {seeker.id for seeker in self.london_seekers[1:]})
+        self.assertEqual(sorted(recommended[self.tokyo.id]), sorted(seeker.id for seeker in self.tokyo_seekers))
+        for pairs in results.values():
+            distances = [distance for _, distance in pairs]
+            self.assertEqual(distances, sorted(distances))
+
+    def test_users_are_resolved_per_job(self):
+        with mock.patch('jobs.ml_recommender.candidate_store', CandidateFeatureStore()):
+            recommended = get_candidate_recommendations_for_jobs(self.jobs, 2)
+        self.assertEqual(set(recommended), {self.backend.id, self.platform.id, self.tokyo.id})
+        self.assertEqual({user.id for user in recommended[self.tokyo.id]}, {user.id for user in self.tokyo_seekers})
+
+    def test_applications_expire_the_cached_lists(self):
+        cache.clear()
+        self.addCleanup(skill_dictionary.clear)
+        versions = (get_job_set_version(), get_seeker_set_version())
+        set_cached_employer_candidates(self.employer.id, 3, {self.backend.id: [self.london_seekers[1].id]}, versions)
+        self.assertIsNotNone(get_cached_employer_candidates(self.employer.id, 3))
+        with self.captureOnCommitCallbacks(execute=True):
+            Application.objects.create(
+                job=self.platform, applicant=self.london_seekers[1], cover_letter='Hello',
+                contact_email='seeker@example.com', contact_phone='123',
+            )
+        self.assertIsNone(get_cached_employer_candidates(self.employer.id, 3))
+
+
+class MetricsTests(SimpleTestCase):
+    """Instrumented calls feed per-operation duration and size histograms and event counters"""
+
+    def setUp(self):
+        patcher = mock.patch('jobs.profiling.metrics', MetricsRegistry())
+        self.metrics = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_histogram_percentiles(self):
+        histogram = Histogram((1, 10, 100))
+        for value in (0.5, 2, 3, 4, 5, 6, 7, 8, 9, 250):
+            histogram.observe(value)
+        summary = histogram.summary()
+        self.assertEqual([bucket['count'] for bucket in summary['buckets']], [1, 8, 0, 1])
+        self.assertEqual(summary['buckets'][-1]['le'], None)
+        self.assertEqual((summary['count'], summary['max']), (10, 250))
+        # Estimated by the bucket's upper bound, and never beyond the largest value seen
+        self.assertEqual((summary['p50'], summary['p95'], summary['p99']), (10, 250, 250))
+        self.assertEqual(Histogram((1, 10)).summary()['p50'], 0)
+
+    def test_instrument_records_stages_sizes_and_events(self):
+        for _ in range(2):
+            with instrument('job_recommendations', 'home'):
+                with stage('search'):
+                    record_size('neighbours', 12)
+                    count_event('fallback:content_only')
+        with self.assertRaises(ValueError), instrument('job_recommendations', 'home'):
+            raise ValueError
+
+        entry, = self.metrics.snapshot()['operations']
+        self.assertEqual((entry['operation'], entry['source']), ('job_recommendations', 'home'))
+        self.assertEqual(entry['counters'], {
+            'calls': 3, 'error': 1, 'error:ValueError': 1, 'fallback:content_only': 2,
+        })
+        self.assertEqual(entry['durations_ms']['total']['count'], 3)
+        self.assertEqual(entry['durations_ms']['search']['count'], 2)
+        self.assertEqual(entry['sizes']['neighbours']['max'], 12)
+
+    def test_nothing_is_recorded_outside_instrument(self):
+        with stage('search'):
+            record_size('neighbours', 12)
+            count_event('fallback:knn')
+        self.assertEqual(self.metrics.snapshot()['operations'], [])
@@ -0,0 +1,176 @@
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from .caching import get_job_set_version
+from .models import Job
+from .skills import WHITESPACE, tokenize_skills
+
+
+# Kinds of suggestion offered for each search box
+FIELD_KINDS = {
+    'keyword': ('title', 'skill', 'company'),
+    'location': ('location',),
+}
+WORD_START = re.compile(r'\b\w')
+# Sorts after every character, closing the range of keys sharing a prefix
+PREFIX_END = chr(0x10FFFF)
+
+# Prefixes this short match many terms, so their answers are memoised until the next change
+MEMO_PREFIX_LENGTH = 3
+# Minimum seconds between version checks, and so between rebuilds for other processes' changes
+MIN_REBUILD_INTERVAL = 60
+
+
+def normalize_term(text):
+    """Lookup key of a suggestion or a typed prefix: single spaced, casefolded"""
+    return WHITESPACE.sub(' ', (text or '').strip()).casefold()
+
+
+def job_terms(title, skills_required, company_name, location):
+    """{(kind, key): display text} of the suggestions one job contributes"""
+    terms = {}
+    for kind, text in (('title', title), ('company', company_name), ('location', location)):
+        key = normalize_term(text)
+        if key:
+            terms[(kind, key)] = WHITESPACE.sub(' ', text.strip())
+    for skill in tokenize_skills(skills_required):
+        terms[('skill', skill)] = skill
+    return terms
+
+
+class TypeaheadIndex:
+    """Prefix index of the titles, skills, companies and locations of active jobs.
+
+    Every term is weighted by the number of active jobs using it. Keys are
+    held in one sorted list of (key, kind, term) entries, with an extra
+    entry for each later word of a term so "developer" also finds "python
+    developer"; a prefix is answered by two bisections and a scan of the
+    entries between them. Saved and deleted jobs patch the index in place.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.counts = {}
+        self.display = {}
+        self.job_terms = {}
+        self.entries = []
+        self.memo = {}
+        self.version = None
+        self.checked_at = 0
+
+    @staticmethod
+    def _entries(kind, key):
+        return [(key[match.start():], kind, key) for match in WORD_START.finditer(key)]
+
+    def build(self):
+        """Rebuild the index from the active jobs in the database"""
+        with self.lock:
+            version = get_job_set_version()
+            rows = Job.objects.filter(is_active=True).values_list(
+                'id', 'title', 'skills_required', 'company_name', 'location'
+            )
+            self.counts, self.display, self.job_terms = {}, {}, {}
+            for job_id, *fields in rows.iterator():
+                terms = job_terms(*fields)
+                self.job_terms[job_id] = tuple(terms)
+                for term, text in terms.items():
+                    self.counts[term] = self.counts.get(term, 0) + 1
+                    self.display.setdefault(term, text)
+            self.entries = sorted(entry for term in self.counts for entry in self._entries(*term))
+            self.memo = {}
+            self.version = version
+            self.checked_at = time.monotonic()
+
+    def ensure_current(self):
+        """Build on first use, and rebuild when another process changed jobs"""
+        with self.lock:
+            if self.version is None:
+                self.build()
+            elif time.monotonic() - self.checked_at >= MIN_REBUILD_INTERVAL:
+                if self.version != get_job_set_version():
+                    self.build()
+                self.checked_at = time.monotonic()
+        return self
+
+    def _add(self, term, text):
+        count = self.counts.get(term, 0)
+        self.counts[term] = count + 1
+        if not count:
+            self.display[term] = text
+            for entry in self._entries(*term):
+                insort(self.entries, entry)
+
+    def _discard(self, term):
+        count = self.counts[term] - 1
+        if count:
+            self.counts[term] = count
+            return
+        del self.counts[term]
+        del self.display[term]
+        for entry in self._entries(*term):
+            del self.entries[bisect_left(self.entries, entry)]
+
+    def remove(self, job_id):
+        """Withdraw the terms of a job"""
+        with self.lock:
+            for term in self.job_terms.pop(job_id, ()):
+                self._discard(term)
+            self.memo = {}
+
+    def apply(self, job):
+        """Replace the terms of a saved job, withdrawing them if it is inactive"""
+        with self.lock:
+            self.remove(job.id)
+            if job.is_active:
+                terms = job_terms(job.title, job.skills_required, job.company_name, job.location)
+                for term, text in terms.items():
+                    self._add(term, text)
+                self.job_terms[job.id] = tuple(terms)
+
+    def record_change(self, change):
+        """Apply a job change that has just published a new job-set version.
+
+        The version was bumped by the feature store handlers registered
+        before this one, so the index is current only when that bump is the
+        single one since it was built; otherwise it is left to rebuild.
+        """
+        with self.lock:
+            if self.version is not None and get_job_set_version() == self.version + 1:
+                change()
+                self.version += 1
+
+    def suggest(self, prefix, kinds=FIELD_KINDS['keyword'], limit=8):
+        """Up to limit [{text, kind, count}] for terms of kinds with a word starting with prefix.
+
+        Terms used by the most active jobs come first, then those that
+        start with the prefix, then the shortest.
+        """
+        prefix = normalize_term(prefix)
+        if not prefix:
+            return []
+        memo_key = (prefix, kinds, limit)
+        with self.lock:
+            if memo_key in self.memo:
+                return self.memo[memo_key]
+            start = bisect_left(self.entries, (prefix,))
+            end = bisect_left(self.entries, (prefix + PREFIX_END,), start)
+            matches = {(kind, key) for _, kind, key in self.entries[start:end] if kind in kinds}
+            best = heapq.nsmallest(
+                limit * len(kinds), matches,
+                key=lambda term: (-self.counts[term], not term[1].startswith(prefix), len(term[1]), term),
+            )
+            suggestions, seen = [], set()
+            for term in best:
+                # A word that is both a title and a skill is offered once
+                if term[1] not in seen and len(suggestions) < limit:
+                    seen.add(term[1])
+                    suggestions.append({'text': self.display[term], 'kind': term[0], 'count': self.counts[term]})
+            if len(prefix) < MEMO_PREFIX_LENGTH:
+                self.memo[memo_key] = suggestions
+        return suggestions
+
+
+typeahead_index = TypeaheadIndex()
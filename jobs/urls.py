@@ -68,4 +68,18 @@ urlpatterns = [
         views.update_application_status,
         name='update_application_status'
     ),
+
+    # Suggestions for the search boxes, fetched as the user types
+    path('api/typeahead/', views.typeahead_api, name='typeahead_api'),
+    # Salary distribution of the current listing filters
+    path('api/salary-histogram/', views.salary_histogram_api, name='salary_histogram_api'),
+
+    # Recommendations, fetched by the page after it has rendered
+    path('api/recommendations/jobs/', views.recommended_jobs_api, name='recommended_jobs_api'),
+    path('api/recommendations/candidates/', views.employer_candidates_api, name='employer_candidates_api'),
+    path(
+        'api/recommendations/candidates/<int:job_id>/',
+        views.recommended_candidates_api,
+        name='recommended_candidates_api'
+    ),
 ]
\ No newline at end of file
@@ -2,9 +2,8 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from django.core.paginator import Paginator
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
+from django.template.loader import render_to_string
 
 from .models import Job, Application, SavedJob, UserProfile, Contact
 from .forms import (
@@ -16,8 +15,15 @@ from .forms import (
     JobSearchForm,
     ContactForm
 )
-# ✅ UPDATED: Import both recommendation functions
-from .ml_recommender import get_job_recommendations, get_candidate_recommendations
+# Lazy facade: the ML stack is only imported when a recommendation is computed
+from .recommendations import (
+    poll_job_recommendations,
+    poll_candidate_recommendations,
+    poll_employer_candidates,
+    get_similar_jobs,
+)
+from .search import listing_page, normalize_search, salary_histogram_for
+from .typeahead import FIELD_KINDS, typeahead_index
 
 
 # =========================
@@ -28,19 +34,9 @@ def home(request):
     recent_jobs = Job.objects.filter(is_active=True).order_by('-posted_date')[:6]
     job_categories = Job.CATEGORIES
     
-    recommended_jobs = []
-    if request.user.is_authenticated and hasattr(request.user, 'profile'):
-        if request.user.profile.user_type == 'seeker':
-            try:
-                recommended_jobs = get_job_recommendations(request.user, count=6)
-            except Exception as e:
-                print(f"Recommendation error: {e}")
-                recommended_jobs = []
-    
     return render(request, 'home.html', {
         'recent_jobs': recent_jobs,
         'job_categories': job_categories,
-        'recommended_jobs': recommended_jobs,
     })
 
 
@@ -129,53 +125,63 @@ def user_logout(request):
 @login_required
 def job_listings(request):
     form = JobSearchForm(request.GET)
-    jobs = Job.objects.filter(is_active=True)
-
-    if form.is_valid():
-        keyword = form.cleaned_data.get('keyword')
-        location = form.cleaned_data.get('location')
-        category = form.cleaned_data.get('category')
-        job_type = form.cleaned_data.get('job_type')
-        min_salary = form.cleaned_data.get('min_salary')
-
-        if keyword:
-            jobs = jobs.filter(
-                Q(title__icontains=keyword) |
-                Q(description__icontains=keyword) |
-                Q(skills_required__icontains=keyword)
-            )
-        if location:
-            jobs = jobs.filter(location__icontains=location)
-        if category:
-            jobs = jobs.filter(category=category)
-        if job_type:
-            jobs = jobs.filter(job_type=job_type)
-        if min_salary:
-            jobs = jobs.filter(salary_min__gte=min_salary)
-
-    sort_by = request.GET.get('sort', '-posted_date')
-    if sort_by in ['-posted_date', 'salary_max', '-salary_max']:
-        jobs = jobs.order_by(sort_by)
-
-    paginator = Paginator(jobs, 12)
-    page_obj = paginator.get_page(request.GET.get('page'))
-    
-    recommended_jobs = []
-    if request.user.profile.user_type == 'seeker':
-        try:
-            recommended_jobs = get_job_recommendations(request.user, count=6)
-        except Exception as e:
-            print(f"Recommendation error: {e}")
-            recommended_jobs = []
+    search = normalize_search(form.cleaned_data if form.is_valid() else {})
+    page_obj, results = listing_page(search, request.GET.get('sort', ''), request.GET.get('cursor', ''))
+
+    # Filters carried over by the sort selector and pagination links
+    filters = request.GET.copy()
+    filters.pop('cursor', None)
+    filters.pop('sort', None)
 
     return render(request, 'job_listings.html', {
         'form': form,
         'page_obj': page_obj,
-        'total_jobs': jobs.count(),
-        'recommended_jobs': recommended_jobs,
+        'total_jobs': results['total'],
+        'ranked': results['ranked'],
+        'sort_by': results['sort_by'],
+        'filter_query': filters.urlencode(),
+        'facets': facet_links(request, results['facets']),
     })
 
 
+# Sidebar headings of the facets, keyed by the filter parameter each one sets
+FACET_TITLES = {
+    'category': 'Category',
+    'job_type': 'Job Type',
+    'location': 'Location',
+    'min_salary': 'Minimum Salary',
+    'skill': 'Skill',
+}
+
+
+def facet_links(request, facets):
+    """[(title, [value, ...]), ...] with a link that applies or clears each value"""
+    sidebar = []
+    for name, title in FACET_TITLES.items():
+        values = []
+        # Facets cached before a facet was added lack it until the next job change
+        for value, label, count in facets.get(name, ()):
+            params = request.GET.copy()
+            params.pop('cursor', None)
+            selected = params.get(name) == str(value)
+            if selected:
+                params.pop(name)
+            else:
+                params[name] = value
+            values.append({'label': label, 'count': count, 'selected': selected, 'query': params.urlencode()})
+        if values:
+            sidebar.append((title, values))
+    return sidebar
+
+
+@login_required
+def salary_histogram_api(request):
+    """Salary distribution of the jobs matching the listing filters in the query string"""
+    form = JobSearchForm(request.GET)
+    search = normalize_search(form.cleaned_data if form.is_valid() else {})
+    return JsonResponse(salary_histogram_for(search))
+
+
 @login_required
 def job_detail(request, job_id):
     job = get_object_or_404(Job, id=job_id, is_active=True)
@@ -187,14 +193,7 @@ def job_detail(request, job_id):
         is_saved = SavedJob.objects.filter(user=request.user, job=job).exists()
         has_applied = Application.objects.filter(applicant=request.user, job=job).exists()
     
-    similar_jobs = []
-    if request.user.is_authenticated and hasattr(request.user, 'profile'):
-        if request.user.profile.user_type == 'seeker':
-            try:
-                similar_jobs = get_job_recommendations(request.user, count=4)
-            except Exception as e:
-                print(f"Recommendation error: {e}")
-                similar_jobs = []
+    similar_jobs = get_similar_jobs(job, count=4)
 
     return render(request, 'job_detail.html', {
         'job': job,
@@ -269,18 +268,10 @@ def save_job(request, job_id):
 def seeker_dashboard(request):
     if request.user.profile.user_type != 'seeker':
         return HttpResponseForbidden("Access denied")
-    
-    recommended_jobs = []
-    try:
-        recommended_jobs = get_job_recommendations(request.user, count=6)
-    except Exception as e:
-        print(f"Recommendation error: {e}")
-        recommended_jobs = []
 
     return render(request, 'seeker_dashboard.html', {
         'applications': Application.objects.filter(applicant=request.user),
         'saved_jobs': SavedJob.objects.filter(user=request.user),
-        'recommended_jobs': recommended_jobs,
     })
 
 
@@ -317,22 +308,11 @@ def employer_dashboard(request):
     if request.user.profile.user_type != 'employer':
         return HttpResponseForbidden("Access denied")
     
-    # ✅ ADDED: Get recommended candidates for employer's jobs
-    employer_jobs = Job.objects.filter(employer=request.user, is_active=True)
-    recommended_candidates = []
-    
-    if employer_jobs.exists():
-        latest_job = employer_jobs.first()
-        try:
-            recommended_candidates = get_candidate_recommendations(latest_job, count=6)
-        except Exception as e:
-            print(f"Candidate recommendation error: {e}")
-            recommended_candidates = []
-
+    # Recommended candidates for every open job are loaded by the page
     return render(request, 'employer_dashboard.html', {
         'jobs': Job.objects.filter(employer=request.user),
         'total_applications': Application.objects.filter(job__employer=request.user).count(),
-        'recommended_candidates': recommended_candidates,  # ✅ ADDED
+        'has_open_jobs': Job.objects.filter(employer=request.user, is_active=True).exists(),
     })
 
 
@@ -405,18 +385,9 @@ def view_applications(request, job_id):
     job = get_object_or_404(Job, id=job_id, employer=request.user)
     applications = Application.objects.filter(job=job)
     
-    # ✅ ADDED: Get recommended candidates for this specific job
-    recommended_candidates = []
-    try:
-        recommended_candidates = get_candidate_recommendations(job, count=8)
-    except Exception as e:
-        print(f"Candidate recommendation error: {e}")
-        recommended_candidates = []
-    
     return render(request, 'view_applications.html', {
         'job': job,
         'applications': applications,
-        'recommended_candidates': recommended_candidates,  # ✅ ADDED
     })
 
 
@@ -438,4 +409,96 @@ def update_application_status(request, application_id):
                 f'Status updated to {application.get_status_display()}'
             )
 
-    return redirect('jobs:view_applications', job_id=application.job.id)
\ No newline at end of file
+    return redirect('jobs:view_applications', job_id=application.job.id)
+
+
+# =========================
+# Recommendations (loaded by the page after first paint)
+# =========================
+
+# Template fragment for each page that shows recommendations
+RECOMMENDED_JOBS_TEMPLATES = {
+    'home': 'recommended_jobs_home.html',
+    'listings': 'recommended_jobs_listings.html',
+    'dashboard': 'recommended_jobs_dashboard.html',
+}
+RECOMMENDED_CANDIDATES_TEMPLATES = {
+    'dashboard': 'recommended_candidates_dashboard.html',
+    'applications': 'recommended_candidates_applications.html',
+}
+# Milliseconds the page waits before asking again while recommendations compute
+RECOMMENDATION_RETRY_AFTER = 500
+
+
+def recommendation_response(request, results, template_name, context_name, ids=None):
+    if results is None:
+        return JsonResponse({'status': 'pending', 'retry_after': RECOMMENDATION_RETRY_AFTER}, status=202)
+    return JsonResponse({
+        'status': 'ready',
+        'ids': [obj.id for obj in results] if ids is None else ids,
+        'html': render_to_string(template_name, {context_name: results}, request=request),
+    })
+
+
+def recommendation_count(request, default):
+    try:
+        return max(1, min(int(request.GET.get('count', default)), 12))
+    except ValueError:
+        return default
+
+
+def recommendation_layout(request, templates):
+    """The requested page layout, also the source label of its metrics"""
+    layout = request.GET.get('layout')
+    return layout if layout in templates else 'dashboard'
+
+
+@login_required
+def recommended_jobs_api(request):
+    if request.user.profile.user_type != 'seeker':
+        return JsonResponse({'error': 'Access denied'}, status=403)
+
+    layout = recommendation_layout(request, RECOMMENDED_JOBS_TEMPLATES)
+    results = poll_job_recommendations(request.user, count=recommendation_count(request, 6), source=layout)
+    return recommendation_response(request, results, RECOMMENDED_JOBS_TEMPLATES[layout], 'recommended_jobs')
+
+
+@login_required
+def recommended_candidates_api(request, job_id):
+    job = get_object_or_404(Job, id=job_id, employer=request.user)
+
+    layout = recommendation_layout(request, RECOMMENDED_CANDIDATES_TEMPLATES)
+    results = poll_candidate_recommendations(job, count=recommendation_count(request, 6), source=layout)
+    return recommendation_response(
+        request, results, RECOMMENDED_CANDIDATES_TEMPLATES[layout], 'recommended_candidates'
+    )
+
+
+@login_required
+def employer_candidates_api(request):
+    """Candidates for all of the employer's open jobs, ranked in one pass"""
+    if request.user.profile.user_type != 'employer':
+        return JsonResponse({'error': 'Access denied'}, status=403)
+
+    results = poll_employer_candidates(request.user, count=recommendation_count(request, 3), source='dashboard')
+    ids = None if results is None else {
+        job.id: [candidate.id for candidate in candidates] for job, candidates in results
+    }
+    return recommendation_response(request, results, 'recommended_candidates_by_job.html', 'job_candidates', ids)
+
+
+# =========================
+# Search Suggestions (typeahead for the search boxes)
+# =========================
+
+TYPEAHEAD_LIMIT = 8
+
+
+@login_required
+def typeahead_api(request):
+    """Suggestions for a prefix typed into the keyword or location box"""
+    field = request.GET.get('field')
+    kinds = FIELD_KINDS.get(field, FIELD_KINDS['keyword'])
+    query = request.GET.get('q', '')[:100]
+    suggestions = typeahead_index.ensure_current().suggest(query, kinds, TYPEAHEAD_LIMIT)
+    return JsonResponse({'query': query, 'suggestions': suggestions})